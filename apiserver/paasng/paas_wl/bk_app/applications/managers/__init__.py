@@ -17,5 +17,13 @@
 
 from .app_build import mark_as_latest_artifact
 from .app_metadata import WlAppMetadata, get_metadata, update_metadata
+from .output_stream import OutputStreamReader, compact_output_stream
 
-__all__ = ["WlAppMetadata", "get_metadata", "update_metadata", "mark_as_latest_artifact"]
+__all__ = [
+    "WlAppMetadata",
+    "get_metadata",
+    "update_metadata",
+    "mark_as_latest_artifact",
+    "OutputStreamReader",
+    "compact_output_stream",
+]
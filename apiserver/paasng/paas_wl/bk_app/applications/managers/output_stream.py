@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+"""Compact storage for the lines of OutputStream
+
+Lines are written to `OutputStreamLine` one row per line while the stream is active, after
+the stream is finished, the rows can be packed into compressed `OutputStreamChunk` objects by
+`compact_output_stream`. Use `OutputStreamReader` to read lines no matter how they were stored.
+"""
+
+import datetime
+import gzip
+import json
+import logging
+from typing import Iterator, List, NamedTuple, Optional
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from paas_wl.bk_app.applications.models.misc import OutputStream, OutputStreamChunk, OutputStreamLine
+
+logger = logging.getLogger(__name__)
+
+# The size of raw content in one chunk, the compressed data is usually much smaller
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+CODEC_GZIP = "gzip"
+
+# Batch size for deleting the compacted line rows
+_DELETE_BATCH_SIZE = 1000
+
+
+class LogLine(NamedTuple):
+    line: str
+    stream: str
+
+
+def encode_chunk(lines: List[LogLine], codec: str = CODEC_GZIP) -> bytes:
+    """Encode lines into a chunk, the line and stream are both kept."""
+    if codec != CODEC_GZIP:
+        raise ValueError(f"unsupported codec: {codec}")
+    payload = json.dumps([[ln.line, ln.stream] for ln in lines], ensure_ascii=False)
+    return gzip.compress(payload.encode(), mtime=0)
+
+
+def decode_chunk(data: bytes, codec: str = CODEC_GZIP) -> List[LogLine]:
+    """Decode the chunk data which was made by `encode_chunk`."""
+    if codec != CODEC_GZIP:
+        raise ValueError(f"unsupported codec: {codec}")
+    return [LogLine(line, stream) for line, stream in json.loads(gzip.decompress(bytes(data)))]
+
+
+def compact_output_stream(output_stream: OutputStream, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Pack the line rows of the given stream into compressed chunks, the rows will be removed
+    after being packed. It's safe to call this function multiple times, new rows will be appended
+    to the tail chunks.
+
+    :param chunk_size: The max size(in bytes) of the raw content in one chunk.
+    :return: The number of lines packed.
+    """
+    with transaction.atomic(using="workloads"):
+        # Lock the stream to avoid compacting concurrently
+        OutputStream.objects.select_for_update().get(pk=output_stream.pk)
+
+        last_chunk = output_stream.chunks.order_by("-seq").first()
+        seq = last_chunk.seq + 1 if last_chunk else 0
+        start_line = last_chunk.start_line + last_chunk.line_count if last_chunk else 0
+
+        chunks: List[OutputStreamChunk] = []
+        packed_ids: List[int] = []
+        buffer: List[LogLine] = []
+        buffer_size = 0
+
+        def _pack():
+            nonlocal seq, start_line, buffer, buffer_size
+            chunks.append(
+                OutputStreamChunk(
+                    output_stream=output_stream,
+                    seq=seq,
+                    start_line=start_line,
+                    line_count=len(buffer),
+                    codec=CODEC_GZIP,
+                    data=encode_chunk(buffer),
+                )
+            )
+            seq += 1
+            start_line += len(buffer)
+            buffer, buffer_size = [], 0
+
+        rows = output_stream.lines.order_by("created", "id").values_list("id", "line", "stream")
+        for pk, line, stream in rows.iterator():
+            buffer.append(LogLine(line, stream))
+            buffer_size += len(line.encode())
+            packed_ids.append(pk)
+            if buffer_size >= chunk_size:
+                _pack()
+        if buffer:
+            _pack()
+
+        if not packed_ids:
+            return 0
+
+        OutputStreamChunk.objects.bulk_create(chunks)
+        for i in range(0, len(packed_ids), _DELETE_BATCH_SIZE):
+            OutputStreamLine.objects.filter(pk__in=packed_ids[i : i + _DELETE_BATCH_SIZE]).delete()
+
+    logger.info(
+        "compacted %s lines of output stream %s into %s chunks", len(packed_ids), output_stream.pk, len(chunks)
+    )
+    return len(packed_ids)
+
+
+class OutputStreamReader:
+    """Read lines of an OutputStream, lines stored in chunks come before the line rows.
+
+    Only the chunks which contain the requested lines will be loaded, so reading a small
+    range or the tail of a huge log is cheap.
+    """
+
+    def __init__(self, output_stream: OutputStream):
+        self.output_stream = output_stream
+
+    def count(self) -> int:
+        """Return the total number of lines"""
+        return self._count_chunked() + self.output_stream.lines.count()
+
+    def read(self, start: int = 0, stop: Optional[int] = None) -> List[LogLine]:
+        """Read lines in range [start, stop), the line number starts from 0.
+
+        :param stop: Read until the end if not given.
+        """
+        if start < 0 or (stop is not None and stop < 0):
+            raise ValueError("negative index is not supported, use `tail()` instead")
+        if stop is not None and stop <= start:
+            return []
+
+        results: List[LogLine] = []
+        chunks = self.output_stream.chunks.annotate(end_line=F("start_line") + F("line_count")).filter(
+            end_line__gt=start
+        )
+        if stop is not None:
+            chunks = chunks.filter(start_line__lt=stop)
+        chunked_count = 0
+        for chunk in chunks.order_by("seq"):
+            lines = decode_chunk(chunk.data, chunk.codec)
+            begin = max(start - chunk.start_line, 0)
+            end = len(lines) if stop is None else min(stop - chunk.start_line, len(lines))
+            results.extend(lines[begin:end])
+            chunked_count = chunk.start_line + chunk.line_count
+
+        if not chunked_count:
+            chunked_count = self._count_chunked()
+        # The requested range is fully covered by chunks
+        if stop is not None and stop <= chunked_count:
+            return results
+
+        rows = self.output_stream.lines.order_by("created", "id").values_list("line", "stream")
+        offset = max(start - chunked_count, 0)
+        rows = rows[offset:] if stop is None else rows[offset : stop - chunked_count]
+        results.extend(LogLine(line, stream) for line, stream in rows)
+        return results
+
+    def tail(self, n: int) -> List[LogLine]:
+        """Read the last n lines"""
+        total = self.count()
+        return self.read(max(total - n, 0), total)
+
+    def iter_lines(self) -> Iterator[LogLine]:
+        """Iterate over all lines, chunks are loaded one by one."""
+        for chunk in self.output_stream.chunks.order_by("seq").iterator():
+            yield from decode_chunk(chunk.data, chunk.codec)
+        for line, stream in self.output_stream.lines.order_by("created", "id").values_list("line", "stream"):
+            yield LogLine(line, stream)
+
+    def last_written_at(self) -> Optional[datetime.datetime]:
+        """Return the time when the last line was written, None if there is no lines.
+
+        The time of each line is dropped after being compacted, the creation time of the last chunk
+        is used instead, it's a little later than the real one.
+        """
+        if last_line := self.output_stream.lines.order_by("created", "id").last():
+            return last_line.created
+        if last_chunk := self.output_stream.chunks.order_by("seq").last():
+            return last_chunk.created
+        return None
+
+    def _count_chunked(self) -> int:
+        return self.output_stream.chunks.aggregate(total=Sum("line_count"))["total"] or 0
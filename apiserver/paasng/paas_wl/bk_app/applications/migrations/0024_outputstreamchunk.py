@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0023_remove_build_procfile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutputStreamChunk",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("seq", models.IntegerField(help_text="分块序号，从 0 开始")),
+                ("start_line", models.IntegerField(help_text="分块中首行在整个日志中的行号，从 0 开始")),
+                ("line_count", models.IntegerField(help_text="分块包含的行数")),
+                ("codec", models.CharField(help_text="分块数据的压缩格式", max_length=16)),
+                ("data", models.BinaryField(help_text="压缩后的分块数据")),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "output_stream",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="chunks", to="api.outputstream"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["seq"],
+                "unique_together": {("output_stream", "seq")},
+            },
+        ),
+    ]
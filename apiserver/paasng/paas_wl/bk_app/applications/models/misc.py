@@ -15,6 +15,8 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+from typing import Iterable, Tuple
+
 from django.db import models
 
 from paas_wl.bk_app.applications.models import UuidAuditedModel
@@ -30,6 +32,17 @@ class OutputStream(UuidAuditedModel):
             line += "\n"
         OutputStreamLine.objects.create(output_stream=self, line=line, stream=stream)
 
+    def bulk_write(self, lines: Iterable[Tuple[str, str]]):
+        """Write multiple lines by a single query
+
+        :param lines: A list of (line, stream) tuples, the order will be kept
+        """
+        objs = [
+            OutputStreamLine(output_stream=self, line=line if line.endswith("\n") else line + "\n", stream=stream)
+            for line, stream in lines
+        ]
+        OutputStreamLine.objects.bulk_create(objs)
+
 
 class OutputStreamLine(models.Model):
     """
@@ -47,3 +60,23 @@ class OutputStreamLine(models.Model):
 
     def __str__(self):
         return "%s-%s" % (self.id, self.line)
+
+
+class OutputStreamChunk(models.Model):
+    """A compressed chunk of consecutive lines of an `OutputStream`, lines of a finished stream
+    will be packed into chunks to reduce the number of rows, see `managers.output_stream`.
+
+    [multi-tenancy] TODO
+    """
+
+    output_stream = models.ForeignKey("OutputStream", related_name="chunks", on_delete=models.CASCADE)
+    seq = models.IntegerField(help_text="分块序号，从 0 开始")
+    start_line = models.IntegerField(help_text="分块中首行在整个日志中的行号，从 0 开始")
+    line_count = models.IntegerField(help_text="分块包含的行数")
+    codec = models.CharField(max_length=16, help_text="分块数据的压缩格式")
+    data = models.BinaryField(help_text="压缩后的分块数据")
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["seq"]
+        unique_together = ("output_stream", "seq")
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+"""Informer-style cache of kubernetes resources, shared by all list-watch requests in current process
+
+Every informer lists the resources once and then keeps one watch stream to the apiserver, the resources
+are kept in an in-memory store together with the latest resourceVersion, and the recent events are kept
+in a bounded log for replaying. Subscribers receive events by their own bounded queues, so the number of
+watch streams to the apiserver no longer grows with the number of viewers.
+
+NOTE: The watch loop runs in a thread, which becomes a greenlet when the gevent worker is used.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Generic, Hashable, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from django.db import connection
+
+from paas_wl.infras.resources.kube_res.base import AppEntity, ResourceList, WatchEvent
+
+logger = logging.getLogger(__name__)
+
+AET = TypeVar("AET", bound=AppEntity)
+
+# Lists all resources, returns the items together with the resourceVersion
+ListFunc = Callable[[], ResourceList]
+# Watches the resources, params: resource_version, timeout_seconds
+WatchFunc = Callable[[Optional[str], int], Iterator[WatchEvent]]
+
+ERR_TOO_OLD_RV = "too old resource version"
+ERR_SUBSCRIBER_OVERFLOW = "too many pending events, please relist"
+ERR_INFORMER_STOPPED = "informer stopped"
+
+
+def parse_rv(rv: Optional[str]) -> Optional[int]:
+    """Parse the resourceVersion into integer, return None if it's not a valid one.
+
+    The resourceVersion is an opaque string in the protocol, but it's the revision of etcd in practice.
+    """
+    try:
+        return int(rv)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+
+
+class Subscription:
+    """A subscriber of one or more informers, the events are delivered by a bounded queue.
+
+    When the queue is full, the subscription is marked as "overflowed" and gets an ERROR event, the
+    subscriber should relist and watch again.
+    """
+
+    def __init__(self, maxsize: int = 1000):
+        self.queue: "queue.Queue[WatchEvent]" = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+        self._informers: List["ResourceInformer"] = []
+
+    def put(self, event: WatchEvent):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def iter_events(self, timeout_seconds: int) -> Iterator[WatchEvent]:
+        """Iterate over the events until timeout, stop after an ERROR event was yielded."""
+        deadline = time.monotonic() + timeout_seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            if self.overflowed:
+                yield WatchEvent(type="ERROR", error_message=ERR_SUBSCRIBER_OVERFLOW)
+                return
+            try:
+                event = self.queue.get(timeout=min(remaining, 1))
+            except queue.Empty:
+                continue
+            yield event
+            if event.type == "ERROR":
+                return
+
+    def close(self):
+        for informer in self._informers:
+            informer.unsubscribe(self)
+        self._informers = []
+
+
+class ResourceInformer(Generic[AET]):
+    """Keeps a store of resources by list-watch, see module docstring for details.
+
+    :param key: The unique key of the informer
+    :param list_func: The function to list all resources
+    :param watch_func: The function to watch resources
+    """
+
+    # Timeout of every watch request, a new watch will start from the latest resourceVersion after timeout
+    WATCH_TIMEOUT_SECONDS = 60
+    # Max number of events kept for replaying
+    EVENT_LOG_SIZE = 1000
+    # The informer stops when nobody used it for this long
+    IDLE_SECONDS = 60
+
+    def __init__(self, key: Hashable, list_func: ListFunc, watch_func: WatchFunc):
+        self.key = key
+        self.list_func = list_func
+        self.watch_func = watch_func
+
+        self._store: Dict[str, AET] = {}
+        self._rv: Optional[str] = None
+        # Events whose resourceVersion is greater than `_log_since` are all kept in the log, unless evicted
+        self._log: Deque[Tuple[int, WatchEvent[AET]]] = deque(maxlen=self.EVENT_LOG_SIZE)
+        self._log_since: Optional[int] = None
+
+        self._synced = False
+        self._stopped = False
+        self._subscribers: Set[Subscription] = set()
+        self._last_used = time.monotonic()
+        self._lock = threading.RLock()
+        # Make sure only one list request is running at the same time
+        self._sync_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped
+
+    def ensure_running(self):
+        """Make sure the store has been synced and the watch loop is running.
+
+        The initial list is done in the caller's thread, so errors raised by the apiserver will be raised
+        to the caller directly.
+        """
+        self._touch()
+        self._sync()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"informer-{self.key}", daemon=True)
+                self._thread.start()
+
+    def snapshot(self) -> Tuple[List[AET], Optional[str]]:
+        """Return all resources in store together with the resourceVersion"""
+        self._touch()
+        with self._lock:
+            return list(self._store.values()), self._rv
+
+    def subscribe(self, subscription: Subscription, resource_version: Optional[str] = None):
+        """Deliver the events after `resource_version` to the subscription
+
+        :param resource_version: If not given, an "ADDED" event will be delivered for every resource
+            in store first, just like watching without resourceVersion.
+        """
+        self._touch()
+        with self._lock:
+            for event in self._replay(resource_version):
+                subscription.put(event)
+            self._subscribers.add(subscription)
+            subscription._informers.append(self)
+
+    def unsubscribe(self, subscription: Subscription):
+        self._touch()
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _replay(self, resource_version: Optional[str]) -> List[WatchEvent[AET]]:
+        if self._stopped:
+            return [WatchEvent(type="ERROR", error_message=ERR_INFORMER_STOPPED)]
+        # The store is going to be replaced by a relist, the subscriber should relist too
+        if not self._synced:
+            return [WatchEvent(type="ERROR", error_message=ERR_TOO_OLD_RV)]
+        if not resource_version:
+            return [WatchEvent(type="ADDED", res_object=obj) for obj in self._store.values()]
+
+        rv = parse_rv(resource_version)
+        oldest = self._log[0][0] if len(self._log) == self._log.maxlen else self._log_since
+        # The events after the given version might have been evicted, or happened before the current list
+        if rv is None or oldest is None or rv < oldest:
+            return [WatchEvent(type="ERROR", error_message=ERR_TOO_OLD_RV)]
+        return [event for event_rv, event in self._log if event_rv > rv]
+
+    def _sync(self):
+        """List resources and replace the store if not synced"""
+        with self._sync_lock:
+            if self._synced:
+                return
+            ret = self.list_func()
+            with self._lock:
+                self._store = {obj.name: obj for obj in ret.items}
+                self._rv = ret.get_resource_version()
+                self._log.clear()
+                self._log_since = parse_rv(self._rv)
+                self._synced = True
+
+    def _run(self):
+        try:
+            while not self._is_idle():
+                connection.close_if_unusable_or_obsolete()
+                self._sync()
+                for event in self.watch_func(self._rv, self.WATCH_TIMEOUT_SECONDS):
+                    if event.type == "ERROR":
+                        logger.warning("Informer %s got watch error: %s, relist", self.key, event.error_message)
+                        self._reset(event)
+                        break
+                    self._apply(event)
+        except Exception:
+            logger.exception("Informer %s stopped unexpectedly", self.key)
+        finally:
+            with self._lock:
+                self._stopped = True
+                self._broadcast(WatchEvent(type="ERROR", error_message=ERR_INFORMER_STOPPED))
+                self._subscribers.clear()
+            _registry.discard(self)
+            # Always close connection in every thread to avoid leaking of database connections
+            connection.close()
+
+    def _apply(self, event: WatchEvent[AET]):
+        obj = event.res_object
+        if obj is None:
+            return
+        rv = obj.get_resource_version()
+        with self._lock:
+            if event.type == "DELETED":
+                self._store.pop(obj.name, None)
+            else:
+                self._store[obj.name] = obj
+            self._rv = rv
+            if (event_rv := parse_rv(rv)) is not None:
+                self._log.append((event_rv, event))
+            self._broadcast(event)
+
+    def _reset(self, error: WatchEvent):
+        """Mark the store as not synced, subscribers will get the error and relist"""
+        with self._lock:
+            self._synced = False
+            self._broadcast(error)
+
+    def _broadcast(self, event: WatchEvent):
+        for subscription in self._subscribers:
+            subscription.put(event)
+
+    def _touch(self):
+        self._last_used = time.monotonic()
+
+    def _is_idle(self) -> bool:
+        with self._lock:
+            return not self._subscribers and time.monotonic() - self._last_used > self.IDLE_SECONDS
+
+
+class _InformerRegistry:
+    """The informers of current process"""
+
+    def __init__(self):
+        self._informers: Dict[Hashable, ResourceInformer] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, list_func: ListFunc, watch_func: WatchFunc) -> ResourceInformer:
+        """Get the informer by key, create one if not exists"""
+        with self._lock:
+            informer = self._informers.get(key)
+            if informer is None or informer.stopped:
+                informer = self._informers[key] = ResourceInformer(key, list_func, watch_func)
+            return informer
+
+    def discard(self, informer: ResourceInformer):
+        with self._lock:
+            if self._informers.get(informer.key) is informer:
+                del self._informers[informer.key]
+
+
+_registry = _InformerRegistry()
+
+
+def get_informer(key: Hashable, list_func: ListFunc, watch_func: WatchFunc) -> ResourceInformer:
+    """Get a running informer by key, the functions are only used when a new informer is created"""
+    informer = _registry.get(key, list_func, watch_func)
+    informer.ensure_running()
+    return informer
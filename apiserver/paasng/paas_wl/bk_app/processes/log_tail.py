@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+"""Shared log tail of process instances
+
+All viewers of the same container share one `follow` log stream: the first subscriber acquires a lock
+in redis and starts a follower, which reads the log stream from kubernetes and publishes the parsed lines
+into a capped redis stream, subscribers(maybe in other processes) read lines from the redis stream. The
+follower stops when no subscriber is alive, or the log stream was ended.
+
+If the follower dies unexpectedly, its lock expires and one of the subscribers takes over.
+
+NOTE: The follower runs in threads, which become greenlets when the gevent worker is used.
+"""
+
+import datetime
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Tuple
+
+from dateutil import parser
+from django.db import connection
+from django.utils.encoding import force_str
+from redis import Redis
+from redis.exceptions import LockError
+from redis.lock import Lock
+from urllib3.exceptions import ReadTimeoutError
+
+from paasng.core.core.storages.redisdb import get_default_redis
+
+logger = logging.getLogger(__name__)
+
+# Max number of lines kept in the redis stream, the trimming is approximate
+STREAM_MAXLEN = 5000
+# Seconds to keep the redis stream after the last write
+STREAM_EXPIRES = 300
+# Expiration seconds of the follower lock, it's renewed by the follower periodically
+LOCK_TIMEOUT = 30
+# A subscriber is considered dead if it has not sent a heartbeat for this long
+SUBSCRIBER_TTL = 30
+HEARTBEAT_INTERVAL = 5
+# Max milliseconds of blocking when a subscriber reads new lines
+READ_BLOCK_MS = 5000
+# Max number of the last entries to scan when taking over a dead follower
+RESUME_SCAN_COUNT = 100
+
+
+class LogResponse(Protocol):
+    """The response of a log stream, iterating it gets the log lines"""
+
+    def __iter__(self) -> Iterator[bytes]: ...
+
+    def close(self): ...
+
+
+# Open the log stream from given time(RFC3339 format)
+OpenStreamFunc = Callable[[str], LogResponse]
+
+
+class LogTailKeys:
+    """Redis keys of a shared log tail"""
+
+    def __init__(self, namespace: str, instance_name: str, container: str):
+        prefix = f"bk_paas3:log_tail:{namespace}:{instance_name}:{container}"
+        self.stream = f"{prefix}:stream"
+        self.lock = f"{prefix}:lock"
+        self.subscribers = f"{prefix}:subscribers"
+
+
+def parse_log_line(line: str) -> Optional[Tuple[str, str]]:
+    """Parse a log line with timestamp, return None if it's not valid.
+
+    :param line: log line, format: "2023-01-01T01:01:01.123456789Z ..."
+    :return: (rfc_timestamp, message)
+    """
+    rfc_timestamp, sep, message = line.partition(" ")
+    if not sep:
+        return None
+    return rfc_timestamp, message.rstrip("\n")
+
+
+_RFC3339_PATTERN = re.compile(r"^(?P<base>[^.]+?)(?:\.(?P<fraction>\d+))?(?P<tz>Z|[+-]\d{2}:\d{2})$")
+
+# The comparable key of a timestamp: (time in seconds, nanoseconds)
+TimestampKey = Tuple[datetime.datetime, int]
+
+
+def parse_timestamp(rfc_timestamp: str) -> Optional[TimestampKey]:
+    """Parse the RFC3339(Nano) timestamp into a comparable key, return None if it's not valid.
+
+    The timestamps can't be compared as strings, because the trailing zeros of the fraction are trimmed
+    by kubernetes, e.g. "01.5Z" is later than "01.52Z" as strings.
+    """
+    if not (m := _RFC3339_PATTERN.match(rfc_timestamp)):
+        return None
+    tz = "+00:00" if m["tz"] == "Z" else m["tz"]
+    try:
+        seconds = datetime.datetime.fromisoformat(m["base"] + tz)
+    except ValueError:
+        return None
+    nanoseconds = int((m["fraction"] or "0")[:9].ljust(9, "0"))
+    return seconds, nanoseconds
+
+
+def to_since_seconds(since_time: str) -> int:
+    """Calculate the seconds elapsed since given time, 1 is added to avoid missing lines caused by precision"""
+    return max(int(time.time() - parser.parse(since_time).timestamp()) + 1, 1)
+
+
+class LogTailFollower:
+    """Reads the log stream of a container and publishes the lines into the redis stream
+
+    :param keys: The redis keys
+    :param lock: The lock acquired for current follower
+    :param open_stream: The function to open the log stream
+    :param since_time: Read lines after this time
+    :param skip_lines: Number of lines at `since_time` which were published already, they are skipped
+        to avoid duplicated lines when taking over a dead follower
+    """
+
+    def __init__(
+        self,
+        keys: LogTailKeys,
+        redis_db: Redis,
+        lock: Lock,
+        open_stream: OpenStreamFunc,
+        since_time: str,
+        skip_lines: int = 0,
+    ):
+        self.keys = keys
+        self.redis_db = redis_db
+        self.lock = lock
+        self.open_stream = open_stream
+        self.since_time = since_time
+        self.skip_lines = skip_lines
+        self._resume_key = parse_timestamp(since_time) if skip_lines else None
+
+        self._response: Optional[LogResponse] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"log-tail-{self.keys.stream}", daemon=True).start()
+        threading.Thread(target=self._keepalive, name=f"log-tail-keepalive-{self.keys.stream}", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._response is not None:
+            # Unblock the reading of log stream
+            self._response.close()
+
+    def _run(self):
+        try:
+            self._response = self.open_stream(self.since_time)
+            if self._stopped.is_set():
+                self._response.close()
+                return
+            for raw_line in self._response:
+                if self._stopped.is_set():
+                    break
+                self.publish_line(force_str(raw_line))
+        except ReadTimeoutError as e:
+            logger.info("Log stream read timeout: %s", e)
+        except Exception:
+            if not self._stopped.is_set():
+                logger.exception("Log tail follower failed, stream: %s", self.keys.stream)
+        finally:
+            self._stopped.set()
+            self.redis_db.xadd(self.keys.stream, {"eof": "1"}, maxlen=STREAM_MAXLEN, approximate=True)
+            self.redis_db.expire(self.keys.stream, STREAM_EXPIRES)
+            try:
+                self.lock.release()
+            except LockError:
+                logger.warning("Log tail lock was lost before releasing, stream: %s", self.keys.stream)
+            # Always close connection in every thread to avoid leaking of database connections
+            connection.close()
+
+    def publish_line(self, line: str):
+        """Parse the line and publish it, the SSE payload is rendered here so subscribers can send it as is"""
+        if not (parsed := parse_log_line(line)):
+            return
+        rfc_timestamp, message = parsed
+        if self._resume_key is not None and (key := parse_timestamp(rfc_timestamp)) is not None:
+            # Skip the lines which were published by the previous follower
+            if key < self._resume_key:
+                return
+            if key == self._resume_key and self.skip_lines > 0:
+                self.skip_lines -= 1
+                return
+            if key > self._resume_key:
+                self._resume_key = None
+        data = json.dumps({"timestamp": rfc_timestamp, "message": message})
+        self.redis_db.xadd(
+            self.keys.stream, {"ts": rfc_timestamp, "data": data}, maxlen=STREAM_MAXLEN, approximate=True
+        )
+
+    def _keepalive(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.lock.extend(LOCK_TIMEOUT, replace_ttl=True)
+                self.redis_db.expire(self.keys.stream, STREAM_EXPIRES)
+                if count_alive_subscribers(self.redis_db, self.keys) == 0:
+                    logger.debug("No subscribers alive, stop log tail follower, stream: %s", self.keys.stream)
+                    self.stop()
+            except LockError:
+                logger.warning("Log tail lock was lost, stop follower, stream: %s", self.keys.stream)
+                self.stop()
+            except Exception:
+                logger.exception("Log tail keepalive failed, stream: %s", self.keys.stream)
+
+
+def count_alive_subscribers(redis_db: Redis, keys: LogTailKeys) -> int:
+    redis_db.zremrangebyscore(keys.subscribers, "-inf", time.time())
+    return redis_db.zcard(keys.subscribers)
+
+
+def try_start_follower(redis_db: Redis, keys: LogTailKeys, open_stream: OpenStreamFunc, since_time: str) -> bool:
+    """Start a follower if no one is running, return whether a new follower was started.
+
+    If the previous follower died without ending the stream, the new one continues after the last published line.
+    """
+    # The lock is released by the follower thread, so it must not be thread local
+    lock = redis_db.lock(keys.lock, timeout=LOCK_TIMEOUT, blocking_timeout=0, thread_local=False)
+    if not lock.acquire():
+        return False
+
+    last_entries = [_decode_fields(fields) for _, fields in redis_db.xrevrange(keys.stream, count=RESUME_SCAN_COUNT)]
+    skip_lines = 0
+    if last_entries and _is_eof(last_entries[0]):
+        # Lines of the previous follower which has ended are useless, start over
+        redis_db.delete(keys.stream)
+    elif last_entries:
+        since_time, skip_lines = _count_last_lines(last_entries)
+    LogTailFollower(keys, redis_db, lock, open_stream, since_time, skip_lines=skip_lines).start()
+    return True
+
+
+def _count_last_lines(entries: List[Dict[str, str]]) -> Tuple[str, int]:
+    """Return the timestamp of the last line and the number of lines with the same timestamp
+
+    :param entries: the entries in reverse order
+    """
+    last_ts = entries[0]["ts"]
+    last_key = parse_timestamp(last_ts)
+    count = 0
+    for fields in entries:
+        if parse_timestamp(fields["ts"]) != last_key:
+            break
+        count += 1
+    return last_ts, count
+
+
+def _decode_fields(fields: Dict) -> Dict[str, str]:
+    return {force_str(k): force_str(v) for k, v in fields.items()}
+
+
+def _is_eof(fields: Dict[str, str]) -> bool:
+    return "eof" in fields
+
+
+def tail_logs(
+    keys: LogTailKeys, open_stream: OpenStreamFunc, since_time: str, redis_db: Optional[Redis] = None
+) -> Iterable[str]:
+    """Tail the logs by the shared follower, the rendered json data of lines after `since_time` are
+    yielded, stop when the log stream was ended.
+
+    NOTE: The follower reads lines since the time given by the subscriber who started it, lines
+    before that are not available to other subscribers.
+
+    :param since_time: RFC3339 format time
+    """
+    redis_db = redis_db or get_default_redis()
+    subscriber_id = uuid.uuid4().hex
+    since_key = parse_timestamp(since_time)
+
+    def _heartbeat():
+        redis_db.zadd(keys.subscribers, {subscriber_id: time.time() + SUBSCRIBER_TTL})
+        redis_db.expire(keys.subscribers, SUBSCRIBER_TTL)
+
+    _heartbeat()
+    try:
+        try_start_follower(redis_db, keys, open_stream, since_time)
+        last_id = "0-0"
+        while True:
+            ret = redis_db.xread({keys.stream: last_id}, count=500, block=READ_BLOCK_MS)
+            _heartbeat()
+            if not ret:
+                # The follower may have died without writing "eof", take it over
+                if not redis_db.exists(keys.lock):
+                    try_start_follower(redis_db, keys, open_stream, since_time)
+                continue
+
+            for entry_id, raw_fields in ret[0][1]:
+                last_id = entry_id
+                fields = _decode_fields(raw_fields)
+                if _is_eof(fields):
+                    return
+                # Skip lines earlier than the requested time, the follower may be started by others earlier
+                key = parse_timestamp(fields["ts"])
+                if since_key is not None and key is not None and key <= since_key:
+                    continue
+                yield fields["data"]
+    finally:
+        redis_db.zrem(keys.subscribers, subscriber_id)
@@ -23,6 +23,7 @@ from django.utils.functional import cached_property
 from kubernetes.client.exceptions import ApiException
 from kubernetes.utils.quantity import parse_quantity
 from six import ensure_text
+from urllib3 import HTTPResponse
 
 from paas_wl.bk_app.applications.constants import WlAppType
 from paas_wl.bk_app.applications.managers import get_metadata
@@ -354,6 +355,23 @@ class ProcessManager:
         :return: Generator yielding log lines
         :raise: InstanceNotFound when instance not found
         """
+        rsp = self.open_instance_logs_stream(process_type, instance_name, container_name, since_seconds, timestamps)
+        for line in rsp:
+            yield ensure_text(line)
+
+    def open_instance_logs_stream(
+        self,
+        process_type: str,
+        instance_name: str,
+        container_name: str | None = None,
+        since_seconds: Optional[int] = None,
+        timestamps: bool = True,
+    ) -> HTTPResponse:
+        """打开进程实例日志流，参数同 `get_instance_logs_stream`
+
+        :return: 未读取内容的 HTTP 响应，迭代可获得日志行(bytes)，调用方可通过 close() 提前结束读取
+        :raise: InstanceNotFound when instance not found
+        """
         if not container_name:
             container_name = process_kmodel.get_by_type(self.wl_app, type=process_type).main_container_name
 
@@ -370,8 +388,7 @@ class ProcessManager:
         k8s_client = get_client_by_app(self.wl_app)
 
         try:
-            for line in KPod(k8s_client).get_log(**params):
-                yield ensure_text(line)
+            return KPod(k8s_client).get_log(**params)
         except ApiException as e:
             if e.status == 400 and "previous terminated container" in json.loads(e.body)["message"]:
                 raise InstanceNotFound("Terminated container not found")
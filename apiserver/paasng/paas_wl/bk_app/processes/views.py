@@ -21,17 +21,14 @@ import logging
 from operator import attrgetter
 from typing import Dict, Optional
 
-from dateutil import parser
 from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from django.utils.translation import gettext as _
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
-from urllib3.exceptions import ReadTimeoutError
 
 from paas_wl.bk_app.applications.constants import WlAppType
 from paas_wl.bk_app.applications.models import WlApp
@@ -43,6 +40,7 @@ from paas_wl.bk_app.processes.exceptions import (
     ProcessOperationTooOften,
     ScaleProcessError,
 )
+from paas_wl.bk_app.processes.log_tail import LogTailKeys, tail_logs, to_since_seconds
 from paas_wl.bk_app.processes.models import ProcessSpec
 from paas_wl.bk_app.processes.processes import ProcessManager, list_cnative_module_processes_specs
 from paas_wl.bk_app.processes.serializers import (
@@ -518,35 +516,25 @@ class InstanceManageViewSet(GenericViewSet, ApplicationCodeInPathMixin):
         slz.is_valid(raise_exception=True)
         data = slz.validated_data
 
-        # 计算时间差(秒)，并加1确保不会因为精度问题漏掉日志
         start_rfc_timestamp = data["since_time"]
-        seconds_elapsed = int((timezone.now() - parser.parse(start_rfc_timestamp)).total_seconds()) + 1
+        wl_app = env.wl_app
+
+        def open_stream(since_time: str):
+            return manager.open_instance_logs_stream(
+                process_type=process_type,
+                instance_name=process_instance_name,
+                since_seconds=to_since_seconds(since_time),
+            )
 
         def resp():
             yield "event: ping\n"
             yield "data: \n\n"
 
+            # 同一容器的所有查看者共享一个日志流，日志行由 follower 解析并渲染后写入 redis
+            keys = LogTailKeys(wl_app.namespace, process_instance_name, process_type)
             try:
-                for log_line in manager.get_instance_logs_stream(
-                    process_type=process_type,
-                    instance_name=process_instance_name,
-                    since_seconds=seconds_elapsed,
-                ):
-                    # log format: "2023-01-01T01:01:01.123456789Z ..."
-                    rfc_timestamp, log_message = log_line.split(" ", 1)
-                    if rfc_timestamp <= start_rfc_timestamp:
-                        # 跳过早于请求时间的日志
-                        continue
-
-                    data = json.dumps(
-                        {
-                            "timestamp": rfc_timestamp,
-                            "message": log_message.rstrip("\n"),
-                        }
-                    )
+                for data in tail_logs(keys, open_stream, since_time=start_rfc_timestamp):
                     yield "event: message\ndata: {}\n\n".format(data)
-            except ReadTimeoutError as e:
-                logger.warning("Log stream read timeout: %s", e)
             finally:
                 # 发送结束事件
                 yield "event: EOF\ndata: \n\n"
@@ -15,16 +15,20 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import copy
 import logging
 import queue
 import threading
-from typing import Any, Generator, List, Optional, Union
+from typing import Any, Callable, Generator, List, Optional, Tuple, Union
 
+from django.conf import settings
 from django.db import connection
 from django.utils.functional import cached_property
 
+from paas_wl.bk_app.applications.constants import WlAppType
 from paas_wl.bk_app.applications.models import WlApp
 from paas_wl.bk_app.processes.controllers import ProcessesInfo, list_ns_processes, list_processes
+from paas_wl.bk_app.processes.informer import ResourceInformer, Subscription, get_informer, parse_rv
 from paas_wl.bk_app.processes.kres_entities import Instance, Process
 from paas_wl.bk_app.processes.readers import (
     ProcessAPIAdapter,
@@ -40,6 +44,58 @@ from paasng.platform.applications.models import ModuleEnvironment
 logger = logging.getLogger(__name__)
 _EVENT_TYPE = WatchEvent[Union[Process, Instance]]
 
+_InformerPair = Tuple[ResourceInformer[Process], ResourceInformer[Instance]]
+
+
+def build_processes_info(
+    informers: _InformerPair,
+    instance_filter: Optional[Callable[[Process, Instance], bool]] = None,
+    skip_empty: bool = False,
+) -> ProcessesInfo:
+    """Build the processes info from the store of informers
+
+    :param instance_filter: if given, only instances passed the filter are bound to the process
+    :param skip_empty: whether to skip the processes which have no instances
+    """
+    proc_informer, inst_informer = informers
+    procs, rv_proc = proc_informer.snapshot()
+    insts, rv_inst = inst_informer.snapshot()
+
+    processes: List[Process] = []
+    for proc in procs:
+        # Objects in store are shared by all requests, never modify them
+        process = copy.copy(proc)
+        process.instances = [
+            inst
+            for inst in insts
+            if inst.process_type == process.type and (instance_filter is None or instance_filter(process, inst))
+        ]
+        if skip_empty and not process.instances:
+            logger.debug("Process %s have no instances", process.type)
+            continue
+        processes.append(process)
+    return ProcessesInfo(processes=processes, rv_proc=rv_proc or "", rv_inst=rv_inst or "")
+
+
+def _has_valid_version(proc: Process, inst: Instance) -> bool:
+    return inst.version > 0
+
+
+def watch_by_informers(
+    informers: _InformerPair, timeout_seconds: int, rv_proc: Optional[int] = None, rv_inst: Optional[int] = None
+) -> Generator["WatchEvent", None, None]:
+    """Watch the process related changes by subscribing to the informers, an ERROR event will be
+    returned if the given resource version is too old, the caller should relist and watch again.
+    """
+    proc_informer, inst_informer = informers
+    subscription = Subscription()
+    try:
+        proc_informer.subscribe(subscription, str(rv_proc) if rv_proc else None)
+        inst_informer.subscribe(subscription, str(rv_inst) if rv_inst else None)
+        yield from subscription.iter_events(timeout_seconds)
+    finally:
+        subscription.close()
+
 
 class ProcInstByEnvListWatcher:
     """ListWatcher for Process(Deployment) & Instance(Pod) of all modules in given environment"""
@@ -71,8 +127,35 @@ class ProcInstByEnvListWatcher:
             raise RuntimeError("当前应用不支持 list-watch 进程信息")
         return namespace
 
+    def get_informers(self) -> _InformerPair:
+        """Get the informers shared by all watchers of current namespace"""
+        cluster_name, namespace = self.cluster_name, self.namespace
+        proc_informer = get_informer(
+            ("namespace", "process", cluster_name, namespace),
+            lambda: ns_process_kmodel.list_by_ns_with_mdata(cluster_name, namespace),
+            lambda rv, timeout: ns_process_kmodel.watch_by_ns(
+                cluster_name=cluster_name, namespace=namespace, resource_version=parse_rv(rv), timeout_seconds=timeout
+            ),
+        )
+        inst_informer = get_informer(
+            ("namespace", "instance", cluster_name, namespace),
+            lambda: ns_instance_kmodel.list_by_ns_with_mdata(cluster_name, namespace),
+            lambda rv, timeout: ns_instance_kmodel.watch_by_ns(
+                cluster_name=cluster_name,
+                namespace=namespace,
+                resource_version=parse_rv(rv),
+                timeout_seconds=timeout,
+                ignore_unknown_objs=True,
+            ),
+        )
+        return proc_informer, inst_informer
+
     def list(self) -> ProcessesInfo:
-        return list_ns_processes(self.cluster_name, self.namespace)
+        if not settings.PROCESS_INFORMER_ENABLED:
+            return list_ns_processes(self.cluster_name, self.namespace)
+        return build_processes_info(
+            self.get_informers(), instance_filter=lambda proc, inst: inst.app == proc.app, skip_empty=True
+        )
 
     def watch(
         self, timeout_seconds: int, rv_proc: Optional[int] = None, rv_inst: Optional[int] = None
@@ -83,6 +166,9 @@ class ProcInstByEnvListWatcher:
         :param rv_proc: if given, only events with greater resource_version will be returned
         :param rv_inst: same as rv_proc, but for ProcInst type
         """
+        if settings.PROCESS_INFORMER_ENABLED:
+            yield from watch_by_informers(self.get_informers(), timeout_seconds, rv_proc, rv_inst)
+            return
 
         event_gens: List = [
             ns_process_kmodel.watch_by_ns(
@@ -130,7 +216,39 @@ class ProcInstByModuleEnvListWatcher:
         """
         # namespace scoped reader 需要新增的 labels 才能使用, 否则会查询不到进程(需要重新部署才会有新的 labels)
         # 因此 ProcInstByModuleEnvListWatcher 仍然使用 wl_app scoped reader 查询进程信息
-        return list_processes(self.env)
+        if not settings.PROCESS_INFORMER_ENABLED:
+            return list_processes(self.env)
+
+        instance_filter = None
+        if self.wl_app.type == WlAppType.DEFAULT:
+            # The watch events are not filtered, so ignore instances with no valid "release_version" label
+            # here, same as `instance_kmodel.list_by_app_with_meta`
+            instance_filter = _has_valid_version
+        return build_processes_info(self.get_informers(), instance_filter=instance_filter)
+
+    def get_informers(self) -> _InformerPair:
+        """Get the informers shared by all watchers of current module environment"""
+        wl_app = self.wl_app
+        labels = ProcessAPIAdapter.app_selector(wl_app)
+        proc_informer = get_informer(
+            ("app", "process", wl_app.name),
+            lambda: process_kmodel.list_by_app_with_meta(wl_app),
+            lambda rv, timeout: process_kmodel.watch_by_app(
+                app=wl_app, labels=labels, resource_version=parse_rv(rv), timeout_seconds=timeout
+            ),
+        )
+        inst_informer = get_informer(
+            ("app", "instance", wl_app.name),
+            lambda: instance_kmodel.list_by_app_with_meta(wl_app),
+            lambda rv, timeout: instance_kmodel.watch_by_app(
+                app=wl_app,
+                labels=labels,
+                resource_version=parse_rv(rv),
+                timeout_seconds=timeout,
+                ignore_unknown_objs=True,
+            ),
+        )
+        return proc_informer, inst_informer
 
     def watch(
         self, timeout_seconds: int, rv_proc: Optional[int] = None, rv_inst: Optional[int] = None
@@ -141,6 +259,10 @@ class ProcInstByModuleEnvListWatcher:
         :param rv_proc: if given, only events with greater resource_version will be returned
         :param rv_inst: same as rv_proc, but for ProcInst type
         """
+        if settings.PROCESS_INFORMER_ENABLED:
+            yield from watch_by_informers(self.get_informers(), timeout_seconds, rv_proc, rv_inst)
+            return
+
         event_gens: List = [
             process_kmodel.watch_by_app(
                 app=self.wl_app,
@@ -20,6 +20,7 @@ from collections import defaultdict
 from typing import Dict, Iterable, List, Optional
 
 import yaml
+from django.conf import settings
 from django.db.models import QuerySet
 from kubernetes.client import Configuration
 from kubernetes.config.kube_config import FileOrData, KubeConfigLoader
@@ -65,6 +66,7 @@ class DBConfigLoader:
         configurations = []
         for api_server in cluster.api_servers.order_by("created"):
             cfg = Configuration(host=api_server.host)
+            cfg.connection_pool_maxsize = settings.K8S_CONNECTION_POOL_MAXSIZE
 
             # TLS 验证主机名（注：False 值也是有效的）
             if cluster.assert_hostname is not None:
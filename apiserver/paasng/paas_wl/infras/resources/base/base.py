@@ -18,8 +18,10 @@
 """Base utils for kubernetes scheduler"""
 
 import logging
+import threading
+import time
 from functools import lru_cache
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 from blue_krill.connections.ha_endpoint_pool import HAEndpointPool
 from django.utils import timezone
@@ -34,9 +36,14 @@ from paasng.core.core.storages.redisdb import get_default_redis
 logger = logging.getLogger(__name__)
 
 
+# Seconds to cache the "last modified" value of the global config in current process, the
+# modifications made by other processes will take effect after at most this many seconds.
+_LAST_MODIFIED_CHECK_INTERVAL = 5
+
+
 def get_global_configuration_pool() -> Dict[str, HAEndpointPool]:
     """Get the global config pool object from cache"""
-    last_modified = _GlobalConfigLastModified().get()
+    last_modified = _last_modified_checker.get()
     return _get_global_configuration_pool(last_modified)
 
 
@@ -56,12 +63,18 @@ def _get_global_configuration_pool(last_modified: str) -> Dict[str, HAEndpointPo
 def invalidate_global_configuration_pool():
     """Invalidate the global config pool object cache"""
     _GlobalConfigLastModified().update()
+    # Take effect in current process immediately, other processes will be aware of the
+    # modification after the local cached value expires.
+    _last_modified_checker.reset()
+    _client_registry.clear()
 
 
 class EnhancedApiClient(BaseApiClient):
     """Enhanced Kubernetes ApiClient, with some extra features:
 
     1. Client-side HA support using multiple endpoints
+    2. Safe to be shared between threads(and greenlets), the configuration elected by
+       `call_api` is stored in thread local storage
 
     Arguments:
 
@@ -70,9 +83,19 @@ class EnhancedApiClient(BaseApiClient):
 
     def __init__(self, ep_pool: HAEndpointPool, *args, **kwargs):
         self.ep_pool = ep_pool
+        self._local = threading.local()
         configuration = ep_pool.get()
         super().__init__(configuration, *args, **kwargs)
 
+    @property  # type: ignore[override]
+    def configuration(self) -> Configuration:
+        """The configuration used by current thread, default to the active one of the pool"""
+        return getattr(self._local, "configuration", None) or self.ep_pool.get()
+
+    @configuration.setter
+    def configuration(self, configuration: Configuration):
+        self._local.configuration = configuration
+
     def call_api(self, *args, **kwargs):
         """Call Kubernetes API"""
         self.ep_pool.elect()
@@ -114,19 +137,76 @@ def get_all_cluster_names() -> List[str]:
 
 
 def get_client_by_cluster_name(cluster_name: str) -> EnhancedApiClient:
-    """Initialize an kubernetes api client object by given context
-
-    TODO/IMPORTANT: Add cache to reuse connection pools which were maintained by every individual client object
+    """Get the kubernetes api client object by given cluster name, the client object is shared
+    in current process, so the connection pools maintained by it can be reused.
     """
     if not cluster_name:
         raise ValueError("context_name must not be empty")
 
-    if cluster_name not in get_all_cluster_names():
-        # if the context which user want to use do not exist, raise a ValueError
-        raise ValueError(f'context "{cluster_name}" not found in settings, all context: {get_all_cluster_names()}')
+    return _client_registry.get(cluster_name)
+
+
+class _ApiClientRegistry:
+    """The registry of api clients in current process, one client per cluster. All clients will be
+    rebuilt when the global config has been modified.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, EnhancedApiClient] = {}
+        self._last_modified: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def get(self, cluster_name: str) -> EnhancedApiClient:
+        last_modified = _last_modified_checker.get()
+        # Fast path without lock
+        if last_modified == self._last_modified and (client := self._clients.get(cluster_name)):
+            return client
+
+        with self._lock:
+            if last_modified != self._last_modified:
+                self._clients = {}
+                self._last_modified = last_modified
+            if client := self._clients.get(cluster_name):
+                return client
+
+            pools = _get_global_configuration_pool(last_modified)
+            if cluster_name not in pools:
+                # if the context which user want to use do not exist, raise a ValueError
+                raise ValueError(f'context "{cluster_name}" not found in settings, all context: {list(pools.keys())}')
+
+            client = self._clients[cluster_name] = EnhancedApiClient(ep_pool=pools[cluster_name])
+            return client
+
+    def clear(self):
+        with self._lock:
+            self._clients = {}
+            self._last_modified = None
+
+
+class _LastModifiedChecker:
+    """Cache the last modified value of the global config in current process for a short time,
+    avoid reading redis on every call.
+    """
+
+    def __init__(self, interval: float = _LAST_MODIFIED_CHECK_INTERVAL):
+        self.interval = interval
+        self._cached: Optional[Tuple[str, float]] = None
+
+    def get(self) -> str:
+        cached = self._cached
+        if cached and time.monotonic() - cached[1] < self.interval:
+            return cached[0]
+
+        value = _GlobalConfigLastModified().get()
+        self._cached = (value, time.monotonic())
+        return value
+
+    def reset(self):
+        self._cached = None
+
 
-    ep_pool = get_global_configuration_pool()[cluster_name]
-    return EnhancedApiClient(ep_pool=ep_pool)
+_last_modified_checker = _LastModifiedChecker()
+_client_registry = _ApiClientRegistry()
 
 
 class _GlobalConfigLastModified:
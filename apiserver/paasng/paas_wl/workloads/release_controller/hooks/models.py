@@ -21,6 +21,7 @@ from typing import TYPE_CHECKING, Dict, List, Optional
 from django.db import models
 from django.utils import timezone
 
+from paas_wl.bk_app.applications.managers.output_stream import LogLine, OutputStreamReader
 from paas_wl.bk_app.applications.models import WlApp
 from paas_wl.bk_app.applications.models.misc import OutputStream
 from paas_wl.utils.constants import CommandStatus, CommandType
@@ -111,8 +112,8 @@ class Command(UuidAuditedModel):
         return self.app.region
 
     @property
-    def lines(self):
-        return self.output_stream.lines.all().order_by("created")
+    def lines(self) -> List[LogLine]:
+        return list(OutputStreamReader(self.output_stream).iter_lines())
 
     @property
     def split_command(self) -> List[str]:
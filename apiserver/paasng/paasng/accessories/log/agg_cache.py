@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+"""Result cache of log aggregations
+
+The date histogram of a time range is split into segments aligned with the histogram buckets:
+
+- closed segments: ended before "now - LOG_AGG_SETTLE_SECONDS", their buckets never change and are cached
+  for a long time
+- the open tail: from the last closed segment to the end, cached for a short time when the time range is absolute,
+  the end of a relative time range moves all the time so its tail is never reused
+- the partial head: from the start to the first aligned boundary, never cached because the start of a relative
+  time range moves all the time
+
+Every run of adjacent missing segments is aggregated by one query, then the buckets of all segments are merged.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import pytz
+from django.conf import settings
+from django.core.cache import cache
+
+from paasng.accessories.log.client import LogClientProtocol
+from paasng.accessories.log.constants import (
+    LOG_AGG_CLOSED_CACHE_TIMEOUT,
+    LOG_AGG_OPEN_CACHE_TIMEOUT,
+    LOG_AGG_SETTLE_SECONDS,
+    LOG_HISTOGRAM_SEGMENT_BUCKETS,
+)
+from paasng.utils.es_log.models import FieldFilter
+from paasng.utils.es_log.search import SmartSearch
+from paasng.utils.es_log.time_range import SmartTimeRange, get_time_delta
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_HEAD = "head"
+SEGMENT_CLOSED = "closed"
+SEGMENT_TAIL = "tail"
+
+
+@dataclass
+class Segment:
+    """A segment of time range, in epoch millis
+
+    :param start: the start time, inclusive
+    :param end: the end time, exclusive
+    :param kind: "head", "closed" or "tail"
+    """
+
+    start: int
+    end: int
+    kind: str
+
+
+def split_time_range(start: int, end: int, segment_ms: int, offset_ms: int, closed_before: int) -> List[Segment]:
+    """Split the time range [start, end) into segments, the boundaries of segments are aligned to `segment_ms`
+    in the time zone whose utc offset is `offset_ms`.
+
+    :param closed_before: the segments which end before this time are closed
+    """
+    first_boundary = math.ceil((start + offset_ms) / segment_ms) * segment_ms - offset_ms
+    if first_boundary >= end:
+        return [Segment(start, end, SEGMENT_HEAD)]
+
+    segments = []
+    if start < first_boundary:
+        segments.append(Segment(start, first_boundary, SEGMENT_HEAD))
+    boundary = first_boundary
+    while boundary + segment_ms <= min(end, closed_before):
+        segments.append(Segment(boundary, boundary + segment_ms, SEGMENT_CLOSED))
+        boundary += segment_ms
+    if boundary < end:
+        segments.append(Segment(boundary, end, SEGMENT_TAIL))
+    return segments
+
+
+def aggregate_date_histogram_cached(
+    log_client: LogClientProtocol, index: str, search: SmartSearch, timeout: int
+) -> List[Dict]:
+    """Aggregate the date histogram with cache, return the buckets like [{"key": ..., "doc_count": ...}, ...]"""
+    interval = search.time_range.detect_date_histogram_interval()
+    interval_ms = int(get_time_delta(interval).total_seconds() * 1000)
+    start, end = _get_time_range_millis(search.time_range)
+    now_ms = int(time.time() * 1000)
+    segments = split_time_range(
+        start,
+        end,
+        segment_ms=interval_ms * LOG_HISTOGRAM_SEGMENT_BUCKETS,
+        offset_ms=_get_utc_offset_millis(),
+        closed_before=now_ms - LOG_AGG_SETTLE_SECONDS * 1000,
+    )
+
+    base_key = _make_base_key("histogram", index, search, interval, settings.TIME_ZONE)
+    # The end must be included in the key of the tail too, ranges with the same tail start may end differently
+    cache_keys = {
+        seg.start: f"{base_key}:{seg.kind}:{seg.start}:{seg.end}"
+        for seg in segments
+        if seg.kind == SEGMENT_CLOSED or (seg.kind == SEGMENT_TAIL and search.time_range.is_absolute)
+    }
+    cached = cache.get_many(list(cache_keys.values()))
+
+    buckets_by_seg: Dict[int, List[Dict]] = {}
+    missing_runs: List[List[Segment]] = []
+    for idx, seg in enumerate(segments):
+        key = cache_keys.get(seg.start)
+        if key and key in cached:
+            buckets_by_seg[seg.start] = cached[key]
+        elif missing_runs and missing_runs[-1][-1] is segments[idx - 1]:
+            missing_runs[-1].append(seg)
+        else:
+            missing_runs.append([seg])
+
+    to_cache: Dict[str, List[Dict]] = {}
+    for run in missing_runs:
+        response = log_client.aggregate_date_histogram(
+            index=index, search=search.with_time_range(run[0].start, run[-1].end), timeout=timeout, interval=interval
+        )
+        for seg in run:
+            buckets_by_seg[seg.start] = []
+        for bucket in response:
+            # The key of the partial head bucket may be earlier than the start of the head segment
+            seg = next((s for s in reversed(run) if s.start <= bucket["key"]), run[0])
+            buckets_by_seg[seg.start].append({"key": bucket["key"], "doc_count": bucket["doc_count"]})
+
+        for seg in run:
+            if seg.kind == SEGMENT_CLOSED:
+                to_cache[cache_keys[seg.start]] = buckets_by_seg[seg.start]
+            elif seg.start in cache_keys:
+                cache.set(cache_keys[seg.start], buckets_by_seg[seg.start], timeout=LOG_AGG_OPEN_CACHE_TIMEOUT)
+    if to_cache:
+        cache.set_many(to_cache, timeout=LOG_AGG_CLOSED_CACHE_TIMEOUT)
+
+    return [bucket for seg in segments for bucket in buckets_by_seg[seg.start]]
+
+
+def aggregate_fields_filters_cached(
+    log_client: LogClientProtocol, index: str, search: SmartSearch, mappings: dict, timeout: int
+) -> List[FieldFilter]:
+    """Aggregate the fields filters with cache. The result of a closed time range is cached for a long time,
+    otherwise it's cached for a short time.
+    """
+    start, end = _get_time_range_millis(search.time_range)
+    closed = search.time_range.is_absolute and end <= int(time.time() * 1000) - LOG_AGG_SETTLE_SECONDS * 1000
+    if search.time_range.is_absolute:
+        time_key = f"{start}-{end}"
+    else:
+        # Requests of the same relative time range in the same period share the result
+        time_key = f"{search.time_range.time_range}:{int(time.time()) // LOG_AGG_OPEN_CACHE_TIMEOUT}"
+    mappings_digest = hashlib.md5(json.dumps(mappings, sort_keys=True).encode()).hexdigest()
+    cache_key = f"{_make_base_key('fields_filters', index, search, mappings_digest)}:{time_key}"
+
+    if (fields_filters := cache.get(cache_key)) is not None:
+        return fields_filters
+
+    fields_filters = log_client.aggregate_fields_filters(
+        index=index, search=search, mappings=mappings, timeout=timeout
+    )
+    cache.set(
+        cache_key, fields_filters, timeout=LOG_AGG_CLOSED_CACHE_TIMEOUT if closed else LOG_AGG_OPEN_CACHE_TIMEOUT
+    )
+    return fields_filters
+
+
+def _get_time_range_millis(time_range: SmartTimeRange):
+    """Get the time range in epoch millis, the end is exclusive"""
+    start, end = time_range.get_head_and_tail(all_epoch_millis=True)
+    return int(start), int(end) + 1
+
+
+def _get_utc_offset_millis(tz_name: Optional[str] = None) -> int:
+    """Get the utc offset of the time zone which is used by the date histogram"""
+    now = datetime.datetime.now(pytz.timezone(tz_name or settings.TIME_ZONE))
+    offset = now.utcoffset()
+    return int(offset.total_seconds() * 1000) if offset else 0
+
+
+def _make_base_key(kind: str, index: str, search: SmartSearch, *parts: str) -> str:
+    """Make the cache key by the query of search, the time range filter is excluded, the time range should
+    be included in the key by the caller.
+    """
+    data = search.with_time_range(0, 0).to_dict()
+    query = data.get("query", {})
+    query["bool"]["filter"] = query["bool"]["filter"][1:]
+    digest = hashlib.md5(json.dumps([index, query, *parts], sort_keys=True).encode()).hexdigest()
+    return f"bk_paas3:log_agg:{kind}:{digest}"
@@ -14,11 +14,14 @@
 #
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
+import datetime
+import hashlib
 import logging
 from operator import attrgetter
-from typing import Dict, List, Optional, Protocol, Tuple, Union
+from typing import Dict, Iterator, List, Optional, Protocol, Tuple, Union
 
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 from elasticsearch import Elasticsearch
 from elasticsearch.helpers import ScanError
@@ -26,7 +29,11 @@ from elasticsearch_dsl.aggs import DateHistogram
 from elasticsearch_dsl.response import AggResponse, Response
 from elasticsearch_dsl.response.aggs import FieldBucketData
 
-from paasng.accessories.log.constants import DEFAULT_LOG_BATCH_SIZE
+from paasng.accessories.log.constants import (
+    DEFAULT_LOG_BATCH_SIZE,
+    ES_INDEXES_CACHE_TIMEOUT,
+    ES_MAPPINGS_CACHE_TIMEOUT,
+)
 from paasng.accessories.log.exceptions import BkLogApiError, LogQueryError, NoIndexError
 from paasng.accessories.log.filters import (
     FieldFilter,
@@ -54,8 +61,18 @@ class LogClientProtocol(Protocol):
     ) -> Tuple[Response, int]:
         """search log(scrolling) from index with search"""
 
-    def aggregate_date_histogram(self, index: str, search: SmartSearch, timeout: int) -> FieldBucketData:
-        """Aggregate time-based histogram"""
+    def iter_scroll_pages(self, index: str, search: SmartSearch, timeout: int, scroll="1m") -> Iterator[Response]:
+        """Iterate over all pages of the search by scrolling, stop when no more hits.
+        The size of each page is determined by the search.
+        """
+
+    def aggregate_date_histogram(
+        self, index: str, search: SmartSearch, timeout: int, interval: Optional[str] = None
+    ) -> FieldBucketData:
+        """Aggregate time-based histogram
+
+        :param interval: the interval of buckets, detected by the time range of search if not given
+        """
 
     def aggregate_fields_filters(
         self, index: str, search: SmartSearch, mappings: dict, timeout: int
@@ -117,11 +134,26 @@ class BKLogClient:
             total = total["value"]
         return response, total
 
-    def aggregate_date_histogram(self, index: str, search: SmartSearch, timeout: int) -> FieldBucketData:
-        """Aggregate time-based histogram"""
+    def iter_scroll_pages(self, index: str, search: SmartSearch, timeout: int, scroll="1m") -> Iterator[Response]:
+        """Iterate over all pages of the search by scrolling, stop when no more hits"""
+        scroll_id = None
+        while True:
+            response, _ = self.execute_scroll_search(index, search, timeout, scroll_id=scroll_id, scroll=scroll)
+            if len(response) == 0:
+                return
+            yield response
+            scroll_id = response._scroll_id
+
+    def aggregate_date_histogram(
+        self, index: str, search: SmartSearch, timeout: int, interval: Optional[str] = None
+    ) -> FieldBucketData:
+        """Aggregate time-based histogram
+
+        :param interval: the interval of buckets, detected by the time range of search if not given
+        """
         agg = DateHistogram(
             field=search.time_field,
-            interval=search.time_range.detect_date_histogram_interval(),
+            interval=interval or search.time_range.detect_date_histogram_interval(),
             time_zone=settings.TIME_ZONE,
             min_doc_count=1,
         )
@@ -232,11 +264,46 @@ class ESLogClient:
             )
         return (response, self._get_response_count(index, search, timeout, response))
 
-    def aggregate_date_histogram(self, index: str, search: SmartSearch, timeout: int) -> FieldBucketData:
-        """Aggregate time-based histogram"""
+    def iter_scroll_pages(self, index: str, search: SmartSearch, timeout: int, scroll="1m") -> Iterator[Response]:
+        """Iterate over all pages of the search by scrolling, stop when no more hits.
+
+        Unlike `execute_scroll_search`, the total count is not queried, and the scroll context is cleared
+        when the iteration is finished or interrupted.
+        """
+        es_index = self._get_indexes(index, search.time_range, timeout)
+        raw_resp = self._client.search(
+            body=search.to_dict(), scroll=scroll, index=es_index, params={"request_timeout": timeout}
+        )
+        scroll_id = None
+        try:
+            while True:
+                scroll_id = raw_resp.get("_scroll_id") or scroll_id
+                response = Response(search.search, raw_resp)
+                if not response.success():
+                    raise ScanError(scroll_id or "none", "Scroll request has failed on some shards.")
+                if len(response) == 0:
+                    return
+                yield response
+                raw_resp = self._client.scroll(
+                    scroll_id=scroll_id, params={"scroll": scroll, "request_timeout": timeout}
+                )
+        finally:
+            if scroll_id:
+                try:
+                    self._client.clear_scroll(scroll_id=scroll_id, params={"request_timeout": timeout})
+                except Exception:
+                    logger.warning("failed to clear scroll: %s", scroll_id)
+
+    def aggregate_date_histogram(
+        self, index: str, search: SmartSearch, timeout: int, interval: Optional[str] = None
+    ) -> FieldBucketData:
+        """Aggregate time-based histogram
+
+        :param interval: the interval of buckets, detected by the time range of search if not given
+        """
         agg = DateHistogram(
             field=search.time_field,
-            interval=search.time_range.detect_date_histogram_interval(),
+            interval=interval or search.time_range.detect_date_histogram_interval(),
             time_zone=settings.TIME_ZONE,
             min_doc_count=1,
         )
@@ -275,6 +342,11 @@ class ESLogClient:
         # 当前假设同一批次的 index(类似 aa-2021.04.20,aa-2021.04.19) 拥有相同的 mapping, 因此直接获取最新的 mapping
         # 如果同一批次 index mapping 发生变化，可能会导致日志查询为空
         es_index = self._get_indexes(index, time_range, timeout)
+        # 同一批 indexes 的 mapping 很少变化, 缓存以减少对 ES 的请求
+        cache_key = self._make_cache_key("mappings", index, ",".join(sorted(es_index)))
+        if (docs_mappings := cache.get(cache_key)) is not None:
+            return docs_mappings
+
         all_mappings = self._client.indices.get_mapping(index=es_index, params={"request_timeout": timeout})
         # 由于手动创建会没有 properties, 需要将无 properties 的 mappings 过滤掉
         all_not_empty_mappings = {
@@ -283,19 +355,15 @@ class ESLogClient:
         if not all_not_empty_mappings:
             raise LogQueryError(_("No mappings available, maybe index does not exist or no logs at all"))
         first_mapping = all_not_empty_mappings[sorted(all_not_empty_mappings, reverse=True)[0]]
-        docs_mappings: Dict = first_mapping["mappings"]["properties"]
+        docs_mappings = first_mapping["mappings"]["properties"]
+        cache.set(cache_key, docs_mappings, timeout=_cache_timeout(ES_MAPPINGS_CACHE_TIMEOUT))
         return docs_mappings
 
     def _get_indexes(self, index: str, time_range: SmartTimeRange, timeout: int) -> List[str]:
         """Get indexes within the time_range range from ES"""
         # 为了避免 ES 会提前创建 index 导致无法查询到 mappings, 需要精准控制使用的 indexes
         # 为了避免 ES indexes 未即时清理, 导致查询的 indexes 范围过大, 需要精准控制使用的 indexes
-        # Note: 使用 stats 接口优化查询性能
-        all_indexes = list(
-            self._client.indices.stats(
-                index=index, metric="fielddata", params={"request_timeout": timeout, "level": "indices"}
-            )["indices"].keys()
-        )
+        all_indexes = self._list_indexes(index, timeout)
         if filtered_indexes := filter_indexes_by_time_range(all_indexes, time_range=time_range):
             return filtered_indexes
         # 当无法匹配到 indexes 时, 实际上也会查询不到日志, 所以无需报错, 只需要返回一部分 index 提供给 ES 查询即可
@@ -303,6 +371,31 @@ class ESLogClient:
             raise NoIndexError
         return sorted(all_indexes)[-10:]
 
+    def _list_indexes(self, index: str, timeout: int) -> List[str]:
+        """List all indexes matching the index pattern, the result is cached for a short time"""
+        cache_key = self._make_cache_key("indexes", index)
+        if (all_indexes := cache.get(cache_key)) is not None:
+            return all_indexes
+
+        # Note: 使用 stats 接口优化查询性能
+        all_indexes = list(
+            self._client.indices.stats(
+                index=index, metric="fielddata", params={"request_timeout": timeout, "level": "indices"}
+            )["indices"].keys()
+        )
+        # 不缓存空结果, 以便 index 创建后能被立即查询到
+        if all_indexes:
+            cache.set(cache_key, all_indexes, timeout=_cache_timeout(ES_INDEXES_CACHE_TIMEOUT))
+        return all_indexes
+
+    def _make_cache_key(self, kind: str, *parts: str) -> str:
+        """Make the cache key, which includes the current day(UTC), so that the indexes of the new day are
+        picked up once the day rolls over.
+        """
+        host = f"{self.host.host}:{self.host.port}/{self.host.url_prefix}"
+        digest = hashlib.md5("|".join([host, *parts]).encode()).hexdigest()
+        return f"bk_paas3:es_log:{kind}:{_utc_now().date().isoformat()}:{digest}"
+
     def _get_response_count(
         self, index: Union[str, List[str]], search: SmartSearch, timeout: int, response: Response
     ) -> int:
@@ -314,6 +407,19 @@ class ESLogClient:
         ]
 
 
+def _utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _cache_timeout(timeout: int) -> int:
+    """Limit the cache timeout so that the cache expires at the end of the current day(UTC), the ES indexes
+    are created by day.
+    """
+    now = _utc_now()
+    tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), now.tzinfo)
+    return max(min(timeout, int((tomorrow - now).total_seconds())), 1)
+
+
 def instantiate_log_client(log_config: ElasticSearchConfig, tenant_id: str, bk_username: str) -> LogClientProtocol:
     """实例化 log client 实例"""
     if log_config.backend_type == "bkLog":
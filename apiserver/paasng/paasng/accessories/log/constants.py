@@ -26,6 +26,24 @@ DEFAULT_LOG_BATCH_SIZE = 200
 # 日志平台最多也只返回 10,000 条数据，且不可修改
 MAX_RESULT_WINDOW = 10000
 
+# 导出日志时每次滚动查询的日志条数
+LOG_EXPORT_PAGE_SIZE = 1000
+# 单次导出的最大日志条数
+LOG_EXPORT_MAX_LINES = 1000000
+
+# ES index 列表的缓存时间（秒），新的 index 最晚在该时间后可见
+ES_INDEXES_CACHE_TIMEOUT = 60
+# ES mappings 的缓存时间（秒）
+ES_MAPPINGS_CACHE_TIMEOUT = 300
+
+# 日志聚合结果缓存: 结束时间早于 "当前时间 - LOG_AGG_SETTLE_SECONDS" 的时间段视为已关闭(日志采集存在延迟),
+# 已关闭时间段的聚合结果不再变化, 可长期缓存; 未关闭的时间段仅短暂缓存
+LOG_AGG_SETTLE_SECONDS = 300
+LOG_AGG_CLOSED_CACHE_TIMEOUT = 60 * 60 * 24
+LOG_AGG_OPEN_CACHE_TIMEOUT = 30
+# 直方图每个可缓存时间段包含的桶数量
+LOG_HISTOGRAM_SEGMENT_BUCKETS = 12
+
 
 class LogTimeChoices(StrStructuredEnum):
     """日志搜索-日期范围可选值"""
@@ -56,3 +74,10 @@ class LogCollectorType(StrStructuredEnum):
 
     BK_LOG = EnumField("BK_LOG", label="蓝鲸日志平台采集器")
     ELK = EnumField("ELK", label="平台内置的 ELK 采集器")
+
+
+class LogExportFormat(StrStructuredEnum):
+    """日志导出格式"""
+
+    NDJSON = EnumField("ndjson", label="NDJSON, 每行一条 JSON 格式的日志")
+    TEXT = EnumField("text", label="纯文本, 每行一条日志")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+"""Export logs as a stream, the logs are read page by page by scrolling, so the memory usage is bounded
+no matter how large the time range is.
+"""
+
+import json
+import logging
+import zlib
+from typing import Callable, Iterable, Iterator, List
+
+from elasticsearch_dsl.response import Hit
+
+from paasng.accessories.log.client import LogClientProtocol
+from paasng.accessories.log.constants import LogExportFormat
+from paasng.accessories.log.models import ElasticSearchParams
+from paasng.accessories.log.utils import clean_logs
+from paasng.utils.datetime import convert_timestamp_to_str
+from paasng.utils.es_log.models import FlattenLog
+from paasng.utils.es_log.search import SmartSearch
+
+logger = logging.getLogger(__name__)
+
+
+class LogPages:
+    """The pages of logs, stop after `max_lines` logs were yielded. Whether there were more logs than
+    `max_lines` is available in `truncated` after the iteration is finished.
+
+    :param search: the search whose size has been set to the page size
+    """
+
+    def __init__(self, log_client: LogClientProtocol, index: str, search: SmartSearch, timeout: int, max_lines: int):
+        self.log_client = log_client
+        self.index = index
+        self.search = search
+        self.timeout = timeout
+        self.max_lines = max_lines
+        self.truncated = False
+
+    def __iter__(self) -> Iterator[List[Hit]]:
+        remaining = self.max_lines
+        for response in self.log_client.iter_scroll_pages(index=self.index, search=self.search, timeout=self.timeout):
+            hits = list(response)
+            # The limit was reached at the end of the previous page, there are more logs if this page is not empty
+            if remaining <= 0:
+                self.truncated = bool(hits)
+                return
+
+            if len(hits) > remaining:
+                self.truncated = True
+                yield hits[:remaining]
+                return
+            yield hits
+            remaining -= len(hits)
+
+
+def render_truncated_notice(pages: LogPages, export_format: LogExportFormat) -> Iterator[bytes]:
+    """Render a trailing line to tell the user that the logs were truncated, the line is rendered lazily
+    after all pages were consumed. A response header is not an option because the headers have been
+    sent when the truncation is known.
+    """
+    if pages.truncated:
+        message = f"the logs were truncated, only the first {pages.max_lines} lines were exported"
+        yield _render_notice(export_format, "truncated", message)
+
+
+def guard_stream(content: Iterable[bytes], export_format: LogExportFormat) -> Iterator[bytes]:
+    """The response has been sent when errors happen in the middle of the stream, e.g. the scroll context
+    expired because the client read slowly. Log the error and end the stream with an error line, so the
+    user won't take the file as a complete one.
+    """
+    try:
+        yield from content
+    except Exception:
+        logger.exception("failed to export logs, the stream is truncated")
+        yield _render_notice(export_format, "error", "failed to export logs, the logs after this line are missing")
+
+
+def _render_notice(export_format: LogExportFormat, kind: str, message: str) -> bytes:
+    """Render a notice line in the format of the exported logs, e.g. "[ERROR] {message}" or
+    {"error": true, "message": "{message}"}
+    """
+    if export_format == LogExportFormat.TEXT:
+        return f"[{kind.upper()}] {message}\n".encode()
+    return (json.dumps({kind: True, "message": message}) + "\n").encode()
+
+
+def render_text_lines(pages: Iterable[List[Hit]], search_params: ElasticSearchParams) -> Iterator[bytes]:
+    """Render the logs as plain text, one log per line: "{time} {message}" """
+    for hits in pages:
+        logs = clean_logs(hits, search_params)
+        yield "".join(f"{convert_timestamp_to_str(log['timestamp'])} {log['message']}\n" for log in logs).encode()
+
+
+def render_ndjson_lines(
+    pages: Iterable[List[Hit]],
+    search_params: ElasticSearchParams,
+    to_representation: Callable[[List[FlattenLog]], List],
+) -> Iterator[bytes]:
+    """Render the logs as newline delimited JSON, one log per line
+
+    :param to_representation: the function to convert the logs of one page into JSON serializable objects
+    """
+    for hits in pages:
+        logs = clean_logs(hits, search_params)
+        yield "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in to_representation(logs)).encode()
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress the chunks into a gzip stream"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
@@ -24,7 +24,7 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import get_attribute
 
-from paasng.accessories.log.constants import MAX_RESULT_WINDOW, LogTimeChoices
+from paasng.accessories.log.constants import MAX_RESULT_WINDOW, LogExportFormat, LogTimeChoices
 from paasng.infras.bk_log.constatns import BkLogType
 from paasng.utils.es_log.time_range import SmartTimeRange
 
@@ -157,6 +157,29 @@ class LogQueryParamsSLZ(serializers.Serializer):
         return attrs
 
 
+class LogExportParamsSLZ(serializers.Serializer):
+    """导出日志的 query 参数"""
+
+    time_range = serializers.ChoiceField(choices=LogTimeChoices.get_choices(), required=True)
+    start_time = serializers.DateTimeField(help_text="format %Y-%m-%d %H:%M:%S", allow_null=True, required=False)
+    end_time = serializers.DateTimeField(help_text="format %Y-%m-%d %H:%M:%S", allow_null=True, required=False)
+    format = serializers.ChoiceField(
+        choices=LogExportFormat.get_choices(), default=LogExportFormat.NDJSON, help_text="导出格式"
+    )
+    gzip = serializers.BooleanField(default=False, help_text="是否使用 gzip 压缩")
+
+    def validate(self, attrs):
+        try:
+            SmartTimeRange(
+                time_range=attrs["time_range"],
+                start_time=attrs.get("start_time"),
+                end_time=attrs.get("end_time"),
+            )
+        except ValueError as e:
+            raise ValidationError({"time_range": str(e)})
+        return attrs
+
+
 class LogQueryDSLSLZ(serializers.Serializer):
     """查询日志的 DSL 参数"""
 
@@ -19,10 +19,12 @@ import json
 import logging
 import re
 from functools import wraps
+from itertools import chain
 from typing import TYPE_CHECKING, ClassVar, List, Optional, Tuple, Type
 
 import cattr
 from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.utils.translation import gettext as _
 from drf_yasg.utils import swagger_auto_schema
 from elasticsearch.exceptions import RequestError
@@ -34,10 +36,26 @@ from rest_framework.serializers import Serializer
 from rest_framework.viewsets import ViewSet
 
 from paasng.accessories.log import serializers
+from paasng.accessories.log.agg_cache import aggregate_date_histogram_cached, aggregate_fields_filters_cached
 from paasng.accessories.log.client import instantiate_log_client
-from paasng.accessories.log.constants import DEFAULT_LOG_BATCH_SIZE, MAX_RESULT_WINDOW, LogType
+from paasng.accessories.log.constants import (
+    DEFAULT_LOG_BATCH_SIZE,
+    LOG_EXPORT_MAX_LINES,
+    LOG_EXPORT_PAGE_SIZE,
+    MAX_RESULT_WINDOW,
+    LogExportFormat,
+    LogType,
+)
 from paasng.accessories.log.dsl import SearchRequestSchema
 from paasng.accessories.log.exceptions import BkLogApiError, NoIndexError
+from paasng.accessories.log.export import (
+    LogPages,
+    guard_stream,
+    gzip_stream,
+    render_ndjson_lines,
+    render_text_lines,
+    render_truncated_notice,
+)
 from paasng.accessories.log.filters import EnvFilter, ModuleFilter
 from paasng.accessories.log.models import ElasticSearchParams, ProcessLogQueryConfig
 from paasng.accessories.log.responses import IngressLogLine, StandardOutputLogLine, StructureLogLine
@@ -195,6 +213,7 @@ class LogBaseAPIView(ViewSet, ApplicationCodeInPathMixin):
 
 class LogAPIView(LogBaseAPIView):
     line_model: ClassVar[Type]
+    line_serializer_class: ClassVar[Type[Serializer]]
     logs_serializer_class: ClassVar[Type[Serializer]]
 
     @swagger_auto_schema(
@@ -309,8 +328,11 @@ class LogAPIView(LogBaseAPIView):
             time_field=log_config.search_params.timeField,
         )
         try:
-            response = log_client.aggregate_date_histogram(
-                index=log_config.search_params.indexPattern, search=search, timeout=settings.DEFAULT_ES_SEARCH_TIMEOUT
+            response = aggregate_date_histogram_cached(
+                log_client,
+                index=log_config.search_params.indexPattern,
+                search=search,
+                timeout=settings.DEFAULT_ES_SEARCH_TIMEOUT,
             )
         except (RequestError, BkLogApiError) as e:
             # # 用户输入数据不符合 ES 语法等报错，不需要记录到 Sentry，仅打 error 日志即可
@@ -347,7 +369,8 @@ class LogAPIView(LogBaseAPIView):
             mappings=mappings,
             time_field=log_config.search_params.timeField,
         )
-        fields_filters = log_client.aggregate_fields_filters(
+        fields_filters = aggregate_fields_filters_cached(
+            log_client,
             index=log_config.search_params.indexPattern,
             search=search,
             mappings=mappings,
@@ -359,22 +382,92 @@ class LogAPIView(LogBaseAPIView):
 
         return Response(data=serializers.LogFieldFilterSLZ(fields_filters, many=True).data)
 
+    @swagger_auto_schema(
+        query_serializer=serializers.LogExportParamsSLZ,
+        request_body=serializers.LogQueryBodySLZ,
+    )
+    @transform_noindex_error
+    @transform_bklog_error
+    def export_logs(self, request, code, module_name, environment):
+        """导出日志, 以 NDJSON 或纯文本(可选 gzip 压缩)格式流式返回, 最多导出 LOG_EXPORT_MAX_LINES 条"""
+        slz = serializers.LogExportParamsSLZ(data=request.query_params)
+        slz.is_valid(raise_exception=True)
+        params = slz.validated_data
+
+        log_client, log_config = self.instantiate_log_client()
+        search = self.make_search(
+            mappings=log_client.get_mappings(
+                log_config.search_params.indexPattern,
+                time_range=self.parse_time_range(),
+                timeout=settings.DEFAULT_ES_SEARCH_TIMEOUT,
+            ),
+            time_field=log_config.search_params.timeField,
+        )
+        search = search.limit_offset(limit=LOG_EXPORT_PAGE_SIZE, offset=0)
+        log_pages = LogPages(
+            log_client,
+            index=log_config.search_params.indexPattern,
+            search=search,
+            timeout=settings.DEFAULT_ES_SEARCH_TIMEOUT,
+            max_lines=LOG_EXPORT_MAX_LINES,
+        )
+        pages = iter(log_pages)
+
+        # 查询第一页日志, 以便查询条件有误等异常能正常返回给用户, 而不是中断数据流
+        try:
+            first_page = next(pages, None)
+        except (RequestError, BkLogApiError) as e:
+            # 用户输入数据不符合 ES 语法等报错，不需要记录到 Sentry，仅打 error 日志即可
+            logger.error("request error when exporting logs: %s", e)  # noqa: TRY400
+            raise error_codes.QUERY_REQUEST_ERROR
+        except Exception:
+            logger.exception("failed to export logs")
+            raise error_codes.QUERY_LOG_FAILED.f(_("日志查询失败，请稍后再试。"))
+
+        all_pages = chain([first_page] if first_page is not None else [], pages)
+        if params["format"] == LogExportFormat.TEXT:
+            content = render_text_lines(all_pages, log_config.search_params)
+            filename = f"{code}-{module_name}-{environment}-{self.log_type.lower()}.log"
+        else:
+            content = render_ndjson_lines(all_pages, log_config.search_params, self._lines_to_representation)
+            filename = f"{code}-{module_name}-{environment}-{self.log_type.lower()}.ndjson"
+
+        # 超出最大条数或中途出错时, 在末尾追加一行提示
+        content = chain(content, render_truncated_notice(log_pages, params["format"]))
+        content = guard_stream(content, params["format"])
+        content_type = "text/plain" if params["format"] == LogExportFormat.TEXT else "application/x-ndjson"
+        if params["gzip"]:
+            content = gzip_stream(content)
+            content_type = "application/gzip"
+            filename += ".gz"
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def _lines_to_representation(self, logs: List) -> List:
+        lines = cattr.structure(logs, List[self.line_model])  # type: ignore
+        return self.line_serializer_class(lines, many=True).data
+
 
 class StdoutLogAPIView(LogAPIView):
     line_model = StandardOutputLogLine
     log_type = LogType.STANDARD_OUTPUT
+    line_serializer_class = serializers.StandardOutputLogLineSLZ
     logs_serializer_class = serializers.StandardOutputLogsSLZ
 
 
 class StructuredLogAPIView(LogAPIView):
     line_model = StructureLogLine
     log_type = LogType.STRUCTURED
+    line_serializer_class = serializers.StructureLogLineSLZ
     logs_serializer_class = serializers.StructureLogsSLZ
 
 
 class IngressLogAPIView(LogAPIView):
     line_model = IngressLogLine
     log_type = LogType.INGRESS
+    line_serializer_class = serializers.IngressLogLineSLZ
     logs_serializer_class = serializers.IngressLogSLZ
 
 
@@ -17,7 +17,7 @@
 
 import logging
 import time
-from typing import Dict, Optional, Type, Union
+from typing import Dict, List, Optional, Type, Union
 
 from django.conf import settings
 from iam.exceptions import AuthAPIError
@@ -25,6 +25,7 @@ from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import BasePermission
 
 from paasng.infras.iam.helpers import user_group_apply_url
+from paasng.infras.iam.permissions.batch import BatchPermChecker
 from paasng.infras.iam.permissions.resources.application import AppAction, ApplicationPermission, AppPermCtx
 from paasng.platform.applications.models import Application
 from paasng.platform.modules.models import Module
@@ -54,9 +55,9 @@ def application_perm_class(action: AppAction) -> Type[BasePermission]:
             If the object type is not supported, return `false`.
             """
             if isinstance(obj, Application):
-                return user_has_app_action_perm(request.user, obj, action)
+                return get_app_perm_checker(request).has_perm(obj, action)
             elif isinstance(obj, Module):
-                return user_has_app_action_perm(request.user, obj.application, action)
+                return get_app_perm_checker(request).has_perm(obj.application, action)
             else:
                 raise TypeError(f"Permission check on incorrect type: {type(obj)}")
 
@@ -85,9 +86,9 @@ def app_view_actions_perm(
                 raise ValueError('No app action found for view action "%s".' % view.action)
 
             if isinstance(obj, Application):
-                return user_has_app_action_perm(request.user, obj, action)
+                return get_app_perm_checker(request).has_perm(obj, action)
             elif isinstance(obj, Module):
-                return user_has_app_action_perm(request.user, obj.application, action)
+                return get_app_perm_checker(request).has_perm(obj.application, action)
             else:
                 raise TypeError(f"Permission check on incorrect type: {type(obj)}")
 
@@ -130,3 +131,32 @@ def user_has_app_action_perm(user, application: Application, action: AppAction)
         logger.exception("check user has application perm error.")
 
     return False
+
+
+class AppPermChecker:
+    """检查用户对应用的操作权限，鉴权结果会被缓存，通常随请求创建，见 `get_app_perm_checker`"""
+
+    def __init__(self, user):
+        self.user = user
+        self._checker: BatchPermChecker[Application] = BatchPermChecker(self._fetch, lambda app: app.code)
+
+    def has_perm(self, application: Application, action: AppAction) -> bool:
+        return self._checker.is_allowed(application, action.value)
+
+    def _fetch(self, applications: List[Application], action_ids: List[str]) -> Dict[str, Dict[str, bool]]:
+        # 与 check_application_perm 保持一致，逐个鉴权
+        return {
+            app.code: {
+                action_id: user_has_app_action_perm(self.user, app, AppAction(action_id)) for action_id in action_ids
+            }
+            for app in applications
+        }
+
+
+def get_app_perm_checker(request) -> AppPermChecker:
+    """获取当前请求的应用权限检查器，同一请求内的鉴权结果会被复用"""
+    checker = getattr(request, "_app_perm_checker", None)
+    if checker is None or checker.user is not request.user:
+        checker = AppPermChecker(request.user)
+        request._app_perm_checker = checker
+    return checker
@@ -28,6 +28,9 @@ NEVER_EXPIRE_TIMESTAMP = 4102444800
 # 每一天的秒数
 ONE_DAY_SECONDS = 24 * 60 * 60
 
+# 用户有权限的应用过滤条件（由权限中心策略生成）的缓存时间（单位：秒）
+USER_APP_FILTERS_CACHE_TIMEOUT = 60
+
 # 默认为每个 APP 创建 3 个用户组，分别是管理者，开发者，运营者
 APP_DEFAULT_ROLES = [ApplicationRole.ADMINISTRATOR, ApplicationRole.DEVELOPER, ApplicationRole.OPERATOR]
 
@@ -21,6 +21,7 @@ from bkpaas_auth.core.encoder import user_id_encoder
 from django.conf import settings
 
 from paasng.infras.iam.members.models import ApplicationGradeManager, ApplicationUserGroup
+from paasng.infras.iam.permissions.resources.application import UserAppFiltersCache
 from paasng.platform.applications.constants import ApplicationRole
 from paasng.platform.applications.tenant import get_tenant_id_for_app
 
@@ -63,11 +64,13 @@ def add_role_members(
             usernames=usernames,
         )
 
-    return iam_client.add_user_group_members(
+    ret = iam_client.add_user_group_members(
         user_group_id=ApplicationUserGroup.objects.get(app_code=app_code, role=role).user_group_id,
         usernames=usernames,
         expired_after_days=expired_after_days,
     )
+    UserAppFiltersCache.invalidate(usernames)
+    return ret
 
 
 def delete_role_members(app_code: str, role: ApplicationRole, usernames: Union[List[str], str]):
@@ -88,10 +91,12 @@ def delete_role_members(app_code: str, role: ApplicationRole, usernames: Union[L
             usernames=usernames,
         )
 
-    return iam_client.delete_user_group_members(
+    ret = iam_client.delete_user_group_members(
         user_group_id=ApplicationUserGroup.objects.get(app_code=app_code, role=role).user_group_id,
         usernames=usernames,
     )
+    UserAppFiltersCache.invalidate(usernames)
+    return ret
 
 
 def fetch_user_roles(app_code: str, username: str) -> List[ApplicationRole]:
@@ -153,6 +158,7 @@ def remove_user_all_roles(app_code: str, usernames: Union[List[str], str]):
     # 再将所有的内建角色权限清理掉
     for role in APP_DEFAULT_ROLES:
         iam_client.delete_user_group_members(role_group_id_map[role], usernames)
+    UserAppFiltersCache.invalidate(usernames)
 
 
 def fetch_application_members(app_code: str) -> List[Dict]:
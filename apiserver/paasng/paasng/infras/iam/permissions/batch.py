@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+from typing import Callable, Dict, Generic, List, Sequence, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# 批量鉴权函数，参数为资源对象列表与操作 ID 列表，返回示例 {'resource_id': {'action_id': True}}
+BatchFetchFunc = Callable[[List[T], List[str]], Dict[str, Dict[str, bool]]]
+
+
+class BatchPermChecker(Generic[T]):
+    """批量鉴权并缓存结果，通常随请求创建，即鉴权结果按请求缓存
+
+    未缓存的 (资源, 操作) 组合会合并为一次批量鉴权请求，列表页可以先调用 `prefetch` 获取所有条目的权限，
+    再逐个调用 `is_allowed`
+
+    :param fetch_func: 批量鉴权函数
+    :param key_func: 获取资源对象在权限中心的资源 ID，需要与 fetch_func 返回结果中的资源 ID 一致
+    """
+
+    def __init__(self, fetch_func: BatchFetchFunc[T], key_func: Callable[[T], str]):
+        self.fetch_func = fetch_func
+        self.key_func = key_func
+        self._perms: Dict[Tuple[str, str], bool] = {}
+
+    def prefetch(self, objs: Sequence[T], action_ids: Sequence[str]):
+        """获取未缓存的权限，所有资源与操作仅请求一次"""
+        missing_objs: Dict[str, T] = {}
+        missing_action_ids: Set[str] = set()
+        for obj in objs:
+            key = self.key_func(obj)
+            for action_id in action_ids:
+                if (key, action_id) not in self._perms:
+                    missing_objs[key] = obj
+                    missing_action_ids.add(action_id)
+
+        if not missing_objs:
+            return
+
+        fetch_action_ids = list(missing_action_ids)
+        perms = self.fetch_func(list(missing_objs.values()), fetch_action_ids)
+        for key in missing_objs:
+            res_perms = perms.get(key, {})
+            for action_id in fetch_action_ids:
+                self._perms[(key, action_id)] = bool(res_perms.get(action_id, False))
+
+    def is_allowed(self, obj: T, action_id: str) -> bool:
+        self.prefetch([obj], [action_id])
+        return self._perms[(self.key_func(obj), action_id)]
@@ -17,17 +17,18 @@
 
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Type
+from typing import Dict, List, Optional, Tuple, Type
 
 from attrs import define, field, validators
 from bkpaas_auth.core.encoder import user_id_encoder
 from blue_krill.data_types.enum import EnumField, StrStructuredEnum
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from iam.exceptions import AuthAPIError
 
-from paasng.infras.iam.constants import ResourceType
+from paasng.infras.iam.constants import USER_APP_FILTERS_CACHE_TIMEOUT, ResourceType
 from paasng.infras.iam.permissions.perm import PermCtx, Permission, ResCreatorAction, validate_empty
 from paasng.infras.iam.permissions.request import ResourceRequest
 
@@ -219,11 +220,15 @@ class ApplicationPermission(Permission):
         """根据 IAM Auth Request 生成 Django 的过滤器"""
         key_mapping = {"application.id": "code"}
 
-        try:
-            filters = self._make_iam(tenant_id).make_filter(request, key_mapping=key_mapping)
-        except AuthAPIError as e:
-            logger.warning("generate user app filters failed: %s", str(e))
-            return None
+        filters_cache = UserAppFiltersCache(request.subject.id)
+        found, filters = filters_cache.get(tenant_id, request.action.id)
+        if not found:
+            try:
+                filters = self._make_iam(tenant_id).make_filter(request, key_mapping=key_mapping)
+            except AuthAPIError as e:
+                logger.warning("generate user app filters failed: %s", str(e))
+                return None
+            filters_cache.set(tenant_id, request.action.id, filters)
 
         # 因权限中心同步（用户组成员信息 —> 具体的权限策略）存在时延（约 20s），
         # 因此在应用创建后的短时间内，需特殊豁免以免在列表页无法查询到最新的应用
@@ -236,3 +241,48 @@ class ApplicationPermission(Permission):
 
         # 过滤掉非当前租户的应用
         return (filters & Q(tenant_id=tenant_id)) | perm_exempt_filter
+
+
+class UserAppFiltersCache:
+    """用户有权限的应用过滤条件（由权限中心策略生成）的缓存，避免每次查询用户应用列表都请求权限中心
+
+    用户的成员关系变更后，权限中心策略的同步存在时延，因此除了清理缓存外，还会在一段时间（IAM_PERM_EFFECTIVE_TIMEDELTA）
+    内跳过该用户的缓存，以免缓存了未同步的策略
+    """
+
+    def __init__(self, username: str):
+        self.username = username
+        self._skipped = False
+
+    def get(self, tenant_id: str, action_id: str) -> Tuple[bool, Optional[Q]]:
+        """获取缓存的过滤条件
+
+        :return: (是否命中缓存, 过滤条件)，过滤条件可能为 None（用户没有任何应用的权限）
+        """
+        skip_key, key = self._make_skip_key(self.username), self._make_key(tenant_id, action_id)
+        values = cache.get_many([skip_key, key])
+        if values.get(skip_key):
+            self._skipped = True
+            return False, None
+        if key not in values:
+            return False, None
+        return True, values[key]["filters"]
+
+    def set(self, tenant_id: str, action_id: str, filters: Optional[Q]):
+        if self._skipped:
+            return
+        cache.set(self._make_key(tenant_id, action_id), {"filters": filters}, USER_APP_FILTERS_CACHE_TIMEOUT)
+
+    @classmethod
+    def invalidate(cls, usernames: List[str]):
+        """在用户的成员关系变更后调用，使缓存失效"""
+        # 跳过缓存的时长不小于缓存时间，因此不需要主动删除已有的缓存
+        timeout = max(settings.IAM_PERM_EFFECTIVE_TIMEDELTA, USER_APP_FILTERS_CACHE_TIMEOUT)
+        cache.set_many({cls._make_skip_key(username): 1 for username in usernames}, timeout)
+
+    def _make_key(self, tenant_id: str, action_id: str) -> str:
+        return f"bk_paas3:iam:user_app_filters:{tenant_id}:{self.username}:{action_id}"
+
+    @staticmethod
+    def _make_skip_key(username: str) -> str:
+        return f"bk_paas3:iam:user_app_filters_skipped:{username}"
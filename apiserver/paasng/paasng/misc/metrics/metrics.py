@@ -23,6 +23,8 @@ API_VISITED_COUNTER = Counter("api_visited_counter", "", ("method", "endpoint",
 API_VISITED_TIME_CONSUME_HISTOGRAM = Histogram(
     "api_visited_time_consumed", "", ("method", "endpoint", "status"), buckets=[50, 100, 200, 500, 1000, 2000, 5000]
 )
+# API 请求日志因队列已满或发送失败而被丢弃的条数
+API_LOG_DROPPED_COUNTER = Counter("api_log_dropped", "", ("reason",))
 
 NEW_APP_COUNTER = Counter(
     "new_application",
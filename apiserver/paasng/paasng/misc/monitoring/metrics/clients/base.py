@@ -16,7 +16,7 @@
 # to the current version of the project delivered to anyone in the future.
 
 from dataclasses import dataclass
-from typing import Generator, List, Optional, Protocol, Union
+from typing import Dict, Generator, List, Optional, Protocol, Union
 
 from paasng.misc.monitoring.metrics.constants import MetricsResourceType, MetricsSeriesType
 from paasng.misc.monitoring.metrics.utils import MetricSmartTimeRange
@@ -34,6 +34,29 @@ class MetricClient(Protocol):
         """subclass may raise keyError if not given query_tmpl_config"""
         raise NotImplementedError
 
+    def general_query_by_pod(
+        self, queries: List["MetricQuery"], container_name: str
+    ) -> Generator[Dict[str, "MetricSeriesResult"], None, None]:
+        """query metrics of multiple instances, results of each query are grouped by instance(pod) name"""
+        raise NotImplementedError
+
+    def get_batch_query_promql(
+        self,
+        resource_type: MetricsResourceType,
+        series_type: MetricsSeriesType,
+        instance_names: List[str],
+        cluster_id: str,
+    ) -> str:
+        """get the promql which queries multiple instances at once, may raise KeyError like `get_query_promql`"""
+        raise NotImplementedError
+
+
+def make_instance_pattern(instance_names: List[str]) -> str:
+    """make the regex matches all given instances, the names of pod contain no special chars
+    except ".", which only makes the regex a bit looser, results are split by exact names anyway.
+    """
+    return "|".join(instance_names)
+
 
 @dataclass
 class MetricQuery:
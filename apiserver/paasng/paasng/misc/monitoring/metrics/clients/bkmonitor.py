@@ -22,8 +22,13 @@ from attrs import Factory, define
 
 from paasng.infras.bkmonitorv3.client import make_bk_monitor_client
 from paasng.infras.bkmonitorv3.exceptions import BkMonitorGatewayServiceError
-from paasng.misc.monitoring.metrics.clients.base import MetricQuery, MetricSeriesResult
-from paasng.misc.monitoring.metrics.constants import BKMONITOR_PROMQL_TMPL, MetricsResourceType, MetricsSeriesType
+from paasng.misc.monitoring.metrics.clients.base import MetricQuery, MetricSeriesResult, make_instance_pattern
+from paasng.misc.monitoring.metrics.constants import (
+    BKMONITOR_PROMQL_BATCH_TMPL,
+    BKMONITOR_PROMQL_TMPL,
+    MetricsResourceType,
+    MetricsSeriesType,
+)
 from paasng.misc.monitoring.metrics.exceptions import RequestMetricBackendError
 
 logger = logging.getLogger(__name__)
@@ -31,6 +36,7 @@ logger = logging.getLogger(__name__)
 
 class BkMonitorMetricClient:
     query_tmpl_config = BKMONITOR_PROMQL_TMPL
+    query_batch_tmpl_config = BKMONITOR_PROMQL_BATCH_TMPL
 
     def __init__(self, bk_biz_id: str, tenant_id: str):
         self.bk_biz_id = bk_biz_id
@@ -59,6 +65,40 @@ class BkMonitorMetricClient:
         tmpl = self.query_tmpl_config[resource_type][series_type]
         return tmpl.format(instance_name=instance_name, cluster_id=cluster_id, bk_biz_id=self.bk_biz_id)
 
+    def general_query_by_pod(
+        self, queries: List[MetricQuery], container_name: str
+    ) -> Generator[Dict[str, MetricSeriesResult], None, None]:
+        """查询多个实例的指标数据，每个查询的结果按实例名称分组"""
+        for query in queries:
+            try:
+                if not query.is_ranged or not query.time_range:
+                    raise ValueError("query metric in bkmonitor without time range is unsupported!")  # noqa: TRY301
+
+                results = self._query_range_by_pod(
+                    query.query, container_name=container_name, **query.time_range.to_dict()
+                )
+            except Exception:
+                logger.exception("fetch metrics failed, query: %s.", query.query)
+                # 某些 metrics 如果失败，不影响其他数据
+                results = {}
+
+            yield {
+                pod_name: MetricSeriesResult(type_name=query.type_name, results=values)
+                for pod_name, values in results.items()
+            }
+
+    def get_batch_query_promql(
+        self,
+        resource_type: MetricsResourceType,
+        series_type: MetricsSeriesType,
+        instance_names: List[str],
+        cluster_id: str,
+    ) -> str:
+        tmpl = self.query_batch_tmpl_config[resource_type][series_type]
+        return tmpl.format(
+            instance_pattern=make_instance_pattern(instance_names), cluster_id=cluster_id, bk_biz_id=self.bk_biz_id
+        )
+
     def _query_range(self, promql: str, start: str, end: str, step: str, container_name: str = "") -> List:
         """范围请求API
 
@@ -79,6 +119,19 @@ class BkMonitorMetricClient:
 
         return []
 
+    def _query_range_by_pod(
+        self, promql: str, start: str, end: str, step: str, container_name: str = ""
+    ) -> Dict[str, List]:
+        """范围请求API，结果按实例名称分组，参数同 `_query_range`"""
+        logger.info("prometheus query_range promql: %s, start: %s, end: %s, step: %s", promql, start, end, step)
+        try:
+            series = self._request(promql, start, end, step)
+            raws = BkPromResult.from_series(series).get_raws_by_pod(container_name)
+        except Exception as e:
+            logger.warning("failed to get metric results: %s", e)
+            return {}
+        return {pod_name: raw.get("values", []) for pod_name, raw in raws.items()}
+
     def _request(self, promql: str, start: str, end: str, step: str) -> List:
         """请求蓝鲸监控时序数据 API，若成功则返回 Series 数据(list)，否则抛出异常"""
 
@@ -99,9 +152,12 @@ class BkPromRangeSingleMetric:
     class MetricResult:
         container_name: str
 
+        pod_name: str
+
         def __init__(self, *args, **kwargs):
             _name = kwargs.get("container_name") or kwargs.get("container")
             self.container_name = str(_name)
+            self.pod_name = str(kwargs.get("pod_name") or kwargs.get("pod") or "")
 
         def to_raw(self):
             return dict(container_name=self.container_name)
@@ -164,3 +220,14 @@ class BkPromResult:
                 return i.to_raw()
 
         return None
+
+    def get_raws_by_pod(self, container_name: str = "") -> Dict[str, Dict]:
+        """按实例名称分组获取结果，每个实例的结果选取规则同 `get_raw_by_container_name`"""
+        ret: Dict[str, Dict] = {}
+        for i in self.results:
+            pod_name = i.metric.pod_name
+            if pod_name in ret:
+                continue
+            if not container_name or i.container_name == container_name:
+                ret[pod_name] = i.to_raw()
+        return ret
@@ -17,14 +17,19 @@
 
 import logging
 from dataclasses import dataclass, field
-from typing import Generator, List, Optional, Tuple
+from typing import Dict, Generator, List, Optional, Tuple
 
 import requests
 from requests.auth import HTTPBasicAuth
 from requests.status_codes import codes
 
-from paasng.misc.monitoring.metrics.clients.base import MetricQuery, MetricSeriesResult
-from paasng.misc.monitoring.metrics.constants import RAW_PROMQL_TMPL, MetricsResourceType, MetricsSeriesType
+from paasng.misc.monitoring.metrics.clients.base import MetricQuery, MetricSeriesResult, make_instance_pattern
+from paasng.misc.monitoring.metrics.constants import (
+    RAW_PROMQL_BATCH_TMPL,
+    RAW_PROMQL_TMPL,
+    MetricsResourceType,
+    MetricsSeriesType,
+)
 from paasng.misc.monitoring.metrics.exceptions import RequestMetricBackendError
 
 logger = logging.getLogger(__name__)
@@ -32,6 +37,7 @@ logger = logging.getLogger(__name__)
 
 class PrometheusMetricClient:
     query_tmpl_config = RAW_PROMQL_TMPL
+    query_batch_tmpl_config = RAW_PROMQL_BATCH_TMPL
 
     def __init__(self, basic_auth: Tuple[str, str], host: str):
         self.basic_auth = basic_auth
@@ -60,6 +66,51 @@ class PrometheusMetricClient:
         tmpl = self.query_tmpl_config[resource_type][series_type]
         return tmpl.format(instance_name=instance_name, cluster_id=cluster_id)
 
+    def general_query_by_pod(
+        self, queries: List["MetricQuery"], container_name: str
+    ) -> Generator[Dict[str, "MetricSeriesResult"], None, None]:
+        """查询多个实例的指标数据，每个查询的结果按实例名称分组"""
+        for query in queries:
+            try:
+                if not query.is_ranged or not query.time_range:
+                    raise ValueError("for security reasons, query metric without time range isn't allowed!")  # noqa: TRY301
+
+                results = self._query_range_by_pod(
+                    query.query, container_name=container_name, **query.time_range.to_dict()
+                )
+            except Exception:
+                logger.exception("fetch metrics failed, query: %s", query.query)
+                # 某些 metrics 如果失败，不影响其他数据
+                results = {}
+
+            yield {
+                pod_name: MetricSeriesResult(type_name=query.type_name, results=values)
+                for pod_name, values in results.items()
+            }
+
+    def get_batch_query_promql(
+        self,
+        resource_type: MetricsResourceType,
+        series_type: MetricsSeriesType,
+        instance_names: List[str],
+        cluster_id: str,
+    ) -> str:
+        tmpl = self.query_batch_tmpl_config[resource_type][series_type]
+        return tmpl.format(instance_pattern=make_instance_pattern(instance_names), cluster_id=cluster_id)
+
+    def _query_range_by_pod(self, query, start, end, step, container_name: str = "") -> Dict[str, List]:
+        """范围请求API，结果按实例名称分组，参数同 `_query_range`"""
+        path = "api/v1/query_range"
+        params = {"query": query, "start": start, "end": end, "step": step}
+        logger.info("prometheus query_range: %s", params)
+        result = self._request(method="GET", path=path, params=params, timeout=30)
+        try:
+            raws = PromResult.from_resp(result).get_raws_by_pod(container_name)
+        except ValueError as e:
+            logger.warning("failed to get metric results, for %s", e)
+            return {}
+        return {pod_name: raw.get("values", []) for pod_name, raw in raws.items()}
+
     def _query_range(self, query, start, end, step, container_name: str = "") -> List:
         """范围请求API
 
@@ -116,9 +167,12 @@ class PromRangeSingleMetric:
     class MetricResult:
         container_name: str
 
+        pod_name: str
+
         def __init__(self, *args, **kwargs):
             _name = kwargs.get("container_name") or kwargs.get("container")
             self.container_name = str(_name)
+            self.pod_name = str(kwargs.get("pod_name") or kwargs.get("pod") or "")
 
         def to_raw(self):
             return dict(container_name=self.container_name)
@@ -180,3 +234,14 @@ class PromResult:
                 return i.to_raw()
 
         return None
+
+    def get_raws_by_pod(self, container_name: str = "") -> Dict[str, dict]:
+        """按实例名称分组获取结果，每个实例的结果选取规则同 `get_raw_by_container_name`"""
+        ret: Dict[str, dict] = {}
+        for i in self.results:
+            pod_name = i.metric.pod_name
+            if pod_name in ret:
+                continue
+            if not container_name or i.container_name == container_name:
+                ret[pod_name] = i.to_raw()
+        return ret
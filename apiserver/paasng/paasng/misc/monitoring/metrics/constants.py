@@ -82,3 +82,43 @@ BKMONITOR_PROMQL_TMPL = {
         'pod="{instance_name}",bcs_cluster_id="{cluster_id}",bk_biz_id="{bk_biz_id}"}}',
     },
 }
+
+# 批量查询多个实例指标的 PromQL 模板，instance_pattern 为多个实例名称组成的正则，
+# 查询结果需要带上 pod 相关的 label，以便按实例拆分
+RAW_PROMQL_BATCH_TMPL = {
+    "mem": {
+        "current": "sum by(pod_name, container_name)(container_memory_working_set_bytes{{"
+        'pod_name=~"{instance_pattern}", container_name!="POD", cluster_id="{cluster_id}"}})',
+        "request": "kube_pod_container_resource_requests_memory_bytes"
+        + '{{pod=~"{instance_pattern}", cluster_id="{cluster_id}"}}',
+        "limit": "kube_pod_container_resource_limits_memory_bytes"
+        + '{{pod=~"{instance_pattern}", cluster_id="{cluster_id}"}}',
+    },
+    "cpu": {
+        "current": "sum by (pod_name, container_name)(rate(container_cpu_usage_seconds_total{{"
+        'image!="",container_name!="POD",pod_name=~"{instance_pattern}", cluster_id="{cluster_id}"}}[1m]))',
+        "request": "kube_pod_container_resource_requests_cpu_cores"
+        + '{{pod=~"{instance_pattern}", cluster_id="{cluster_id}"}}',
+        "limit": 'kube_pod_container_resource_limits_cpu_cores{{pod=~"{instance_pattern}", cluster_id="{cluster_id}"}}',
+    },
+}
+
+BKMONITOR_PROMQL_BATCH_TMPL = {
+    "mem": {
+        "current": "sum by(pod_name, container_name)(container_memory_working_set_bytes{{"
+        'pod_name=~"{instance_pattern}",container_name!="POD",bcs_cluster_id="{cluster_id}",bk_biz_id="{bk_biz_id}"}})',
+        "request": "kube_pod_container_resource_requests_memory_bytes{{"
+        'pod=~"{instance_pattern}",bcs_cluster_id="{cluster_id}",bk_biz_id="{bk_biz_id}"}}',
+        "limit": "kube_pod_container_resource_limits_memory_bytes{{"
+        'pod=~"{instance_pattern}",bcs_cluster_id="{cluster_id}",bk_biz_id="{bk_biz_id}"}}',
+    },
+    "cpu": {
+        "current": "sum by(pod_name, container_name)(rate(container_cpu_usage_seconds_total{{"
+        'image!="",pod_name=~"{instance_pattern}",container_name!="POD",'
+        'bcs_cluster_id="{cluster_id}",bk_biz_id="{bk_biz_id}"}}[2m]))',
+        "request": "kube_pod_container_resource_requests_cpu_cores{{"
+        'pod=~"{instance_pattern}",bcs_cluster_id="{cluster_id}",bk_biz_id="{bk_biz_id}"}}',
+        "limit": "kube_pod_container_resource_limits_cpu_cores{{"
+        'pod=~"{instance_pattern}",bcs_cluster_id="{cluster_id}",bk_biz_id="{bk_biz_id}"}}',
+    },
+}
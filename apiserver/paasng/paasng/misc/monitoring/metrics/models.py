@@ -16,8 +16,10 @@
 # to the current version of the project delivered to anyone in the future.
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, Generator, List, Optional
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Dict, Generator, List, Optional, Tuple, TypeVar
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
@@ -44,6 +46,8 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 @dataclass
 class MetricsResourceResult:
@@ -61,10 +65,22 @@ class MetricsInstanceResult:
 
 
 class ResourceMetricManager:
-    def __init__(self, process: "Process", metric_client: MetricClient, bcs_cluster_id: str):
+    """Query resource metrics of process instances
+
+    :param batch_query: whether to query all instances in one query for each series, the results
+        are split by instance name. Otherwise, every instance is queried separately.
+    """
+
+    # Max number of instances in one batched query, avoids the promql being too long
+    BATCH_QUERY_MAX_INSTANCES = 50
+
+    def __init__(
+        self, process: "Process", metric_client: MetricClient, bcs_cluster_id: str, batch_query: bool = False
+    ):
         self.process = process
         self.metric_client = metric_client
         self.bcs_cluster_id = bcs_cluster_id
+        self.batch_query = batch_query
         if not self.process.instances:
             raise ValueError("Process should contain info of instances when querying metrics")
 
@@ -76,8 +92,7 @@ class ResourceMetricManager:
     ) -> Generator[MetricQuery, None, None]:
         """get all series type queries"""
 
-        # not expose request series
-        for series_type in [MetricsSeriesType.CURRENT.value, MetricsSeriesType.LIMIT.value]:
+        for series_type in self._exposed_series_types():
             try:
                 yield self.gen_series_query(series_type, resource_type, instance_name, time_range)  # type: ignore
             except KeyError:
@@ -95,6 +110,19 @@ class ResourceMetricManager:
         promql = self.metric_client.get_query_promql(resource_type, series_type, instance_name, self.bcs_cluster_id)
         return MetricQuery(type_name=series_type, query=promql, time_range=time_range)
 
+    def gen_batch_series_query(
+        self,
+        series_type: MetricsSeriesType,
+        resource_type: MetricsResourceType,
+        instance_names: List[str],
+        time_range: MetricSmartTimeRange,
+    ) -> MetricQuery:
+        """get the metrics type query of multiple instances"""
+        promql = self.metric_client.get_batch_query_promql(
+            resource_type, series_type, instance_names, self.bcs_cluster_id
+        )
+        return MetricQuery(type_name=series_type, query=promql, time_range=time_range)
+
     def get_instance_metrics(
         self,
         instance_name: str,
@@ -103,29 +131,12 @@ class ResourceMetricManager:
         series_type: Optional[MetricsSeriesType] = None,
     ) -> List[MetricsResourceResult]:
         """query metrics at Engine Application level"""
-
-        resource_results = []
-        for resource_type in resource_types:
-            if series_type:
-                queries = [
-                    self.gen_series_query(
-                        series_type=series_type,
-                        resource_type=resource_type,
-                        instance_name=instance_name,
-                        time_range=time_range,
-                    )
-                ]
-            else:
-                queries = list(
-                    self.gen_all_series_query(
-                        resource_type=resource_type, instance_name=instance_name, time_range=time_range
-                    )
-                )
-
-            results = list(self.metric_client.general_query(queries, self.process.main_container_name))
-            resource_results.append(MetricsResourceResult(type_name=resource_type, results=results))
-
-        return resource_results
+        return run_concurrently(
+            [
+                partial(self._query_instance_resource, instance_name, resource_type, time_range, series_type)
+                for resource_type in resource_types
+            ]
+        )
 
     def get_all_instances_metrics(
         self,
@@ -133,22 +144,113 @@ class ResourceMetricManager:
         time_range: MetricSmartTimeRange,
         series_type: Optional[MetricsSeriesType] = None,
     ) -> List[MetricsInstanceResult]:
-        all_instances_metrics = []
-        for instance in self.process.instances:
-            all_instances_metrics.append(
-                MetricsInstanceResult(
-                    instance_name=instance.name,
-                    results=self.get_instance_metrics(
-                        resource_types=resource_types,
-                        instance_name=instance.name,
-                        time_range=time_range,
-                        series_type=series_type,
-                    ),
+        if self.batch_query:
+            return self._get_all_instances_metrics_batched(resource_types, time_range, series_type)
+
+        instance_names = [instance.name for instance in self.process.instances]
+        tasks = [
+            partial(self._query_instance_resource, instance_name, resource_type, time_range, series_type)
+            for instance_name in instance_names
+            for resource_type in resource_types
+        ]
+        results = run_concurrently(tasks)
+
+        # Split the flat results by instance, the order is the same as tasks
+        size = len(resource_types)
+        return [
+            MetricsInstanceResult(instance_name=instance_name, results=results[i * size : (i + 1) * size])
+            for i, instance_name in enumerate(instance_names)
+        ]
+
+    def _query_instance_resource(
+        self,
+        instance_name: str,
+        resource_type: MetricsResourceType,
+        time_range: MetricSmartTimeRange,
+        series_type: Optional[MetricsSeriesType] = None,
+    ) -> MetricsResourceResult:
+        if series_type:
+            queries = [
+                self.gen_series_query(
+                    series_type=series_type,
+                    resource_type=resource_type,
+                    instance_name=instance_name,
+                    time_range=time_range,
+                )
+            ]
+        else:
+            queries = list(
+                self.gen_all_series_query(
+                    resource_type=resource_type, instance_name=instance_name, time_range=time_range
                 )
             )
 
+        results = list(self.metric_client.general_query(queries, self.process.main_container_name))
+        return MetricsResourceResult(type_name=resource_type, results=results)
+
+    def _get_all_instances_metrics_batched(
+        self,
+        resource_types: List[MetricsResourceType],
+        time_range: MetricSmartTimeRange,
+        series_type: Optional[MetricsSeriesType] = None,
+    ) -> List[MetricsInstanceResult]:
+        """query every series of all instances at once, then split the results by instance"""
+        instance_names = [instance.name for instance in self.process.instances]
+        batches = [
+            instance_names[i : i + self.BATCH_QUERY_MAX_INSTANCES]
+            for i in range(0, len(instance_names), self.BATCH_QUERY_MAX_INSTANCES)
+        ]
+        series_types = [series_type] if series_type else self._exposed_series_types()
+
+        # Generate all queries first, series types not exist in query tmpl are skipped
+        queries: List[Tuple[MetricsResourceType, MetricsSeriesType, MetricQuery]] = []
+        for resource_type in resource_types:
+            for s_type in series_types:
+                for names in batches:
+                    try:
+                        query = self.gen_batch_series_query(s_type, resource_type, names, time_range)
+                    except KeyError:
+                        logger.info("%s type not exist in query tmpl", s_type)
+                        break
+                    queries.append((resource_type, s_type, query))
+
+        tasks = [partial(self._query_by_pod, query) for _, _, query in queries]
+        results_by_pod: Dict[Tuple[MetricsResourceType, MetricsSeriesType], Dict[str, MetricSeriesResult]] = {}
+        for (resource_type, s_type, _), ret in zip(queries, run_concurrently(tasks)):
+            results_by_pod.setdefault((resource_type, s_type), {}).update(ret)
+
+        all_instances_metrics = []
+        for instance_name in instance_names:
+            resource_results = []
+            for resource_type in resource_types:
+                series_results = []
+                for s_type in series_types:
+                    if (by_pod := results_by_pod.get((resource_type, s_type))) is None:
+                        continue
+                    # Instances without data get empty results, same as querying them separately
+                    series_results.append(by_pod.get(instance_name, MetricSeriesResult(type_name=s_type, results=[])))
+                resource_results.append(MetricsResourceResult(type_name=resource_type, results=series_results))
+            all_instances_metrics.append(MetricsInstanceResult(instance_name=instance_name, results=resource_results))
         return all_instances_metrics
 
+    def _query_by_pod(self, query: MetricQuery) -> Dict[str, MetricSeriesResult]:
+        return next(self.metric_client.general_query_by_pod([query], self.process.main_container_name))
+
+    @staticmethod
+    def _exposed_series_types() -> List[MetricsSeriesType]:
+        # not expose request series
+        return [MetricsSeriesType.CURRENT.value, MetricsSeriesType.LIMIT.value]  # type: ignore
+
+
+def run_concurrently(tasks: List[Callable[[], T]]) -> List[T]:
+    """Run the tasks by a bounded thread pool, the results are in the same order with tasks"""
+    if len(tasks) <= 1:
+        return [task() for task in tasks]
+
+    max_workers = min(settings.METRICS_QUERY_MAX_WORKERS, len(tasks))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda task: task(), tasks))
+
 
 def get_resource_metric_manager(app: WlApp, process_type: str):
     try:
@@ -188,4 +290,5 @@ def get_resource_metric_manager(app: WlApp, process_type: str):
         process=process,
         metric_client=metric_client,
         bcs_cluster_id=cluster.bcs_cluster_id,
+        batch_query=settings.METRICS_BATCH_QUERY_ENABLED,
     )
@@ -34,7 +34,7 @@ from paasng.core.region.models import get_region
 from paasng.core.tenant.constants import AppTenantMode
 from paasng.core.tenant.fields import tenant_id_field_factory
 from paasng.core.tenant.user import DEFAULT_TENANT_ID, get_tenant
-from paasng.infras.iam.permissions.resources.application import ApplicationPermission
+from paasng.infras.iam.permissions.resources.application import ApplicationPermission, UserAppFiltersCache
 from paasng.platform.applications.constants import AppFeatureFlag, ApplicationRole, ApplicationType
 from paasng.platform.applications.entities import SMartAppArtifactMetadata
 from paasng.platform.modules.constants import SourceOrigin
@@ -226,6 +226,7 @@ class JustLeaveAppManager:
         try:
             self.redis_db.rpush(self.cache_key, app_code)
             self.redis_db.expire(self.cache_key, settings.IAM_PERM_EFFECTIVE_TIMEDELTA)
+            UserAppFiltersCache.invalidate([self.username])
         except Exception:
             pass
 
@@ -74,13 +74,17 @@ def start_bg_build_process(
         stream = ConsoleStream()
 
     build_metadata = cattr.structure(metadata, BuildMetadata)
-    if use_bk_ci_pipeline:
-        logger.info("deployment %s, build process %s use bk_ci pipeline to build image", deploy_id, bp_id)
-        pipeline_bp_executor = PipelineBuildProcessExecutor(deployment, build_process, stream)
-        pipeline_bp_executor.execute(metadata=build_metadata)
-    else:
-        bp_executor = DefaultBuildProcessExecutor(deployment, build_process, stream)
-        bp_executor.execute(metadata=build_metadata)
+    try:
+        if use_bk_ci_pipeline:
+            logger.info("deployment %s, build process %s use bk_ci pipeline to build image", deploy_id, bp_id)
+            pipeline_bp_executor = PipelineBuildProcessExecutor(deployment, build_process, stream)
+            pipeline_bp_executor.execute(metadata=build_metadata)
+        else:
+            bp_executor = DefaultBuildProcessExecutor(deployment, build_process, stream)
+            bp_executor.execute(metadata=build_metadata)
+    finally:
+        # Persist the buffered logs, the stream channel is not closed because it's shared with the deployment
+        stream.flush()
 
 
 def interrupt_build_proc(bp_id: UUID) -> bool:
@@ -75,7 +75,10 @@ def execute_bg_command(uuid: str, stream_channel_id: Optional[str] = None, extra
         stream = ConsoleStream()
 
     executor = AppCommandExecutor(command=command, stream=stream, extra_envs=extra_envs or {})
-    executor.perform()
+    try:
+        executor.perform()
+    finally:
+        stream.flush()
 
 
 @shared_task
@@ -84,5 +87,9 @@ def exec_bkapp_hook(bkapp_name: str, bkapp_deploy_id: int, deployment_id: str):
     hook_name = generate_pre_release_hook_name(bkapp_name, bkapp_deploy_id)
 
     deployment = Deployment.objects.get(pk=deployment_id)
-    dummy_executor = PreReleaseDummyExecutor(deployment, stream=make_channel_stream(deployment, "main"))
-    dummy_executor.start(hook_name)
+    stream = make_channel_stream(deployment, "main")
+    dummy_executor = PreReleaseDummyExecutor(deployment, stream=stream)
+    try:
+        dummy_executor.start(hook_name)
+    finally:
+        stream.flush()
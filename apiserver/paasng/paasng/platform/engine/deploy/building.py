@@ -27,6 +27,7 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.utils.translation import gettext as _
 
 from paas_wl.bk_app.applications.entities import BuildMetadata
+from paas_wl.bk_app.applications.managers.output_stream import OutputStreamReader
 from paas_wl.bk_app.applications.models.build import BuildProcess
 from paas_wl.bk_app.cnative.specs.models import AppModelResource
 from paas_wl.infras.cluster.utils import get_image_registry_by_app
@@ -67,10 +68,16 @@ from paasng.platform.engine.utils.source import (
     get_source_package_path,
     tag_module_from_source_files,
 )
+from paasng.platform.engine.utils.source_cache import (
+    get_cached_source_package,
+    get_source_package_digest,
+    get_source_package_path_by_digest,
+    set_cached_source_package,
+)
 from paasng.platform.engine.workflow import DeploymentCoordinator, DeploymentStateMgr, DeployProcedure, DeployStep
 from paasng.platform.modules.models.module import Module
 from paasng.platform.sourcectl.utils import (
-    ExcludeChecker,
+    DockerIgnore,
     compress_directory_ext,
     generate_temp_dir,
     generate_temp_file,
@@ -113,27 +120,44 @@ def start_build_error_callback(*args, **kwargs):
 class BaseBuilder(DeployStep):
     phase_type = DeployPhaseTypes.BUILD
 
-    def compress_and_upload(self, source_destination_path: str, should_ignore: Optional[ExcludeChecker] = None):
+    def compress_and_upload(self, source_destination_path: str, dockerignore: Optional[DockerIgnore] = None) -> str:
         """Download, compress and upload module source files
 
         :param str source_destination_path: 表示将源码归档包上传至对象存储中的位置.
+        :param dockerignore: 打包时需要忽略的文件
+        :return: 源码归档包在对象存储中的实际位置。可复用的源码包会上传至由内容摘要决定的不可变位置，
+            如果已有内容相同的源码包，则直接复用（不再重复上传）
         """
+        digest = get_source_package_digest(self.deployment, dockerignore)
+        if digest:
+            if cached_path := get_cached_source_package(digest):
+                logger.info(f"Reusing source package {cached_path}, skip uploading to {source_destination_path}")
+                self.stream.write_message(Style.Comment(_("源码版本未变化，复用已上传的源码包")))
+                return cached_path
+            # 其他部署可能正在使用已上传的源码包，因此上传至不会被覆盖的位置
+            source_destination_path = get_source_package_path_by_digest(self.engine_app.region, digest)
+
         module = self.deployment.app_environment.module
         with generate_temp_dir() as working_dir:
             try:
-                _, source_dir = download_source_to_dir(module, self.deployment.operator, self.deployment, working_dir)
+                source_dir = download_source_to_dir(module, self.deployment.operator, self.deployment, working_dir)[1]
             except ValueError as e:
                 self.stream.write_message(Style.Error(str(e)))
                 raise
 
             tag_module_from_source_files(module, source_dir)
             with generate_temp_file(suffix=".tar.gz") as package_path:
-                compress_directory_ext(source_dir, package_path, should_ignore=should_ignore)
+                should_ignore = dockerignore.should_ignore if dockerignore else None
+                # 内容相同时生成完全一致的源码包，便于复用与缓存
+                compress_directory_ext(source_dir, package_path, should_ignore=should_ignore, reproducible=True)
                 check_source_package(self.engine_app, package_path, self.stream)
                 logger.info(f"Uploading source files to {source_destination_path}")
                 make_blob_store(bucket=settings.BLOBSTORE_BUCKET_APP_SOURCE).upload_file(
                     package_path, source_destination_path
                 )
+        if digest:
+            set_cached_source_package(digest, source_destination_path)
+        return source_destination_path
 
     def handle_app_description(self) -> DeployHandleResult:
         """Handle the description files for deployment. It try to parse the app description
@@ -246,8 +270,7 @@ class ApplicationBuilder(BaseBuilder):
                 self.deployment.update_fields(bkapp_revision_id=bkapp_revision_id)
 
         with self.procedure_force_phase("上传仓库代码", phase=preparation_phase):
-            source_destination_path = get_source_package_path(self.deployment)
-            self.compress_and_upload(source_destination_path)
+            source_destination_path = self.compress_and_upload(get_source_package_path(self.deployment))
 
         with self.procedure_force_phase("配置资源实例", phase=preparation_phase) as p:
             self.provision_services(p, module)
@@ -354,9 +377,8 @@ class DockerBuilder(BaseBuilder):
             dockerignore = get_dockerignore(deployment=self.deployment)
 
         with self.procedure_force_phase("上传仓库代码", phase=preparation_phase):
-            source_destination_path = get_source_package_path(self.deployment)
-            self.compress_and_upload(
-                source_destination_path, should_ignore=dockerignore.should_ignore if dockerignore else None
+            source_destination_path = self.compress_and_upload(
+                get_source_package_path(self.deployment), dockerignore=dockerignore
             )
 
         with self.procedure_force_phase("配置资源实例", phase=preparation_phase) as p:
@@ -479,8 +501,8 @@ class BuildProcessPoller(DeployPoller):
 
         # TODO: Use a flag value to indicate the progress of the scanning of the log,
         # so that we won't need to scan the log from the beginning every time.
-        for line in build_proc.output_stream.lines.all().values_list("line", flat=True):
-            update_step_by_line(line, pattern_maps, phase)
+        for log_line in OutputStreamReader(build_proc.output_stream).iter_lines():
+            update_step_by_line(log_line.line, pattern_maps, phase)
 
         logger.info(
             "Finished updating deployment steps, deployment: %s, cost: %s",
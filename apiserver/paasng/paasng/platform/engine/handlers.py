@@ -18,6 +18,7 @@
 import logging
 from typing import TYPE_CHECKING
 
+from django.conf import settings
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -25,6 +26,7 @@ from paasng.platform.applications.models import ModuleEnvironment
 from paasng.platform.engine.constants import JobStatus
 from paasng.platform.engine.models.phases import DeployPhaseTypes
 from paasng.platform.engine.phases_steps.phases import DeployPhaseManager
+from paasng.platform.engine.tasks import compact_deployment_logs_task
 
 from .signals import post_appenv_deploy, post_phase_end, pre_appenv_deploy, pre_phase_start
 
@@ -86,3 +88,11 @@ def update_last_deployed_date(sender, deployment: "Deployment", **kwargs):
 
     env.application.last_deployed_date = now
     env.application.save(update_fields=["last_deployed_date"])
+
+
+@receiver(post_appenv_deploy)
+def compact_deployment_logs(sender, deployment: "Deployment", **kwargs):
+    """Pack the logs of the finished deployment into compressed chunks if enabled."""
+    if not settings.ENGINE_COMPACT_DEPLOY_LOGS:
+        return
+    compact_deployment_logs_task.delay(str(deployment.pk))
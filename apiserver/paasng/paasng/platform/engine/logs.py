@@ -16,6 +16,7 @@
 
 from typing import List, Optional
 
+from paas_wl.bk_app.applications.managers.output_stream import OutputStreamReader, compact_output_stream
 from paas_wl.bk_app.applications.models.build import BuildProcess
 from paas_wl.bk_app.applications.models.misc import OutputStream
 from paasng.core.core.storages.redisdb import get_default_redis
@@ -147,4 +148,20 @@ def get_all_logs(d: Deployment) -> str:
 
 def serialize_stream_logs(output_stream: OutputStream) -> List[str]:
     """Serialize all logs of the given output_stream object."""
-    return [line.line for line in output_stream.lines.all().order_by("created")]
+    return [line.line for line in OutputStreamReader(output_stream).iter_lines()]
+
+
+def compact_deployment_logs(d: Deployment) -> int:
+    """Pack the logs of the given deployment into compressed chunks, should only be called
+    after the deployment has been finished.
+
+    :return: The number of lines packed.
+    """
+    log_streams = DeploymentLogStreams(d)
+    streams: List[Optional[OutputStream]] = [
+        log_streams.preparation_stream,
+        log_streams.build_proc_stream,
+        log_streams.pre_release_cmd_stream,
+        log_streams.main_stream,
+    ]
+    return sum(compact_output_stream(s) for s in streams if s)
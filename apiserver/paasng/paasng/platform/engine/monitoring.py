@@ -24,6 +24,7 @@ from typing import Optional
 import arrow
 from prometheus_client.core import GaugeMetricFamily
 
+from paas_wl.bk_app.applications.managers.output_stream import OutputStreamReader
 from paasng.core.core.storages.cache import region as cache_region
 from paasng.misc.metrics.collector import cb_metric_collector
 from paasng.platform.engine.logs import DeploymentLogStreams
@@ -65,19 +66,17 @@ def deployment_is_frozen(deployment: Deployment, since: datetime.datetime) -> bo
 
     log_streams = DeploymentLogStreams(deployment)
     # TODO: Include more streams besides the building process stream
+    last_written_at = None
     if s := log_streams.build_proc_stream:
-        log_lines = list(s.lines.all())
-    else:
-        log_lines = []
+        last_written_at = OutputStreamReader(s).last_written_at()
 
     # Deployment with no logs lines was frozen
-    if not log_lines:
+    if last_written_at is None:
         return True
 
     # Deployment which has no new lines in `edge_seconds` was frozen
-    last_log_line = log_lines[-1]
     try:
-        last_line_created = arrow.get(last_log_line.created)
+        last_line_created = arrow.get(last_written_at)
     except KeyError:
         # Backward compatibility
         return False
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+"""In-process fan-out hub for stream channels
+
+Every subscriber of a channel used to poll redis and process every event by itself, the hub
+shares one reader per channel in current process: the reader pulls events from redis, renders
+the SSE frames(both with and without ANSI codes) once, and stores them in a bounded buffer,
+subscribers read frames from the buffer.
+
+NOTE: The reader runs in a thread, which becomes a greenlet when the gevent worker is used.
+"""
+
+import bisect
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from blue_krill.redis_tools.messaging import KeyManager, StreamChannelSubscriber
+from django.utils.encoding import force_str
+from redis import Redis
+
+from paasng.platform.engine.utils.ansi import strip_ansi
+from paasng.platform.engine.workflow import ServerSendEvent
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EventFrame:
+    """A rendered SSE frame of a channel event
+
+    :param id: The event id
+    :param raw: The frame which includes the ANSI codes
+    :param stripped: The frame whose ANSI codes in the log line were stripped
+    """
+
+    id: int
+    raw: str
+    stripped: str
+
+    def render(self, include_ansi_codes: bool) -> str:
+        return self.raw if include_ansi_codes else self.stripped
+
+
+def strip_event_line_ansi(line: str) -> str:
+    """Strip the ANSI codes of the log line in a rendered event line, other lines are returned as is."""
+    if not line.startswith("data: "):
+        return line
+    if line.endswith("\n\n"):
+        line = line[:-2]
+
+    content = line[6:]
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return line + "\n\n"
+
+    if not isinstance(data, dict) or "line" not in data:
+        return line + "\n\n"
+    data["line"] = strip_ansi(data["line"])
+    return line[:6] + json.dumps(data) + "\n\n"
+
+
+def make_event_frame(raw_event: dict) -> Optional[EventFrame]:
+    """Render the raw channel event into a frame, return None if the event should not be sent"""
+    e = ServerSendEvent.from_raw(raw_event)
+    if e.is_internal:
+        return None
+    lines = e.to_yield_str_list()
+    return EventFrame(
+        id=int(e.id),
+        raw="".join(lines),
+        stripped="".join(strip_event_line_ansi(line) for line in lines),
+    )
+
+
+def get_channel_state(channel_id: str, redis_db: Redis) -> str:
+    """Get the state of a channel, possible values: "none", "open", "closed", "unknown" """
+    state = force_str(redis_db.get(KeyManager(channel_id).state) or "")
+    if not state:
+        return "none"
+    return state if state in ("open", "closed") else "unknown"
+
+
+class ChannelHub:
+    """Shared reader of a stream channel, frames are kept in a bounded buffer. A subscriber whose
+    cursor has been evicted from the buffer will read the missing events from redis.
+
+    :param channel_id: The id of the stream channel
+    :param redis_db: The redis database where the channel lives
+    :param buffer_size: The max number of frames kept in the buffer
+    """
+
+    DEFAULT_BUFFER_SIZE = 2000
+    # Interval of polling redis when there is no new event
+    POLL_WAIT_SECONDS = 0.05
+    # Max seconds for a subscriber to wait on new frames before checking the state again
+    SUBSCRIBER_WAIT_SECONDS = 1.0
+
+    def __init__(self, channel_id: str, redis_db: Redis, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.channel_id = channel_id
+        self.redis_db = redis_db
+        self.buffer_size = buffer_size
+
+        self._frames: List[EventFrame] = []
+        # The max id of frames which have been evicted from the buffer
+        self._evicted_id = 0
+        self._closed = False
+        self._stopped = False
+        self._subscribers = 0
+        self._cond = threading.Condition()
+        self._reader: Optional[threading.Thread] = None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def subscribe(self, last_event_id: int = 0) -> Iterator[EventFrame]:
+        """Iterate over the frames whose id is greater than `last_event_id`, stop when the channel
+        is closed and all frames have been consumed.
+        """
+        with self._cond:
+            stale = self._stopped
+            if not stale:
+                self._subscribers += 1
+                self._ensure_reader()
+        # The hub was stopped before the subscription starts, subscribe to a new one instead
+        if stale:
+            yield from subscribe_channel(self.channel_id, self.redis_db, last_event_id)
+            return
+
+        try:
+            yield from self._iter_frames(last_event_id)
+        finally:
+            with self._cond:
+                self._subscribers -= 1
+                if self._subscribers == 0:
+                    self._stopped = True
+            if self._stopped:
+                _registry.discard(self)
+
+    def _iter_frames(self, cursor: int) -> Iterator[EventFrame]:
+        while True:
+            history_until = 0
+            with self._cond:
+                if cursor < self._evicted_id:
+                    history_until = self._evicted_id
+                else:
+                    idx = bisect.bisect_right(self._frames, cursor, key=lambda f: f.id)
+                    frames = self._frames[idx:]
+                    if not frames:
+                        if self._closed or self._stopped:
+                            return
+                        self._cond.wait(self.SUBSCRIBER_WAIT_SECONDS)
+                        continue
+
+            if history_until:
+                # The frames after the cursor have been evicted, read them from redis directly
+                yield from self._read_history(cursor, history_until)
+                cursor = history_until
+                continue
+
+            for frame in frames:
+                yield frame
+                cursor = frame.id
+
+    def _read_history(self, after_id: int, until_id: int) -> List[EventFrame]:
+        """Read events in range (after_id, until_id] from redis directly"""
+        items = self.redis_db.lrange(KeyManager(self.channel_id).history, after_id, until_id - 1)
+        frames = []
+        for item in items:
+            raw_event = json.loads(item)
+            if raw_event["event"] in ("init", "close"):
+                continue
+            if frame := make_event_frame(raw_event):
+                frames.append(frame)
+        return frames
+
+    def _ensure_reader(self):
+        if self._reader is not None:
+            return
+        self._reader = threading.Thread(target=self._run_reader, name=f"channel-hub-{self.channel_id}", daemon=True)
+        self._reader.start()
+
+    def _run_reader(self):
+        subscriber = StreamChannelSubscriber(self.channel_id, redis_db=self.redis_db)
+        try:
+            self._read_events(subscriber)
+        except Exception:
+            logger.exception("channel hub reader failed, channel: %s", self.channel_id)
+        finally:
+            subscriber.close()
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+            _registry.discard(self)
+
+    def _read_events(self, subscriber: StreamChannelSubscriber):
+        # The logic is the same with `StreamChannelSubscriber.get_events`, but checks whether the
+        # hub has been stopped in every cycle
+        events = subscriber.get_history_events(last_event_id=0)
+        self._append(events)
+        max_event_id = events[-1]["id"] if events else 0
+        while not self._stopped:
+            if subscriber.is_closed():
+                return
+            event = subscriber.get_event(block=False)
+            if not event:
+                time.sleep(self.POLL_WAIT_SECONDS)
+                continue
+            if event["id"] <= max_event_id or subscriber.is_special_event(event):
+                continue
+            self._append([event])
+
+    def _append(self, raw_events: List[dict]):
+        frames = [f for f in map(make_event_frame, raw_events) if f]
+        if not frames:
+            return
+        with self._cond:
+            self._frames.extend(frames)
+            if (excess := len(self._frames) - self.buffer_size) > 0:
+                self._evicted_id = self._frames[excess - 1].id
+                del self._frames[:excess]
+            self._cond.notify_all()
+
+
+class _HubRegistry:
+    """The hubs of current process, keyed by channel id"""
+
+    def __init__(self):
+        self._hubs: Dict[str, ChannelHub] = {}
+        self._lock = threading.Lock()
+
+    def get(self, channel_id: str, redis_db: Redis) -> ChannelHub:
+        with self._lock:
+            hub = self._hubs.get(channel_id)
+            if hub is None or hub._stopped:
+                hub = self._hubs[channel_id] = ChannelHub(channel_id, redis_db)
+            return hub
+
+    def discard(self, hub: ChannelHub):
+        with self._lock:
+            if self._hubs.get(hub.channel_id) is hub:
+                del self._hubs[hub.channel_id]
+
+
+_registry = _HubRegistry()
+
+
+def subscribe_channel(channel_id: str, redis_db: Redis, last_event_id: int = 0) -> Iterator[EventFrame]:
+    """Subscribe the channel by the shared hub of current process"""
+    return _registry.get(channel_id, redis_db).subscribe(last_event_id)
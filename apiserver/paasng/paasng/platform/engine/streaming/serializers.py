@@ -43,3 +43,6 @@ class StreamingQuerySLZ(serializers.Serializer):
         required=False,
         help_text="是否包含 ANSI 转义序列",
     )
+    last_event_id = serializers.IntegerField(
+        default=0, required=False, help_text="从该事件之后开始推送，优先使用请求头 Last-Event-ID"
+    )
@@ -15,7 +15,6 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
-import json
 from contextlib import closing
 from typing import List
 
@@ -30,13 +29,13 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
 from paasng.core.core.storages.redisdb import get_default_redis
-from paasng.platform.engine.utils.ansi import strip_ansi
 from paasng.platform.engine.workflow import ServerSendEvent
 from paasng.utils.error_codes import error_codes
 from paasng.utils.rate_limit.constants import UserAction
-from paasng.utils.rate_limit.fixed_window import rate_limits_by_user
+from paasng.utils.rate_limit.gcra import rate_limits_by_user
 from paasng.utils.views import EventStreamRender
 
+from .hub import get_channel_state, subscribe_channel
 from .serializers import HistoryEventsQuerySLZ, StreamEventSLZ, StreamingQuerySLZ
 
 
@@ -61,41 +60,25 @@ class StreamViewSet(ViewSet):
         query_serializer = StreamingQuerySLZ(data=request.query_params)
         query_serializer.is_valid(raise_exception=True)
 
-        subscriber = self.get_subscriber(channel_id)
-        include_ansi_codes = query_serializer.validated_data["include_ansi_codes"]
-
-        def process_event_line(line: str) -> str:
-            """处理事件行，过滤掉 ANSI 转义序列"""
-            if include_ansi_codes:
-                return line
-
-            if not line.startswith("data: "):
-                return line
-            if line.endswith("\n\n"):
-                line = line[:-2]
-
-            content = line[6:]
-            try:
-                data = json.loads(content)
-            except json.JSONDecodeError:
-                return line + "\n\n"
+        redis_db = get_default_redis()
+        if get_channel_state(channel_id, redis_db) == "none":
+            raise error_codes.CHANNEL_NOT_FOUND
 
-            if "line" not in data:
-                return line + "\n\n"
-            data["line"] = strip_ansi(data["line"])
-            return line[:6] + json.dumps(data) + "\n\n"
+        include_ansi_codes = query_serializer.validated_data["include_ansi_codes"]
+        # Support resuming by the "Last-Event-ID" header which is sent by the browser when reconnecting
+        last_event_id = query_serializer.validated_data["last_event_id"]
+        try:
+            last_event_id = int(request.headers.get("Last-Event-ID") or last_event_id)
+        except ValueError:
+            pass
 
         def resp():
-            with closing(subscriber):
-                for data in subscriber.get_events():
-                    e = ServerSendEvent.from_raw(data)
-                    if e.is_internal:
-                        continue
-
-                    yield from (process_event_line(line) for line in e.to_yield_str_list())
+            # The events are read and rendered by the shared hub of current process
+            for frame in subscribe_channel(channel_id, redis_db, last_event_id=max(last_event_id, 0)):
+                yield frame.render(include_ansi_codes)
 
-                for s in ServerSendEvent.to_eof_str_list():
-                    yield s
+            for s in ServerSendEvent.to_eof_str_list():
+                yield s
 
         return StreamingHttpResponse(resp(), content_type="text/event-stream")
 
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import logging
+
+from celery import shared_task
+
+from paasng.platform.engine.logs import compact_deployment_logs
+from paasng.platform.engine.models import Deployment
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def compact_deployment_logs_task(deployment_id: str):
+    """Pack the logs of a finished deployment into compressed chunks"""
+    try:
+        deployment = Deployment.objects.get(pk=deployment_id)
+    except Deployment.DoesNotExist:
+        logger.warning("deployment %s not found, skip compacting logs", deployment_id)
+        return
+
+    count = compact_deployment_logs(deployment)
+    logger.info("compacted %s log lines for deployment %s", count, deployment_id)
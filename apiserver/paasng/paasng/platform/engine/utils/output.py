@@ -17,7 +17,9 @@
 import abc
 import json
 import sys
-from typing import Optional, Protocol
+import threading
+import time
+from typing import Iterable, List, Optional, Protocol, Tuple
 
 from blue_krill.data_types.enum import StrStructuredEnum
 from blue_krill.redis_tools.messaging import StreamChannel
@@ -91,6 +93,9 @@ class DeployStream(metaclass=abc.ABCMeta):
     def close(self):
         raise NotImplementedError
 
+    def flush(self):  # noqa: B027
+        """Flush the buffered messages(if any), do nothing by default"""
+
     @classmethod
     @abc.abstractmethod
     def from_deployment_id(cls, deployment_id: str):
@@ -168,6 +173,12 @@ class MessageWriter(Protocol):
     def write(self, line: str, stream: Optional[str]): ...
 
 
+class BulkMessageWriter(MessageWriter, Protocol):
+    """A protocol for types which support writing multiple lines at once"""
+
+    def bulk_write(self, lines: Iterable[Tuple[str, str]]): ...
+
+
 class ModelStream:
     """Stream using model's output_stream field"""
 
@@ -179,23 +190,97 @@ class ModelStream:
         message = sanitize_message(message)
         self.model.write(line=message, stream=stream)
 
+    def flush(self):
+        """Messages were written immediately, nothing to flush"""
+
+
+class BufferedModelStream(ModelStream):
+    """A model stream which buffers messages in memory and writes them to the model in batches,
+    the buffer will be flushed when it reaches `max_lines` or the oldest message has been buffered
+    for more than `flush_interval` seconds.
+
+    NOTE: `flush()` must be called when the stream is no longer used, or the buffered messages
+    will be lost.
+
+    :param model: A model which supports `bulk_write`
+    :param max_lines: Max number of lines to buffer before flushing
+    :param flush_interval: Max seconds to buffer a line before flushing
+    """
+
+    DEFAULT_MAX_LINES = 200
+    DEFAULT_FLUSH_INTERVAL = 2.0
+
+    def __init__(
+        self,
+        model: BulkMessageWriter,
+        max_lines: int = DEFAULT_MAX_LINES,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        super().__init__(model)
+        self.model: BulkMessageWriter = model
+        self.max_lines = max_lines
+        self.flush_interval = flush_interval
+
+        self._buffer: List[Tuple[str, str]] = []
+        self._first_buffered_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def write_message(self, message, stream="STDOUT"):
+        """Write message to buffer, flush the buffer if needed"""
+        message = sanitize_message(message)
+        with self._lock:
+            if not self._buffer:
+                self._first_buffered_at = time.monotonic()
+            self._buffer.append((message, str(stream)))
+            if not self._should_flush():
+                return
+            lines = self._take_buffer()
+        self.model.bulk_write(lines)
+
+    def flush(self):
+        """Write all buffered messages to the model"""
+        with self._lock:
+            lines = self._take_buffer()
+        if lines:
+            self.model.bulk_write(lines)
+
+    def _should_flush(self) -> bool:
+        if len(self._buffer) >= self.max_lines:
+            return True
+        return self._first_buffered_at is not None and (
+            time.monotonic() - self._first_buffered_at >= self.flush_interval
+        )
+
+    def _take_buffer(self) -> List[Tuple[str, str]]:
+        lines, self._buffer = self._buffer, []
+        self._first_buffered_at = None
+        return lines
+
 
 class RedisWithModelStream(RedisChannelStream):
     """A modified redis channel stream which writes message to both model's output_stream
-    and redis channel.
+    and redis channel. Messages are written to the model in batches, call `flush()` or
+    `close()` to make sure all messages have been saved.
 
     :param model: A model which has output_stream field
     :param steam_channel: A redis channel stream
     """
 
-    def __init__(self, model: MessageWriter, stream_channel: StreamChannel):
-        self.model_stream = ModelStream(model)
+    def __init__(self, model: BulkMessageWriter, stream_channel: StreamChannel):
+        self.model_stream = BufferedModelStream(model)
         super().__init__(stream_channel)
 
     def write_message(self, message, stream="STDOUT"):
         self.model_stream.write_message(message, stream)
         super().write_message(message, stream)
 
+    def flush(self):
+        self.model_stream.flush()
+
+    def close(self):
+        self.flush()
+        return super().close()
+
 
 def get_default_stream(deployment: Deployment) -> RedisChannelStream:
     stream_channel = StreamChannel(deployment.id, redis_db=get_default_redis())
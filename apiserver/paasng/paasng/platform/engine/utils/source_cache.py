@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+"""Content-addressed cache of the source packages uploaded to the blobstore
+
+The source package of a deployment is determined by the repository, the resolved revision, the source directory,
+the ignore patterns and the Procfile patched into it. Deployments with the same content, e.g. redeploying the same
+commit, or deploying the same revision to "stag" and then "prod", reuse the package uploaded before instead of
+downloading, compressing and uploading the source again.
+
+The reusable packages are stored at paths derived from the digest, they are never overwritten, so a package is
+safe to use even when it's being fetched by the build of another deployment.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from paasng.platform.applications.constants import ApplicationType
+from paasng.platform.engine.constants import RuntimeType
+from paasng.platform.engine.models import Deployment
+from paasng.platform.modules.constants import SourceOrigin
+from paasng.platform.modules.specs import ModuleSpecs
+from paasng.platform.sourcectl.utils import DockerIgnore
+from paasng.utils.blobstore import make_blob_store
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "bk_paas3:source_package"
+
+
+def get_source_package_digest(deployment: Deployment, dockerignore: Optional[DockerIgnore] = None) -> Optional[str]:
+    """Return the digest of the source package's content, None if the package can't be cached.
+
+    Only the repositories of version control systems are supported, their revisions are immutable.
+    """
+    if not settings.ENGINE_SOURCE_PACKAGE_REUSE_ENABLED:
+        return None
+
+    module = deployment.app_environment.module
+    if ModuleSpecs(module).source_origin_specs.source_origin != SourceOrigin.AUTHORIZED_VCS:
+        return None
+    if not (deployment.source_location and deployment.source_revision):
+        return None
+
+    # Keep the same condition as `download_source_to_dir`, which patches the Procfile into the source
+    procfile_patched = not (
+        module.application.type == ApplicationType.CLOUD_NATIVE
+        and module.build_config.build_method == RuntimeType.DOCKERFILE
+    )
+    payload = {
+        "repo": deployment.source_location,
+        "revision": deployment.source_revision,
+        "source_dir": str(deployment.get_source_dir()),
+        "ignore": [dockerignore.content, sorted(str(p) for p in dockerignore.whitelist)] if dockerignore else None,
+        "procfile": deployment.get_procfile() if procfile_patched else None,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def get_source_package_path_by_digest(region: str, digest: str) -> str:
+    """Return the immutable blobstore path for storing the source package whose content has the digest"""
+    return f"{region}/source-packages/{digest}/tar"
+
+
+def get_cached_source_package(digest: str) -> Optional[str]:
+    """Return the blobstore path of the source package uploaded before, None if not found"""
+    path = cache.get(_make_digest_key(digest))
+    if not path:
+        return None
+
+    try:
+        make_blob_store(bucket=settings.BLOBSTORE_BUCKET_APP_SOURCE).get_file_metadata(key=path)
+    except Exception:
+        logger.warning("The cached source package %s is not available, digest: %s", path, digest)
+        cache.delete(_make_digest_key(digest))
+        return None
+    return path
+
+
+def set_cached_source_package(digest: str, path: str):
+    """Record the blobstore path of the uploaded source package"""
+    cache.set(_make_digest_key(digest), path, timeout=settings.ENGINE_SOURCE_PACKAGE_REUSE_TIMEOUT)
+
+
+def _make_digest_key(digest: str) -> str:
+    return f"{CACHE_KEY_PREFIX}:digest:{digest}"
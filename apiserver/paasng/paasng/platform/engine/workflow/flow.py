@@ -110,6 +110,8 @@ class DeployProcedure:
             logger.exception(msg)
 
         self.stream.write_message(msg, StreamType.STDERR)
+        # Make sure the buffered logs are persisted when the step fails
+        self.stream.flush()
 
         if self.step_obj:
             self.step_obj.mark_and_write_to_stream(self.stream, JobStatus.FAILED)
@@ -16,8 +16,9 @@
 # to the current version of the project delivered to anyone in the future.
 
 import logging
+import math
 from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from kubernetes.utils import parse_quantity
 
@@ -57,6 +58,8 @@ class ResSummary:
     p90: float = 0
     # 最大资源使用量
     max: float = 0
+    # 最小资源使用量
+    min: float = 0
 
 
 @dataclass
@@ -193,68 +196,31 @@ class AppResQuotaCollector:
         )
 
     def _calc_proc_summary(self, proc_spec: Dict, results: List[MetricsInstanceResult]) -> ProcSummary:
-        cpu_metrics, mem_metrics = [], []
-
-        replicas = 0
+        # 按副本（实例）分组的指标序列
+        cpu_series, mem_series = [], []
         for mir in results:
             for mrr in mir.results:
                 if mrr.type_name == MetricsType.CPU.value:
-                    for msr in mrr.results:
-                        cpu_metrics.extend(msr.results)
-                        # 仅统计 CPU 类型即可，内存指标数量应该是一致的
-                        replicas += 1
+                    cpu_series.extend(msr.results for msr in mrr.results)
                 elif mrr.type_name == MetricsType.MEM.value:
-                    for msr in mrr.results:
-                        mem_metrics.extend(msr.results)
+                    mem_series.extend(msr.results for msr in mrr.results)
 
-        if not (cpu_metrics and mem_metrics):
+        if not (any(cpu_series) and any(mem_series)):
             return ProcSummary(name=proc_spec["name"])
 
-        cpu_summary = self._calc_res_summary(cpu_metrics, trans_unit_func=lambda x: x * 1000)
-        mem_summary = self._calc_res_summary(mem_metrics, trans_unit_func=lambda x: x / 1024 / 1024)
         res_quota = self._get_proc_res_quota(proc_spec)
         return ProcSummary(
             name=proc_spec["name"],
-            replicas=replicas,
+            # 仅统计 CPU 类型即可，内存指标数量应该是一致的
+            replicas=len(cpu_series),
             quota=res_quota,
-            cpu=cpu_summary,
-            memory=mem_summary,
+            # CPU 单位：核 -> m
+            cpu=calc_res_summary(cpu_series, scale=1000),
+            # 内存单位：Byte -> Mi
+            memory=calc_res_summary(mem_series, scale=1 / 1024 / 1024),
             current_plan=proc_spec["plan_name"],
         )
 
-    def _calc_res_summary(self, metrics: List, trans_unit_func: Callable) -> ResSummary:
-        summary = ResSummary()
-        # 时间戳本身就是升序的
-        summary.start = metrics[0][0]
-        summary.end = metrics[-1][0]
-        # 只保留指标值，并重新排序
-        metrics = sorted(
-            [
-                # 转换单位，保留两位小数
-                round(trans_unit_func(float(metric)), 2)
-                for _, metric in metrics
-                if (metric and metric != "None")
-            ]
-        )
-        # 可能出现过滤后为空的情况
-        if not metrics:
-            return summary
-
-        # 采样点数量
-        summary.cnt = len(metrics)
-        # 中位数
-        half = len(metrics) // 2
-        summary.med = round((metrics[half] + metrics[~half]) / 2, 2)
-        # 平均值
-        summary.avg = round(sum(metrics) / len(metrics), 2)
-        # p75（注：不是标准 p75，但可以作为参考）
-        summary.p75 = metrics[int(len(metrics) / 4 * 3)]
-        # p90（注：不是标准 p90，但可以作为参考）
-        summary.p90 = metrics[int(len(metrics) / 10 * 9)]
-        # 最大值
-        summary.max = metrics[-1]
-        return summary
-
     def _get_proc_res_quota(self, proc_spec: Dict) -> ResQuota:
         """获取应用的资源套餐方案"""
         res_limits = proc_spec.get("resource_limit", {})
@@ -279,3 +245,55 @@ class AppResQuotaCollector:
     def _format_memory(memory: str) -> int:
         """将内存资源配额转换为以 Mi 为单位的值"""
         return int(parse_quantity(memory) / (1024 * 1024))
+
+
+# 单个副本的指标序列，格式：[(timestamp, value), ...]，value 可能为 None 或 "None" 等无效值
+MetricSeries = Sequence[Tuple[int, Optional[str]]]
+
+
+def calc_res_summary(series_list: Sequence[MetricSeries], scale: float = 1) -> ResSummary:
+    """计算多个副本指标序列的汇总数据，所有副本的采样点一起统计
+
+    单次遍历完成数值转换与无效值过滤，排序一次后计算各项统计值；由于单位转换是线性的，
+    只需对统计结果（而不是每个采样点）做转换。分位数使用线性插值，与 numpy.percentile 默认方法一致。
+
+    :param series_list: 各副本的指标序列，每个序列的时间戳都是升序的
+    :param scale: 单位转换系数，如 CPU 核 -> m 为 1000
+    """
+    summary = ResSummary()
+    series_list = [s for s in series_list if s]
+    if not series_list:
+        return summary
+
+    summary.start = min(s[0][0] for s in series_list)
+    summary.end = max(s[-1][0] for s in series_list)
+
+    values: List[float] = []
+    for series in series_list:
+        # 过滤空值以及 NaN、inf 等无法参与统计的值
+        values.extend(v for v in (float(raw) for _, raw in series if raw and raw != "None") if math.isfinite(v))
+    # 可能出现过滤后为空的情况
+    if not values:
+        return summary
+
+    values.sort()
+    summary.cnt = len(values)
+    summary.min = round(values[0] * scale, 2)
+    summary.max = round(values[-1] * scale, 2)
+    summary.avg = round(math.fsum(values) / len(values) * scale, 2)
+    summary.med = round(percentile(values, 50) * scale, 2)
+    summary.p75 = round(percentile(values, 75) * scale, 2)
+    summary.p90 = round(percentile(values, 90) * scale, 2)
+    return summary
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """计算已排序数据的分位数，使用线性插值（同 numpy.percentile 的 "linear" 方法）
+
+    :param sorted_values: 升序排列的非空数据
+    :param q: 分位数，范围 [0, 100]
+    """
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
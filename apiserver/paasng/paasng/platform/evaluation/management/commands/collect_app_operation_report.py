@@ -27,11 +27,17 @@ Examples:
 
     # 采集全量应用 + 异步执行
     python manage.py collect_app_operation_report --all --async
+
+    # 采集全量应用，不继续上一次未完成的任务
+    python manage.py collect_app_operation_report --all --no-resume
 """
 
 from django.core.management.base import BaseCommand
 
-from paasng.platform.evaluation.tasks import collect_and_update_app_operation_reports
+from paasng.platform.evaluation.tasks import (
+    collect_and_update_app_operation_reports,
+    collect_app_operation_reports_sync,
+)
 
 
 class Command(BaseCommand):
@@ -41,12 +47,15 @@ class Command(BaseCommand):
         parser.add_argument("--codes", dest="app_codes", default=[], nargs="*", help="应用 Code 列表")
         parser.add_argument("--all", dest="collect_all", default=False, action="store_true", help="采集全量应用")
         parser.add_argument("--async", dest="async_run", default=False, action="store_true", help="异步执行")
+        parser.add_argument(
+            "--no-resume", dest="resume", default=True, action="store_false", help="不继续上一次未完成的全量采集任务"
+        )
 
-    def handle(self, app_codes, collect_all, async_run, *args, **options):
+    def handle(self, app_codes, collect_all, async_run, resume, *args, **options):
         if not (collect_all or app_codes):
             raise ValueError("please specify --codes or --all")
 
         if async_run:
-            collect_and_update_app_operation_reports.delay(app_codes)
+            collect_and_update_app_operation_reports.delay(app_codes, resume)
         else:
-            collect_and_update_app_operation_reports(app_codes)
+            collect_app_operation_reports_sync(app_codes, resume)
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.17 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("evaluation", "0005_idleappnotificationmuterule_tenant_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="appoperationreportcollectiontask",
+            name="collect_all",
+            field=models.BooleanField(default=False, verbose_name="是否采集全量应用"),
+        ),
+        migrations.AddField(
+            model_name="appoperationreportcollectiontask",
+            name="app_codes",
+            field=models.JSONField(default=list, verbose_name="待采集应用 Code 列表"),
+        ),
+        migrations.AddField(
+            model_name="appoperationreportcollectiontask",
+            name="chunk_size",
+            field=models.IntegerField(default=0, verbose_name="分片大小"),
+        ),
+        migrations.AddField(
+            model_name="appoperationreportcollectiontask",
+            name="finished_chunks",
+            field=models.JSONField(default=list, verbose_name="已完成的分片序号"),
+        ),
+    ]
@@ -15,6 +15,8 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+from typing import List
+
 from django.db import models
 
 from paasng.core.tenant.fields import tenant_id_field_factory
@@ -41,6 +43,23 @@ class AppOperationReportCollectionTask(models.Model):
         choices=BatchTaskStatus.get_choices(),
         default=BatchTaskStatus.RUNNING,
     )
+    # 任务创建时确定待采集的应用与分片方式，中断后可以从未完成的分片继续采集
+    collect_all = models.BooleanField(verbose_name="是否采集全量应用", default=False)
+    app_codes = models.JSONField(verbose_name="待采集应用 Code 列表", default=list)
+    chunk_size = models.IntegerField(verbose_name="分片大小", default=0)
+    finished_chunks = models.JSONField(verbose_name="已完成的分片序号", default=list)
+
+    def get_chunk(self, idx: int) -> List[str]:
+        """获取指定分片的应用 Code 列表"""
+        return self.app_codes[idx * self.chunk_size : (idx + 1) * self.chunk_size]
+
+    def get_pending_chunks(self) -> List[int]:
+        """获取未完成的分片序号"""
+        if not self.chunk_size:
+            return []
+        chunks_cnt = (len(self.app_codes) + self.chunk_size - 1) // self.chunk_size
+        finished = set(self.finished_chunks)
+        return [idx for idx in range(chunks_cnt) if idx not in finished]
 
 
 class AppOperationReport(models.Model):
@@ -15,12 +15,14 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import datetime
 import logging
 from dataclasses import asdict
 from typing import List
 
-from celery import shared_task
+from celery import chain, chord, group, shared_task
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from paasng.infras.iam.helpers import fetch_role_members
@@ -48,6 +50,9 @@ from paasng.utils.basic import get_username_by_bkpaas_user_id
 
 logger = logging.getLogger(__name__)
 
+# 超过该时间仍未完成的采集任务，不再继续执行
+RESUMABLE_TASK_MAX_AGE = datetime.timedelta(days=1)
+
 
 def _update_or_create_operation_report(app: Application):
     res_summary = AppResQuotaCollector(app).collect()
@@ -125,39 +130,77 @@ def _update_or_create_operation_report(app: Application):
 
 
 @shared_task
-def collect_and_update_app_operation_reports(app_codes: List[str]):
-    """采集并更新指定应用的资源使用情况报告"""
-    applications = Application.objects.exclude(type=ApplicationType.ENGINELESS_APP)
-    # 应用已经被删除的，还保留报告是没有意义的
-    AppOperationReport.objects.exclude(app__in=applications).delete()
+def collect_and_update_app_operation_reports(app_codes: List[str], resume: bool = True):
+    """采集并更新指定应用的资源使用情况报告
+
+    应用被划分为多个分片，由多个子任务并行采集，同时执行的子任务数量受配置限制，以免对监控、访问统计等后端
+    服务造成过大压力。每个分片完成后都会记录进度，任务中断后再次执行全量采集时，会从未完成的分片继续。
+
+    :param app_codes: 指定采集的应用 Code 列表，为空时采集全量应用
+    :param resume: 采集全量应用时，是否继续上一次未完成的任务
+    """
+    task = _prepare_collection_task(app_codes, resume)
+    pending_chunks = task.get_pending_chunks()
+    if not pending_chunks:
+        finish_app_operation_report_collection(task.id)
+        return
 
-    if app_codes:
-        applications = applications.filter(code__in=app_codes)
+    # 分片按顺序分配到多条执行链上，链内串行，链之间并行，所有链完成后再汇总
+    concurrency = max(settings.OPERATION_REPORT_COLLECT_CONCURRENCY, 1)
+    lanes = [pending_chunks[i::concurrency] for i in range(concurrency)]
+    header = group(
+        chain(collect_app_operation_report_chunk.si(task.id, idx) for idx in lane) for lane in lanes if lane
+    )
+    chord(header)(finish_app_operation_report_collection.si(task.id))
 
-    total_cnt, succeed_cnt = applications.count(), 0
-    failed_app_codes = []
-    task = AppOperationReportCollectionTask.objects.create(total_count=total_cnt)
 
-    for idx, app in enumerate(applications, start=1):
+def collect_app_operation_reports_sync(app_codes: List[str], resume: bool = True):
+    """同步采集并更新应用运营报告，参数同 `collect_and_update_app_operation_reports`"""
+    task = _prepare_collection_task(app_codes, resume)
+    for idx in task.get_pending_chunks():
+        collect_app_operation_report_chunk(task.id, idx)
+    finish_app_operation_report_collection(task.id)
+
+
+@shared_task
+def collect_app_operation_report_chunk(task_id: int, chunk_idx: int):
+    """采集一个分片内的应用运营报告，完成后记录进度"""
+    task = AppOperationReportCollectionTask.objects.get(pk=task_id)
+    if chunk_idx in task.finished_chunks:
+        return
+
+    chunk_app_codes = task.get_chunk(chunk_idx)
+    failed_app_codes = []
+    for app in Application.objects.filter(code__in=chunk_app_codes):
         try:
             _update_or_create_operation_report(app)
         except Exception:
             failed_app_codes.append(app.code)
             logger.exception("failed to collect app: %s operation report", app.code)
 
-        succeed_cnt += 1
-        # 完整采集完需要较长时间，因此每隔一段时间更新下进度
-        if idx % 20 == 0:
-            task.succeed_count = succeed_cnt
-            task.failed_count = len(failed_app_codes)
-            task.save(update_fields=["succeed_count", "failed_count"])
+    with transaction.atomic():
+        task = AppOperationReportCollectionTask.objects.select_for_update().get(pk=task_id)
+        # 分片可能被重复执行，已记录的进度不再重复累加
+        if chunk_idx in task.finished_chunks:
+            return
+        task.succeed_count += len(chunk_app_codes)
+        task.failed_count += len(failed_app_codes)
+        task.failed_app_codes += failed_app_codes
+        task.finished_chunks.append(chunk_idx)
+        task.save(update_fields=["succeed_count", "failed_count", "failed_app_codes", "finished_chunks"])
+
+
+@shared_task
+def finish_app_operation_report_collection(task_id: int):
+    """所有分片采集完成后，更新任务状态，并根据配置发送报告邮件"""
+    task = AppOperationReportCollectionTask.objects.get(pk=task_id)
+    if pending_chunks := task.get_pending_chunks():
+        logger.warning("operation report collection task %s has unfinished chunks: %s", task_id, pending_chunks)
+        return
 
-    task.succeed_count = succeed_cnt
-    task.failed_count = len(failed_app_codes)
-    task.failed_app_codes = failed_app_codes
     task.status = BatchTaskStatus.FINISHED
     task.end_at = timezone.now()
-    task.save(update_fields=["succeed_count", "failed_count", "failed_app_codes", "status", "end_at"])
+    task.save(update_fields=["status", "end_at"])
 
     # 根据配置判断是否发送报告邮件给到平台管理员
     if settings.ENABLE_SEND_OPERATION_REPORT_EMAIL_TO_PLAT_MANAGE:
@@ -165,6 +208,38 @@ def collect_and_update_app_operation_reports(app_codes: List[str]):
         AppOperationReportNotifier().send(reports, EmailReceiverType.PLAT_ADMIN, settings.BKPAAS_PLATFORM_MANAGERS)
 
 
+def _prepare_collection_task(app_codes: List[str], resume: bool) -> AppOperationReportCollectionTask:
+    """获取可继续执行的采集任务，或者创建新的采集任务"""
+    collect_all = not app_codes
+    if collect_all and resume:
+        task = AppOperationReportCollectionTask.objects.order_by("-start_at").first()
+        if (
+            task
+            and task.collect_all
+            and task.status == BatchTaskStatus.RUNNING
+            and task.start_at > timezone.now() - RESUMABLE_TASK_MAX_AGE
+        ):
+            logger.info(
+                "resume operation report collection task %s, finished chunks: %s", task.id, task.finished_chunks
+            )
+            return task
+
+    applications = Application.objects.exclude(type=ApplicationType.ENGINELESS_APP)
+    # 应用已经被删除的，还保留报告是没有意义的
+    AppOperationReport.objects.exclude(app__in=applications).delete()
+
+    if app_codes:
+        applications = applications.filter(code__in=app_codes)
+
+    codes = list(applications.order_by("id").values_list("code", flat=True))
+    return AppOperationReportCollectionTask.objects.create(
+        total_count=len(codes),
+        collect_all=collect_all,
+        app_codes=codes,
+        chunk_size=max(settings.OPERATION_REPORT_COLLECT_CHUNK_SIZE, 1),
+    )
+
+
 @shared_task
 def send_idle_email_to_app_developers(
     tenant_id: str, app_codes: List[str], only_specified_users: List[str], exclude_specified_users: List[str]
@@ -18,9 +18,11 @@
 import json
 import logging
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
 from os import PathLike
 from pathlib import Path
-from typing import Callable, List, Set, cast
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar, cast
 
 from paasng.infras.accounts.models import User
 from paasng.platform.applications.models import Application, SMartAppExtraInfo
@@ -35,7 +37,8 @@ from paasng.platform.smart_app.services.patcher import patch_smart_tarball
 from paasng.platform.sourcectl.models import SourcePackage, SPStat, SPStoragePolicy
 from paasng.platform.sourcectl.package.uploader import generate_storage_path, upload_to_blob_store
 from paasng.platform.sourcectl.utils import generate_temp_dir, uncompress_directory
-from paasng.utils.moby_distribution import ImageJSON, ImageRef, LayerRef
+from paasng.utils.moby_distribution import Blob, ImageJSON, ImageRef, LayerRef, ManifestSchema2
+from paasng.utils.moby_distribution.registry.utils import NamedImage
 from paasng.utils.text import remove_prefix
 
 logger = logging.getLogger(__name__)
@@ -44,42 +47,48 @@ logger = logging.getLogger(__name__)
 # alter the behaviour.
 _PARALLEL_PATCHING = True
 
+T = TypeVar("T")
+
 
 def dispatch_package_to_modules(
     application: Application, tarball_filepath: PathLike, stat: SPStat, operator: User, modules: Set[str]
 ) -> List[SourcePackage]:
     """Dispatch package to those modules which mentioned in args modules"""
-    # TODO: 优化分发镜像的逻辑(如果存在多个模块用同一个镜像层, 那么应该只上传一次镜像)
     with generate_temp_dir() as workplace:
         uncompress_directory(source_path=tarball_filepath, target_path=workplace)
 
         handler: Callable[[Module, Path, SPStat, User], SourcePackage]
+        preparer: Callable[[Module, Path, SPStat, Path], PreparedImage]
+        module_objs = list(application.modules.filter(name__in=modules))
         builder_flag = workplace / ".Version"
         if builder_flag.exists():
             version = builder_flag.read_text().strip()
             if version == SMartPackageBuilderVersionFlag.CNB_IMAGE_LAYERS:
                 parse_and_save_cnb_metadata(application, workplace)
-                handler = dispatch_cnb_image_to_registry
+                handler, preparer = dispatch_cnb_image_to_registry, prepare_cnb_image
             else:
-                handler = dispatch_slug_image_to_registry
-            tasks = [(module, workplace, stat, operator) for module in application.modules.filter(name__in=modules)]
+                handler, preparer = dispatch_slug_image_to_registry, prepare_slug_image
+
+            # 多个模块的镜像可能包含相同的镜像层, 统一规划后每个镜像层只需上传一次
+            if len(module_objs) > 1:
+                return dispatch_images_to_registry(module_objs, workplace, stat, operator, preparer)
+            tasks = [(module, workplace, stat, operator) for module in module_objs]
         else:
-            tasks = [
-                (module, Path(tarball_filepath), stat, operator)
-                for module in application.modules.filter(name__in=modules)
-            ]
+            tasks = [(module, Path(tarball_filepath), stat, operator) for module in module_objs]
             handler = patch_and_store_package
 
-        if _PARALLEL_PATCHING:
-            with ThreadPoolExecutor() as executor:
-                results = executor.map(handler, *zip(*tasks))
-            return list(results)
-        else:
-            # Execute Sequentially
-            packages = []
-            for task in tasks:
-                packages.append(handler(*task))
-            return packages
+        return _run_tasks(handler, tasks)
+
+
+def _run_tasks(func: Callable[..., T], tasks: List[Tuple]) -> List[T]:
+    """Run the tasks in parallel if `_PARALLEL_PATCHING` is on, the results are in the order of tasks"""
+    if not tasks:
+        return []
+    if _PARALLEL_PATCHING:
+        with ThreadPoolExecutor() as executor:
+            return list(executor.map(func, *zip(*tasks)))
+    # Execute Sequentially
+    return [func(*task) for task in tasks]
 
 
 def patch_and_store_package(module: Module, tarball_filepath: Path, stat: SPStat, operator: User) -> SourcePackage:
@@ -103,11 +112,63 @@ def patch_and_store_package(module: Module, tarball_filepath: Path, stat: SPStat
         return source_package
 
 
+@dataclass
+class PreparedImage:
+    """The image of a module which is ready to push, all layers have been added"""
+
+    module: Module
+    image_info: NamedImage
+    image_ref: ImageRef
+
+
 def dispatch_slug_image_to_registry(module: Module, workplace: Path, stat: SPStat, operator: User) -> SourcePackage:
     """Merge image layer to base image, then push the new image to registry
 
     [deprecated] `dispatch_slug_image_to_registry` is a handler for s-mart which is built with slug-pilot.
     """
+    image = prepare_slug_image(module, workplace, stat)
+    manifest = push_prepared_image(image)
+    return store_image_package(image, manifest, stat, operator)
+
+
+def dispatch_cnb_image_to_registry(module: Module, workplace: Path, stat: SPStat, operator: User) -> SourcePackage:
+    """Merge image layer to base image, then push the new image to registry"""
+    with generate_temp_dir() as image_tmp_folder:
+        image = prepare_cnb_image(module, workplace, stat, image_tmp_folder)
+        manifest = push_prepared_image(image)
+    return store_image_package(image, manifest, stat, operator)
+
+
+def dispatch_images_to_registry(
+    modules: List[Module],
+    workplace: Path,
+    stat: SPStat,
+    operator: User,
+    preparer: Callable[[Module, Path, SPStat, Path], PreparedImage],
+) -> List[SourcePackage]:
+    """Dispatch the images of multiple modules, the layers shared by modules are uploaded only once
+
+    1. prepare the images of all modules, the digests of layers are calculated
+    2. upload every unique local layer once, to the repository of the first module which uses it
+    3. push the images, shared layers are mounted from the repository which they were uploaded to
+    """
+    with ExitStack() as stack:
+        tasks = [(module, workplace, stat, stack.enter_context(generate_temp_dir())) for module in modules]
+        images = _run_tasks(preparer, tasks)
+
+        SharedLayerUploader(max_workers=5 if _PARALLEL_PATCHING else 1).upload([image.image_ref for image in images])
+        manifests = _run_tasks(push_prepared_image, [(image,) for image in images])
+
+    return [store_image_package(image, manifest, stat, operator) for image, manifest in zip(images, manifests)]
+
+
+def prepare_slug_image(
+    module: Module, workplace: Path, stat: SPStat, temp_dir: Optional[Path] = None
+) -> PreparedImage:
+    """Merge the slug layer and the Procfile layer to the slug runner image
+
+    :param temp_dir: not used, the layers are read from the workplace directly
+    """
     logger.debug("dispatching slug-image for module '%s', working at '%s'", module.name, workplace)
 
     source_dir = get_source_dir_from_desc(stat.meta_info, module.name)
@@ -129,26 +190,15 @@ def dispatch_slug_image_to_registry(module: Module, workplace: Path, stat: SPSta
     )
     image_ref.add_layer(LayerRef(local_path=layer_path))
     image_ref.add_layer(LayerRef(local_path=procfile_path))
+    return PreparedImage(module=module, image_info=new_image_info, image_ref=image_ref)
 
-    logger.debug("Start pushing Image.")
-    manifest = image_ref.push(max_worker=5 if _PARALLEL_PATCHING else 1)
 
-    image_sha256_signature = remove_prefix(manifest.config.digest, "sha256:")
-    policy = SPStoragePolicy(
-        path=new_image_info.name,
-        url=f"{new_image_info.domain}/{new_image_info.name}:{new_image_info.tag}",
-        stat=stat,
-        allow_overwrite=True,
-        engine="docker",
-    )
-    source_package = SourcePackage.objects.store(
-        module, policy, operator=operator, image_sha256_signature=image_sha256_signature
-    )
-    return source_package
+def prepare_cnb_image(module: Module, workplace: Path, stat: SPStat, temp_dir: Path) -> PreparedImage:
+    """Merge the cnb layers to the cnb runner image
 
-
-def dispatch_cnb_image_to_registry(module: Module, workplace: Path, stat: SPStat, operator: User) -> SourcePackage:
-    """Merge image layer to base image, then push the new image to registry"""
+    :param temp_dir: a temporary directory which lives until the image is pushed, the image tarball
+        of the module is uncompressed into it.
+    """
     logger.debug("dispatching cnb-image for module '%s', working at '%s'", module.name, workplace)
 
     mgr = SMartImageManager(module)
@@ -159,47 +209,95 @@ def dispatch_cnb_image_to_registry(module: Module, workplace: Path, stat: SPStat
     image_tar = smart_app_extra.get_image_tar(module.name)
 
     image_tarball = workplace / image_tar
-    with generate_temp_dir() as image_tmp_folder:
-        uncompress_directory(source_path=image_tarball, target_path=image_tmp_folder)
-
-        client = bksmart_settings.registry.get_client()
-        image_ref = ImageRef.from_image(
-            from_repo=base_image.name,
-            from_reference=cast(str, base_image.tag),
-            to_repo=new_image_info.name,
-            to_reference=new_image_info.tag,
-            client=client,
-        )
-
-        tarball_manifest = _construct_exported_image_manifest(image_tmp_folder)
-
-        # merge image json at first.
-        # cnb_layers_image_json.config contains Env, default Entrypoint.
-        base_image_json = image_ref.image_json
-        cnb_layers_image_json = ImageJSON(**json.loads((image_tmp_folder / tarball_manifest.config).read_text()))
-        base_image_json.config = cnb_layers_image_json.config
-        image_ref._initial_config = base_image_json.json(
-            exclude_unset=True, exclude_defaults=True, separators=(",", ":")
-        )
-
-        for layer_path in tarball_manifest.layers:
-            image_ref.add_layer(LayerRef(local_path=image_tmp_folder / layer_path))
-        logger.debug("Start pushing Image.")
-
-        manifest = image_ref.push(max_worker=5 if _PARALLEL_PATCHING else 1)
+    uncompress_directory(source_path=image_tarball, target_path=temp_dir)
 
+    client = bksmart_settings.registry.get_client()
+    image_ref = ImageRef.from_image(
+        from_repo=base_image.name,
+        from_reference=cast(str, base_image.tag),
+        to_repo=new_image_info.name,
+        to_reference=new_image_info.tag,
+        client=client,
+    )
+
+    tarball_manifest = _construct_exported_image_manifest(temp_dir)
+
+    # merge image json at first.
+    # cnb_layers_image_json.config contains Env, default Entrypoint.
+    base_image_json = image_ref.image_json
+    cnb_layers_image_json = ImageJSON(**json.loads((temp_dir / tarball_manifest.config).read_text()))
+    base_image_json.config = cnb_layers_image_json.config
+    image_ref._initial_config = base_image_json.json(exclude_unset=True, exclude_defaults=True, separators=(",", ":"))
+
+    for layer_path in tarball_manifest.layers:
+        image_ref.add_layer(LayerRef(local_path=temp_dir / layer_path))
+    return PreparedImage(module=module, image_info=new_image_info, image_ref=image_ref)
+
+
+def push_prepared_image(image: PreparedImage) -> ManifestSchema2:
+    logger.debug("Start pushing Image.")
+    return image.image_ref.push(max_worker=5 if _PARALLEL_PATCHING else 1)
+
+
+def store_image_package(
+    image: PreparedImage, manifest: ManifestSchema2, stat: SPStat, operator: User
+) -> SourcePackage:
+    """Bind the pushed image to the module as a source package"""
     image_sha256_signature = remove_prefix(manifest.config.digest, "sha256:")
     policy = SPStoragePolicy(
-        path=new_image_info.name,
-        url=f"{new_image_info.domain}/{new_image_info.name}:{new_image_info.tag}",
+        path=image.image_info.name,
+        url=f"{image.image_info.domain}/{image.image_info.name}:{image.image_info.tag}",
         stat=stat,
         allow_overwrite=True,
         engine="docker",
     )
-    source_package = SourcePackage.objects.store(
-        module, policy, operator=operator, image_sha256_signature=image_sha256_signature
+    return SourcePackage.objects.store(
+        image.module, policy, operator=operator, image_sha256_signature=image_sha256_signature
     )
-    return source_package
+
+
+class SharedLayerUploader:
+    """Upload the local layers shared by multiple images only once.
+
+    Every unique layer is uploaded to the repository of the first image which uses it, then the layer
+    is marked as existed in that repository for all images, so pushing the other images will mount
+    the blob instead of uploading it again.
+
+    :param max_workers: max number of layers uploading at the same time
+    """
+
+    def __init__(self, max_workers: int = 5):
+        self.max_workers = max_workers
+
+    def upload(self, images: List[ImageRef]):
+        owners: Dict[str, Tuple[ImageRef, LayerRef]] = {}
+        for image in images:
+            for layer in image.layers:
+                if not layer.exists and layer.digest not in owners:
+                    owners[layer.digest] = (image, layer)
+
+        logger.debug("Uploading %d unique layers for %d images", len(owners), len(images))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Consume the results to raise the errors
+            list(executor.map(lambda owner: self._upload_layer(*owner), owners.values()))
+
+        for image in images:
+            for idx, layer in enumerate(image.layers):
+                if layer.exists or layer.digest not in owners:
+                    continue
+                owner_image, _ = owners[layer.digest]
+                # Keep the local path, so the layer can still be uploaded if mounting is not supported
+                image.layers[idx] = LayerRef(
+                    repo=owner_image.repo,
+                    digest=layer.digest,
+                    size=layer.size,
+                    exists=True,
+                    local_path=layer.local_path,
+                )
+
+    @staticmethod
+    def _upload_layer(image: ImageRef, layer: LayerRef):
+        Blob(repo=image.repo, local_path=layer.local_path, client=image.client).upload()
 
 
 def parse_and_save_cnb_metadata(application: Application, workplace: Path):
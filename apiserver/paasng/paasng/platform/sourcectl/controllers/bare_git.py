@@ -17,6 +17,7 @@
 
 import logging
 import operator
+import posixpath
 from os import PathLike
 from pathlib import Path
 from typing import TYPE_CHECKING, Dict, Generator, Iterator, List, Optional, Tuple
@@ -39,6 +40,7 @@ if TYPE_CHECKING:
     from paasng.platform.sourcectl.models import RepositoryInstance
 
 from paasng.platform.sourcectl.git.client import GitClient, GitCommandExecutionError, Ref
+from paasng.platform.sourcectl.git.mirror import get_mirror_cache
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +48,9 @@ logger = logging.getLogger(__name__)
 class BareGitRepoController(BaseGitRepoController):
     """Git 协议仓库控制器"""
 
+    # 读取文件时最多解析的符号链接层数
+    MAX_SYMLINK_LEVELS = 8
+
     def __init__(self, repo_url: str, repo_obj: "RepositoryInstance"):
         self.repo_url = MutableURL(repo_url)
         self.repo_obj = repo_obj
@@ -103,11 +108,26 @@ class BareGitRepoController(BaseGitRepoController):
         branch = version_info.version_name if version_info else None
 
         local_path = Path(local_path)
+        # 未指定分支时需要使用远端的默认分支，直接克隆
+        if branch and (mirror_cache := get_mirror_cache()):
+            with mirror_cache.open(self.repo_url) as mirror_path:
+                revision = self._resolve_revision(mirror_path, branch)
+                self.client.checkout_to(mirror_path, revision, local_path)
+            return
+
         self.client.clone(self.repo_url, local_path, depth=1, branch=branch)
         self.client.clean_meta_info(local_path)
 
     def list_alternative_versions(self) -> List[AlternativeVersion]:
         """尝试直接从远端获取可选的分支信息"""
+        if mirror_cache := get_mirror_cache():
+            with mirror_cache.open(self.repo_url) as mirror_path:
+                return sorted(
+                    self.transfer_refs_to_versions(self.client.list_refs(mirror_path)),
+                    key=operator.attrgetter("last_update"),
+                    reverse=True,
+                )
+
         with generate_temp_dir() as temp_dir:
             # Use "blob-less" cloning for faster speed.
             #
@@ -178,6 +198,11 @@ class BareGitRepoController(BaseGitRepoController):
 
     def read_file(self, file_path, version_info: VersionInfo) -> bytes:
         """读取目标文件"""
+        if mirror_cache := get_mirror_cache():
+            with mirror_cache.open(self.repo_url) as mirror_path:
+                revision = self._resolve_revision(mirror_path, version_info.version_name)
+                return self._read_file_from_mirror(mirror_path, revision, str(file_path))
+
         with generate_temp_dir() as temp_dir:
             self.client.clone(self.repo_url, temp_dir, depth=1, branch=version_info.version_name)
 
@@ -189,3 +214,30 @@ class BareGitRepoController(BaseGitRepoController):
             except ValueError:
                 raise ReadLinkFileOutsideDirectoryError()
             return fp.read_bytes()
+
+    def _resolve_revision(self, mirror_path: Path, version_name: str) -> str:
+        """将分支或标签名转换成镜像仓库中的 commit id"""
+        for ref in (f"refs/remotes/origin/{version_name}", f"refs/tags/{version_name}"):
+            if commit_id := self.client.resolve_commit(mirror_path, ref):
+                return commit_id
+        raise GitCommandExecutionError(f"Remote branch {version_name} not found")
+
+    def _read_file_from_mirror(self, mirror_path: Path, revision: str, file_path: str) -> bytes:
+        """从镜像仓库读取文件，符号链接会被解析，但不允许指向仓库之外"""
+        path = file_path
+        for _ in range(self.MAX_SYMLINK_LEVELS):
+            path = posixpath.normpath(path)
+            if posixpath.isabs(path) or path == ".." or path.startswith("../"):
+                raise ReadLinkFileOutsideDirectoryError()
+
+            entry = self.client.get_tree_entry(mirror_path, revision, path)
+            if not entry or entry[1] != "blob":
+                raise ReadFileNotFoundError(f"{file_path} not exists.")
+
+            mode, _, object_id = entry
+            content = self.client.read_blob(mirror_path, object_id)
+            if mode != "120000":
+                return content
+            # The content of a symbolic link is its target path
+            path = posixpath.join(posixpath.dirname(path), content.decode())
+        raise ReadFileNotFoundError(f"{file_path} not exists.")
@@ -20,6 +20,7 @@ import os
 import re
 import shutil
 import subprocess
+import tempfile
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
@@ -107,15 +108,50 @@ class GitCloneCommand(GitCommand):
         """Get sensitive texts in the current command, the texts must not be displayed
         to the user or written to the logs.
         """
-        netloc = self.repository.netloc
-        if not netloc:
-            return []
+        return get_url_sensitive_texts(self.repository)
 
-        user_info, have_info, _ = netloc.rpartition("@")
-        if not have_info:
-            return []
-        # Consider the user info as sensitive because it contains password
-        return [user_info + "@"]
+
+class GitFetchCommand(GitCommand):
+    def __init__(
+        self,
+        git_filepath: str,
+        repository: MutableURL,
+        refspecs: List[str],
+        args: Optional[List[str]] = None,
+        cwd: str = "",
+        envs: Optional[Dict] = None,
+    ):
+        """
+        Name
+               git-fetch - Download objects and refs from another repository
+        SYNOPSIS
+               git fetch [<options>] [<repository> [<refspec>...]]
+        """
+        super().__init__(git_filepath, "fetch", args, cwd, envs)
+        self.repository = repository
+        self.refspecs = refspecs
+
+    def to_cmd(self, obscure: bool = False) -> List[str]:
+        cmd = super().to_cmd(obscure=obscure)
+        cmd.append(str(self.repository.obscure()) if obscure else str(self.repository))
+        cmd.extend(self.refspecs)
+        return cmd
+
+    def get_sensitive_texts(self) -> List[str]:
+        return get_url_sensitive_texts(self.repository)
+
+
+def get_url_sensitive_texts(url: MutableURL) -> List[str]:
+    """Get the sensitive texts in the repository url"""
+    netloc = url.netloc
+    if not netloc:
+        return []
+
+    user_info, have_info, _ = netloc.rpartition("@")
+    if not have_info:
+        return []
+    # Consider the user info as sensitive because it contains password
+    return [user_info + "@"]
 
 
 class GitClient:
@@ -179,6 +215,102 @@ class GitClient:
         )
         return self.run(command)
 
+    def init_bare_repo(self, path: Path) -> str:
+        """初始化裸仓库，用作远端仓库的本地镜像"""
+        self.run(GitCommand(git_filepath=self._git_filepath, command="init", args=["--bare"], cwd=str(path)))
+        # gc 需在前台执行（拉取后持有镜像的排他锁时），避免后台 gc 与读取并发
+        return self.run(
+            GitCommand(
+                git_filepath=self._git_filepath, command="config", args=["gc.autoDetach", "false"], cwd=str(path)
+            )
+        )
+
+    def gc_auto(self, path: Path) -> str:
+        """松散对象或 pack 文件过多时，打包仓库中的对象（git gc --auto）"""
+        return self.run(
+            GitCommand(git_filepath=self._git_filepath, command="gc", args=["--auto", "--quiet"], cwd=str(path))
+        )
+
+    def fetch_mirror(self, url: Union[str, MutableURL], path: Path) -> str:
+        """增量拉取远端仓库的所有分支与标签到本地裸仓库，分支保存为 refs/remotes/origin/*
+
+        仓库地址（可能包含认证信息）仅通过命令行传递，不会写入仓库配置
+
+        :param url: 仓库地址
+        :param path: 本地裸仓库路径
+        """
+        command = GitFetchCommand(
+            git_filepath=self._git_filepath,
+            repository=MutableURL(url),
+            refspecs=["+refs/heads/*:refs/remotes/origin/*", "+refs/tags/*:refs/tags/*"],
+            args=["--prune", "--no-tags", "--quiet"],
+            cwd=str(path),
+        )
+        return self.run(command)
+
+    def resolve_commit(self, path: Path, rev: str) -> Optional[str]:
+        """获取 rev 对应的 commit id，不存在时返回 None"""
+        command = GitCommand(
+            git_filepath=self._git_filepath,
+            command="rev-parse",
+            args=["--verify", "--quiet", f"{rev}^{{commit}}"],
+            cwd=str(path),
+        )
+        try:
+            return self.run(command).strip()
+        except GitCommandExecutionError:
+            return None
+
+    def get_tree_entry(self, path: Path, revision: str, file_path: str) -> Optional[Tuple[str, str, str]]:
+        """获取指定版本中文件的元信息，不存在时返回 None
+
+        :return: (mode, type, object_id)，如 ("100644", "blob", "5d96...")
+        """
+        command = GitCommand(
+            git_filepath=self._git_filepath,
+            command="ls-tree",
+            args=["--full-tree", revision, "--", file_path],
+            cwd=str(path),
+        )
+        output = self.run(command).strip()
+        if not output:
+            return None
+        meta, _, _ = output.partition("\t")
+        mode, type_, object_id = meta.split()
+        return mode, type_, object_id
+
+    def read_blob(self, path: Path, object_id: str) -> bytes:
+        """读取文件对象的原始内容"""
+        command = GitCommand(
+            git_filepath=self._git_filepath, command="cat-file", args=["blob", object_id], cwd=str(path)
+        )
+        return self.run_bytes(command)
+
+    def checkout_to(self, path: Path, revision: str, target: Path):
+        """将裸仓库中指定版本的所有文件导出到目标目录（不包含 .git 元信息）
+
+        :param path: 裸仓库路径
+        :param revision: 版本
+        :param target: 目标目录
+        """
+        with tempfile.TemporaryDirectory() as index_dir:
+            # 使用临时的 index 文件，避免并发导出时相互影响
+            envs = {"GIT_DIR": str(path), "GIT_WORK_TREE": str(target), "GIT_INDEX_FILE": f"{index_dir}/index"}
+            self.run(
+                GitCommand(
+                    git_filepath=self._git_filepath, command="read-tree", args=[revision], cwd=str(target), envs=envs
+                )
+            )
+            self.run(
+                GitCommand(
+                    git_filepath=self._git_filepath,
+                    command="checkout-index",
+                    args=["--all", "--force"],
+                    cwd=str(target),
+                    envs=envs,
+                )
+            )
+
     def list_remote(self, url: Union[str, MutableURL]) -> List[Tuple[str, str]]:
         """通过 ls-remote 命令，直接获取远端仓库的 branch 与 tag 等信息。该命令不依赖本地文件系统。
 
@@ -327,6 +459,10 @@ class GitClient:
         :param int success_code: 期待的执行成功的返回码
         :return: 返回结果
         """
+        return force_str(self.run_bytes(command, success_code))
+
+    def run_bytes(self, command: GitCommand, success_code: int = 0) -> bytes:
+        """执行 git 命令，返回原始的输出内容，用于读取文件等场景"""
         environment_variables = os.environ.copy()
         environment_variables.update(command.envs or {})
         environment_variables["LANG"] = "en_US.UTF-8"
@@ -351,10 +487,9 @@ class GitClient:
                     f"Command failed: cmd <{command}> execution timeout({self._default_timeout}s)"
                 )
 
-            str_stdout = force_str(stdout)
             if proc.returncode != success_code:
-                raise self.err_stdout_as_exc(str_stdout, command, proc.returncode)
-            return str_stdout
+                raise self.err_stdout_as_exc(force_str(stdout), command, proc.returncode)
+            return stdout
 
     @staticmethod
     def err_stdout_as_exc(stdout: str, command: GitCommand, return_code: int) -> GitCommandExecutionError:
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+"""Local mirror cache of git repositories
+
+The mirrors are bare repositories in a directory shared by all processes on the node, keyed by the repo
+url without credentials. Every use fetches the changes incrementally with the caller's url, the url is
+never written to the repository config, so using a mirror requires the same permission as cloning.
+
+Fetching holds the exclusive file lock of the mirror, reading holds the shared lock. The objects are packed
+by `git gc --auto` after fetching, while the exclusive lock is still held. The least recently used mirrors are
+removed when the total size exceeds the limit, the size is checked at most once in `evict_interval` seconds
+because it requires scanning all mirrors.
+
+NOTE: The locks are acquired by polling, so the gevent worker will not be blocked.
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+from urllib.parse import urlsplit, urlunsplit
+
+from blue_krill.data_types.url import MutableURL
+from django.conf import settings
+
+from paasng.platform.sourcectl.exceptions import RequestTimeOutError
+from paasng.platform.sourcectl.git.client import GitClient
+
+logger = logging.getLogger(__name__)
+
+
+class MirrorLock:
+    """The file lock of a mirror, the lock file is never removed to avoid races"""
+
+    poll_interval = 0.1
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire(self, exclusive: bool, timeout: float) -> bool:
+        """Acquire the lock, an acquired lock will be converted to the given type.
+
+        :param timeout: Seconds to wait, 0 means not waiting
+        :return: Whether the lock was acquired
+        """
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        operation = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(self._fd, operation)
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(self.poll_interval)
+            else:
+                return True
+
+    def release(self):
+        if self._fd is not None:
+            # Closing the file releases the lock
+            os.close(self._fd)
+            self._fd = None
+
+
+class GitMirrorCache:
+    """Local mirror cache of git repositories, see module docstring for details.
+
+    :param root_dir: The directory to store the mirrors
+    :param max_size: Max total size(bytes) of the mirrors
+    :param lock_timeout: Seconds to wait for the lock of a mirror
+    :param evict_interval: Min seconds between two evictions, shared by all processes
+    """
+
+    def __init__(self, root_dir: Path, max_size: int, lock_timeout: float = 600, evict_interval: float = 300):
+        self.root_dir = root_dir
+        self.max_size = max_size
+        self.lock_timeout = lock_timeout
+        self.evict_interval = evict_interval
+        self.client = GitClient()
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def open(self, url: Union[str, MutableURL]) -> Iterator[Path]:
+        """Fetch the latest changes of the repo into the mirror and yield the path of the mirror, which
+        will not be updated or removed by others before exiting.
+        """
+        key = self.make_key(str(url))
+        repo_path = self.root_dir / key
+        lock = MirrorLock(self.root_dir / f"{key}.lock")
+        if not lock.acquire(exclusive=True, timeout=self.lock_timeout):
+            raise RequestTimeOutError(f"waiting for the git mirror timeout({self.lock_timeout}s)")
+        try:
+            self._fetch(url, repo_path)
+            # Downgrade to shared lock, so others can read the mirror at the same time
+            if not lock.acquire(exclusive=False, timeout=self.lock_timeout):
+                raise RequestTimeOutError(f"waiting for the git mirror timeout({self.lock_timeout}s)")
+            # The mtime of lock file is used as the last used time
+            os.utime(lock.path)
+            yield repo_path
+        finally:
+            lock.release()
+
+        if not self._is_evict_due():
+            return
+        try:
+            self.evict()
+        except Exception:
+            logger.exception("Failed to evict git mirrors")
+
+    def evict(self):
+        """Remove the least recently used mirrors until the total size is under the limit"""
+        entries = []
+        for lock_path in self.root_dir.glob("*.lock"):
+            try:
+                last_used = lock_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            repo_path = lock_path.with_suffix("")
+            entries.append((last_used, lock_path, repo_path, get_dir_size(repo_path)))
+
+        total_size = sum(entry[3] for entry in entries)
+        for _, lock_path, repo_path, size in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if not size:
+                continue
+
+            lock = MirrorLock(lock_path)
+            # Skip the mirrors in use
+            if not lock.acquire(exclusive=True, timeout=0):
+                continue
+            try:
+                logger.info("Removing git mirror %s, size: %s", repo_path, size)
+                shutil.rmtree(repo_path, ignore_errors=True)
+                total_size -= size
+            finally:
+                lock.release()
+
+    def _is_evict_due(self) -> bool:
+        """Check whether `evict_interval` seconds have passed since the last eviction, the mtime of a marker
+        file is used as the time of the last eviction, so that the eviction is rate-limited among processes.
+        """
+        marker = self.root_dir / ".last_evicted"
+        try:
+            if time.time() - marker.stat().st_mtime < self.evict_interval:
+                return False
+        except FileNotFoundError:
+            pass
+        marker.touch()
+        return True
+
+    def _fetch(self, url: Union[str, MutableURL], repo_path: Path):
+        created = False
+        if not (repo_path / "HEAD").exists():
+            # Clean up the mirror which was not initialized completely
+            shutil.rmtree(repo_path, ignore_errors=True)
+            repo_path.mkdir(parents=True)
+            self.client.init_bare_repo(repo_path)
+            created = True
+
+        try:
+            self.client.fetch_mirror(url, repo_path)
+        except Exception:
+            if created:
+                shutil.rmtree(repo_path, ignore_errors=True)
+            raise
+
+        # Pack the loose objects of incremental fetches, nobody is reading the mirror now
+        try:
+            self.client.gc_auto(repo_path)
+        except Exception:
+            logger.exception("Failed to gc git mirror %s", repo_path)
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        """Make the key of the mirror by the repo url, credentials in the url are ignored"""
+        parts = urlsplit(url)
+        if parts.hostname:
+            netloc = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+            url = urlunsplit(parts._replace(netloc=netloc))
+        return hashlib.sha256(url.encode()).hexdigest()
+
+
+def get_dir_size(path: Path) -> int:
+    """Get the total size of files in the directory, return 0 if not exists"""
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except FileNotFoundError:
+                continue
+    return size
+
+
+def get_mirror_cache() -> Optional[GitMirrorCache]:
+    """Get the mirror cache by settings, return None if it's disabled"""
+    if not settings.BARE_GIT_MIRROR_CACHE_ENABLED:
+        return None
+
+    root_dir = settings.BARE_GIT_MIRROR_CACHE_DIR or os.path.join(tempfile.gettempdir(), "bkpaas-git-mirrors")
+    return GitMirrorCache(Path(root_dir), settings.BARE_GIT_MIRROR_CACHE_MAX_SIZE_MB * 1024 * 1024)
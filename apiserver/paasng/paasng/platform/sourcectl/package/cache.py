@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+"""Local cache of source packages downloaded from the blobstore
+
+The packages are keyed by their sha256 digests, which are recorded when the packages were uploaded, the
+digest of a downloaded package is verified before being put into the cache. The tarball index is saved
+next to the cached package, see `indexed.py` for details.
+"""
+
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+
+from paasng.platform.sourcectl.package.downloader import download_file_via_url
+from paasng.platform.sourcectl.package.indexed import compute_sha256
+
+logger = logging.getLogger(__name__)
+
+
+class SourcePackageCache:
+    """The cache directory shared by all processes on the node
+
+    :param root_dir: The cache directory
+    :param max_size: Max bytes of the cached packages, the least recently used ones are removed when exceeded
+    """
+
+    # Packages used recently are never evicted, so the callers can open them safely
+    min_age_seconds = 60
+
+    def __init__(self, root_dir: Path, max_size: int):
+        self.root_dir = root_dir
+        self.max_size = max_size
+
+    def get_path(self, sha256: str) -> Path:
+        return self.root_dir / f"{sha256}.pkg"
+
+    def fetch(self, url: str, sha256: str) -> Tuple[Path, bool]:
+        """Get the package from cache, download it if not cached
+
+        :return: (path, cached), the caller should remove the file after use if it's not cached, e.g. the
+            digest of the downloaded file does not match.
+        """
+        path = self.get_path(sha256)
+        try:
+            # Touch the file to record the last used time
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        else:
+            return path, True
+
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.root_dir, suffix=".downloading")
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            download_file_via_url(url, local_path=tmp_path)
+            with open(tmp_path, mode="rb") as fh:
+                digest = compute_sha256(fh)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        if digest != sha256:
+            logger.warning("The digest of package does not match, expected: %s, got: %s, url: %s", sha256, digest, url)
+            return tmp_path, False
+
+        os.replace(tmp_path, path)
+        self.evict()
+        return path, True
+
+    def evict(self):
+        """Remove the least recently used packages until the total size is under the limit"""
+        entries: List[Tuple[float, int, Path]] = []
+        for path in self.root_dir.glob("*.pkg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if now - mtime < self.min_age_seconds:
+                continue
+            logger.info("Evicting cached source package: %s", path)
+            path.unlink(missing_ok=True)
+            for index_path in self.root_dir.glob(f".{path.name}.*"):
+                index_path.unlink(missing_ok=True)
+            total_size -= size
+
+
+def get_package_cache() -> Optional[SourcePackageCache]:
+    """Get the package cache by settings, return None if it's disabled"""
+    if not settings.SOURCE_PACKAGE_CACHE_ENABLED:
+        return None
+
+    root_dir = settings.SOURCE_PACKAGE_CACHE_DIR or os.path.join(tempfile.gettempdir(), "bkpaas-source-packages")
+    return SourcePackageCache(Path(root_dir), settings.SOURCE_PACKAGE_CACHE_MAX_SIZE_MB * 1024 * 1024)
+
+
+def fetch_package(url: str, sha256: Optional[str] = None) -> Tuple[Path, bool]:
+    """Download the package to local, the cache is used if the sha256 digest is given
+
+    :return: (path, cached), the caller should remove the file after use if it's not cached
+    """
+    if sha256 and (cache := get_package_cache()):
+        return cache.fetch(url, sha256)
+
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        path = Path(f.name)
+    try:
+        download_file_via_url(url, local_path=path)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+    return path, False
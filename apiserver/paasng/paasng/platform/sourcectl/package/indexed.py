@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+"""Member index of tarball packages
+
+Reading one member from a compressed tarball by the `tar` command or the `tarfile` module decompresses
+the stream from the beginning every time. The index is built by one streaming pass over the tarball, it
+records every member together with the offset of its data, so the data of an uncompressed tarball can be
+read by seeking directly. A gzip stream can not be seeked, so for compressed tarballs the contents of the
+small files near the top of the tree (where the metadata files such as "app_desc.yaml" and "Procfile"
+are placed) are kept in the index, other files are read by streaming until the member is reached.
+
+The index can be saved next to the package and keyed by the sha256 digest of the package, this is only enabled
+for packages owned by a cache(see `cache.py`), other packages are indexed in memory.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import tarfile
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional
+
+from paasng.platform.sourcectl.exceptions import (
+    PackageInvalidFileFormatError,
+    ReadFileNotFoundError,
+    ReadLinkFileOutsideDirectoryError,
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+# Files in compressed tarballs can be inlined into the index if they are small enough and not too deep
+INLINE_MEMBER_MAX_SIZE = 1024 * 1024
+INLINE_MAX_DEPTH = 3
+INLINE_TOTAL_MAX_SIZE = 16 * 1024 * 1024
+MAX_SYMLINK_LEVELS = 8
+
+_COMPRESSION_MAGICS = {"gz": b"\x1f\x8b", "bz2": b"BZh", "xz": b"\xfd7zXZ\x00"}
+
+
+@dataclass
+class TarMember:
+    """A member of the tarball
+
+    :param name: The name in the tarball
+    :param type: The type flag of `tarfile`, decoded as str
+    :param offset_data: The offset of data in the uncompressed stream
+    :param data: The inlined content, only for small files in compressed tarballs
+    """
+
+    name: str
+    type: str
+    size: int
+    mode: int
+    offset_data: int
+    linkname: str = ""
+    data: Optional[bytes] = None
+
+    def to_tarinfo(self) -> tarfile.TarInfo:
+        info = tarfile.TarInfo(self.name)
+        info.type = self.type.encode()
+        info.size = self.size
+        info.mode = self.mode
+        info.linkname = self.linkname
+        return info
+
+
+@dataclass
+class TarMemberIndex:
+    """The index of all members in the tarball, in their original order"""
+
+    sha256: Optional[str]
+    compression: Optional[str]
+    members: List[TarMember]
+    _members_by_key: Dict[str, TarMember] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # The last one wins if there are duplicated names, same as `tar` and `tarfile`
+        self._members_by_key = {normalize_name(m.name): m for m in self.members}
+
+    def get(self, name: str) -> Optional[TarMember]:
+        return self._members_by_key.get(normalize_name(name))
+
+    def iter_tarinfo(self) -> Iterator[tarfile.TarInfo]:
+        for member in self.members:
+            yield member.to_tarinfo()
+
+    def dumps(self) -> str:
+        members = [
+            [
+                m.name,
+                m.type,
+                m.size,
+                m.mode,
+                m.offset_data,
+                m.linkname,
+                base64.b64encode(m.data).decode() if m.data is not None else None,
+            ]
+            for m in self.members
+        ]
+        payload = {
+            "version": INDEX_VERSION,
+            "sha256": self.sha256,
+            "compression": self.compression,
+            "members": members,
+        }
+        return json.dumps(payload, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, content: str) -> "TarMemberIndex":
+        """Load the index from json content
+
+        :raises ValueError: The content is not a valid index.
+        """
+        payload = json.loads(content)
+        if payload.get("version") != INDEX_VERSION:
+            raise ValueError("unsupported index version")
+        members = [
+            TarMember(
+                name=name,
+                type=type_,
+                size=size,
+                mode=mode,
+                offset_data=offset_data,
+                linkname=linkname,
+                data=base64.b64decode(data) if data is not None else None,
+            )
+            for name, type_, size, mode, offset_data, linkname, data in payload["members"]
+        ]
+        return cls(sha256=payload["sha256"], compression=payload["compression"], members=members)
+
+
+def normalize_name(name: str) -> str:
+    """Normalize the member name, e.g. "./foo/" -> "foo", "./" -> "." """
+    return os.path.normpath(name)
+
+
+def compute_sha256(fileobj: IO[bytes]) -> str:
+    """Compute the sha256 digest of the file object from the beginning"""
+    fileobj.seek(0)
+    sha256_hash = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(1024 * 1024), b""):
+        sha256_hash.update(block)
+    return sha256_hash.hexdigest()
+
+
+def detect_compression(fileobj: IO[bytes]) -> Optional[str]:
+    """Detect the compression of the tarball by the magic number, None means not compressed"""
+    fileobj.seek(0)
+    head = fileobj.read(8)
+    for compression, magic in _COMPRESSION_MAGICS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def build_tar_index(fileobj: IO[bytes], sha256: Optional[str] = None) -> TarMemberIndex:
+    """Build the index by one streaming pass over the tarball
+
+    :raises PackageInvalidFileFormatError: The file is not a valid tarball.
+    """
+    compression = detect_compression(fileobj)
+    fileobj.seek(0)
+    members = []
+    inlined_size = 0
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+            for info in tar:
+                member = TarMember(
+                    name=info.name,
+                    type=info.type.decode(),
+                    size=info.size,
+                    mode=info.mode,
+                    offset_data=info.offset_data,
+                    linkname=info.linkname,
+                )
+                if (
+                    compression
+                    and info.isreg()
+                    and info.size <= INLINE_MEMBER_MAX_SIZE
+                    and inlined_size + info.size <= INLINE_TOTAL_MAX_SIZE
+                    and normalize_name(info.name).count("/") < INLINE_MAX_DEPTH
+                ):
+                    member.data = tar.extractfile(info).read()  # type: ignore[union-attr]
+                    inlined_size += info.size
+                members.append(member)
+    except (tarfile.TarError, EOFError) as e:
+        raise PackageInvalidFileFormatError() from e
+    return TarMemberIndex(sha256=sha256, compression=compression, members=members)
+
+
+def get_index_path(package_path: Path, sha256: str) -> Path:
+    return package_path.with_name(f".{package_path.name}.{sha256}.tarindex")
+
+
+def get_tar_index(
+    fileobj: IO[bytes], package_path: Path, sha256: Optional[str] = None, persist: bool = False
+) -> TarMemberIndex:
+    """Get the index of the tarball, load it from the file next to the package if exists, otherwise
+    build a new one.
+
+    :param fileobj: The opened package file
+    :param sha256: The sha256 digest of the package, computed from the file if not given and `persist` is True
+    :param persist: Whether to load and save the index file next to the package
+    """
+    if not persist:
+        return build_tar_index(fileobj, sha256)
+
+    if sha256 is None:
+        sha256 = compute_sha256(fileobj)
+    index_path = get_index_path(package_path, sha256)
+    try:
+        index = TarMemberIndex.loads(index_path.read_text())
+    except FileNotFoundError:
+        pass
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Invalid tarball index found, rebuild it, path: %s", index_path)
+    else:
+        if index.sha256 == sha256:
+            return index
+
+    index = build_tar_index(fileobj, sha256)
+    _save_index(index, index_path)
+    return index
+
+
+def _save_index(index: TarMemberIndex, index_path: Path):
+    """Save the index atomically, the index is only an optimization so errors are ignored"""
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=index_path.parent, prefix=index_path.name, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            fh.write(index.dumps())
+        os.replace(tmp_path, index_path)
+    except OSError:
+        logger.warning("Unable to save tarball index, path: %s", index_path, exc_info=True)
+
+
+class IndexedTarReader:
+    """Read members of the tarball by the member index
+
+    :param path: The path of the tarball
+    :param sha256: The sha256 digest of the tarball, computed from the file if not given and the index is persisted
+    :param persist_index: Whether to load and save the index file next to the tarball
+    :raises PackageInvalidFileFormatError: The file is not a valid tarball.
+    """
+
+    def __init__(self, path: Path, sha256: Optional[str] = None, persist_index: bool = False):
+        self.path = path
+        # Open the file first, so it can still be read after being removed, e.g. evicted from a cache
+        self._fp = open(path, mode="rb")  # noqa: SIM115
+        try:
+            self.index = get_tar_index(self._fp, path, sha256, persist=persist_index)
+        except Exception:
+            self._fp.close()
+            raise
+
+    def read(self, name: str) -> bytes:
+        """Read the content of a file, symbolic links and hard links are followed.
+
+        :raises ReadFileNotFoundError: The file does not exist or it's not a regular file.
+        :raises ReadLinkFileOutsideDirectoryError: The file is a symbolic link to outside.
+        """
+        member = self._resolve(name)
+        if member.data is not None:
+            return member.data
+        if not self.index.compression:
+            self._fp.seek(member.offset_data)
+            return self._fp.read(member.size)
+        return self._read_by_streaming(member)
+
+    def close(self):
+        self._fp.close()
+
+    def _resolve(self, name: str) -> TarMember:
+        key = normalize_name(name)
+        for _ in range(MAX_SYMLINK_LEVELS):
+            member = self.index.get(key)
+            if member is None:
+                raise ReadFileNotFoundError(f"file {name} not found")
+
+            info = member.to_tarinfo()
+            if info.isreg():
+                return member
+            elif info.issym():
+                if os.path.isabs(member.linkname):
+                    raise ReadLinkFileOutsideDirectoryError(f"{name} is invalid")
+                key = normalize_name(os.path.join(os.path.dirname(key), member.linkname))
+                if key == os.pardir or key.startswith(os.pardir + os.sep):
+                    raise ReadLinkFileOutsideDirectoryError(f"{name} is invalid")
+            elif info.islnk():
+                key = normalize_name(member.linkname)
+            else:
+                raise ReadFileNotFoundError(f"file {name} not found")
+        raise ReadFileNotFoundError(f"file {name} not found, too many levels of symbolic links")
+
+    def _read_by_streaming(self, member: TarMember) -> bytes:
+        self._fp.seek(0)
+        try:
+            with tarfile.open(fileobj=self._fp, mode="r|*") as tar:
+                for info in tar:
+                    if info.offset_data == member.offset_data and info.name == member.name:
+                        return tar.extractfile(info).read()  # type: ignore[union-attr]
+        except (tarfile.TarError, EOFError) as e:
+            raise PackageInvalidFileFormatError() from e
+        raise ReadFileNotFoundError(f"file {member.name} not found")
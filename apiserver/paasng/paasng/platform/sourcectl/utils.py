@@ -19,7 +19,6 @@ import logging
 import os
 import shutil
 import subprocess
-import tarfile
 import tempfile
 from contextlib import contextmanager
 from pathlib import Path, PurePath, PureWindowsPath
@@ -48,13 +47,17 @@ class DockerIgnore:
             invert = pattern_str.startswith("!")
             if invert:
                 pattern_str_new = pattern_str[1:]
-            self.patterns.append((invert, Pattern(pattern_str_new)))
+            pattern = Pattern(pattern_str_new)
+            # Compile the patterns in advance, instead of checking it on every match
+            pattern.compile(os.sep)
+            self.patterns.append((invert, pattern))
+        self._whitelist_set = set(self.whitelist)
 
     def should_ignore(self, filename: str) -> bool:
         """detect whether to ignore given filename,
         return True to ignore, False to include
         """
-        if PurePath(filename) in self.whitelist:
+        if self._whitelist_set and PurePath(filename) in self._whitelist_set:
             return False
 
         should_ignore = False
@@ -108,41 +111,75 @@ class DockerIgnore:
 
 
 def compress_directory_ext(
-    source_path: Union[str, Path], target_path: Union[str, Path], should_ignore: Optional[ExcludeChecker] = None
+    source_path: Union[str, Path],
+    target_path: Union[str, Path],
+    should_ignore: Optional[ExcludeChecker] = None,
+    reproducible: bool = False,
 ):
     """Compress a directory using tar+gz
 
     :param source_path: dir to be compressed
     :param target_path: tarball output path
     :param should_ignore: an optional checker the check whether compress a file in source_path
+    :param reproducible: whether to make the tarball byte-identical for the same files, the owner and mtime of
+        the files are dropped, and the single-threaded gzip is always used.
 
-    If the should_ignore parameter is not provided, the tar command will be used for packaging, as it is faster.
+    If the should_ignore parameter is not provided, the whole directory will be packaged by tar command. Otherwise,
+    the files to be packaged are listed in Python(ignored directories are skipped as a whole), then the list is
+    passed to tar command, so only files and symbolic links are packaged, empty directories are not included.
     """
     source_path = Path(source_path)
     target_path = Path(target_path)
 
-    # tar command wil faster than tarball library
-    if should_ignore is None:
+    if should_ignore is None and not reproducible:
         return compress_directory(source_path, target_path)
 
-    def compress_core(tarball: tarfile.TarFile, p: Path):
-        arcname = str(p.relative_to(source_path))
-        if should_ignore and should_ignore(arcname):
-            return
-        if p.is_dir():
-            for sub in p.iterdir():
-                compress_core(tarball, sub)
-        else:
-            tarball.add(p, arcname)
+    files = list_files_to_compress(source_path, should_ignore)
+    cmd = ["tar", "-c", "-f", str(target_path), "-C", str(source_path), "--null", "--no-recursion"]
+    if reproducible:
+        cmd += ["--format=gnu", "--owner=0", "--group=0", "--numeric-owner", "--mtime=@0"]
+    cmd += [f"--use-compress-program={_get_gzip_program(reproducible)}", "-T", "-"]
+    p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    _, stderr = p.communicate(input=b"".join(os.fsencode(f) + b"\0" for f in files))
+    if p.returncode != 0:
+        raise RuntimeError("Unable to package source, error: %s" % stderr.decode(errors="replace"))
+    return None
 
-    try:
-        from gzip import GzipFile
-    except ImportError:
-        raise tarfile.CompressionError("gzip module is not available")
 
-    with GzipFile(target_path, mode="w", mtime=0) as gz, tarfile.open(fileobj=gz, mode="w|") as tf:  # type: ignore
-        compress_core(tf, source_path)
-        return None
+def list_files_to_compress(source_path: Path, should_ignore: Optional[ExcludeChecker] = None) -> List[str]:
+    """List relative paths of the files(including symbolic links) in source_path.
+
+    The directories are walked depth-first: in each directory, the files are listed by name before
+    walking into the sub directories(also by name). So the result is stable but not sorted globally,
+    e.g. "a/z.txt" comes before "a/b/c.txt". The directories which should be ignored are not walked
+    into, symbolic links are not followed.
+    """
+    files: List[str] = []
+    dirs = [""]
+    while dirs:
+        rel_dir = dirs.pop()
+        with os.scandir(source_path / rel_dir) as it:
+            entries = sorted(it, key=lambda e: e.name)
+
+        sub_dirs = []
+        for entry in entries:
+            arcname = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if should_ignore and should_ignore(arcname):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                sub_dirs.append(arcname)
+            else:
+                files.append(arcname)
+        # Walk the sub directories in order
+        dirs.extend(reversed(sub_dirs))
+    return files
+
+
+def _get_gzip_program(reproducible: bool) -> str:
+    """Use pigz to compress in parallel if it's available, "-n" disables the timestamp in gzip header"""
+    if not reproducible and shutil.which("pigz"):
+        return "pigz -n"
+    return "gzip -n"
 
 
 def compress_directory(source_path, target_path):
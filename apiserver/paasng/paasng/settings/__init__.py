@@ -1086,9 +1086,32 @@ ENGINE_PROC_REPLICAS_BY_TYPE = {
 # 如果应用源码打包后超过该尺寸，打印警告信息
 ENGINE_APP_SOURCE_SIZE_WARNING_THRESHOLD_MB = 300
 
+# 是否复用内容相同的已上传源码包（按仓库地址、版本号、部署目录、.dockerignore 等内容计算摘要），
+# 重复部署同一版本或先后部署到预发布、生产环境时，跳过源码下载、打包和上传
+ENGINE_SOURCE_PACKAGE_REUSE_ENABLED = settings.get("ENGINE_SOURCE_PACKAGE_REUSE_ENABLED", True)
+# 已上传源码包可被复用的时长（秒）
+ENGINE_SOURCE_PACKAGE_REUSE_TIMEOUT = settings.get("ENGINE_SOURCE_PACKAGE_REUSE_TIMEOUT", 60 * 60 * 24 * 7)
+
 # 可恢复下架操作的最长时限
 ENGINE_OFFLINE_RESUMABLE_SECS = 60
 
+# 部署结束后，是否将部署日志打包为压缩分块存储，以减少日志表中的数据行数
+ENGINE_COMPACT_DEPLOY_LOGS = settings.get("ENGINE_COMPACT_DEPLOY_LOGS", False)
+
+# 是否启用 Git 仓库的本地镜像缓存（裸仓库，同一节点的进程共享），读取文件、导出源码、获取分支列表时仅需增量拉取
+BARE_GIT_MIRROR_CACHE_ENABLED = settings.get("BARE_GIT_MIRROR_CACHE_ENABLED", True)
+# 镜像缓存目录，默认为系统临时目录下的 bkpaas-git-mirrors
+BARE_GIT_MIRROR_CACHE_DIR = settings.get("BARE_GIT_MIRROR_CACHE_DIR", "")
+# 镜像缓存的最大磁盘占用（单位：MB），超过时按最近使用时间淘汰
+BARE_GIT_MIRROR_CACHE_MAX_SIZE_MB = settings.get("BARE_GIT_MIRROR_CACHE_MAX_SIZE_MB", 10 * 1024)
+
+# 是否启用源码包的本地缓存（按源码包的 sha256 索引，同一节点的进程共享），避免部署时多次从对象存储下载同一个源码包
+SOURCE_PACKAGE_CACHE_ENABLED = settings.get("SOURCE_PACKAGE_CACHE_ENABLED", True)
+# 源码包缓存目录，默认为系统临时目录下的 bkpaas-source-packages
+SOURCE_PACKAGE_CACHE_DIR = settings.get("SOURCE_PACKAGE_CACHE_DIR", "")
+# 源码包缓存的最大磁盘占用（单位：MB），超过时按最近使用时间淘汰
+SOURCE_PACKAGE_CACHE_MAX_SIZE_MB = settings.get("SOURCE_PACKAGE_CACHE_MAX_SIZE_MB", 5 * 1024)
+
 # == 应用运行时相关配置
 #
 # 默认运行时镜像名称
@@ -1153,6 +1176,12 @@ PAAS_API_LOG_REDIS_HANDLER = settings.get(
         "url": "redis://localhost:6379/0",
         "queue_name": "paas_ng-meters",
         "tags": [],
+        # 日志由后台线程批量发送, 本地缓冲队列的最大长度, 队列满时直接丢弃日志, 避免影响请求耗时
+        "max_queue_size": 10000,
+        # 单次发送的最大日志条数
+        "batch_size": 200,
+        # 发送间隔（单位：秒）, 缓冲的日志达到 batch_size 或等待超过该间隔时发送
+        "flush_interval": 1,
     },
 )
 
@@ -1487,6 +1516,10 @@ BKPAAS_PLATFORM_MANAGERS = settings.get("BKPAAS_PLATFORM_MANAGERS", [])
 ENABLE_SEND_OPERATION_REPORT_EMAIL_TO_PLAT_MANAGE = settings.get(
     "ENABLE_SEND_OPERATION_REPORT_EMAIL_TO_PLAT_MANAGE", False
 )
+# 采集应用运营报告时，每个子任务处理的应用数量
+OPERATION_REPORT_COLLECT_CHUNK_SIZE = settings.get("OPERATION_REPORT_COLLECT_CHUNK_SIZE", 50)
+# 采集应用运营报告时，同时执行的子任务数量，用于限制对监控、访问统计等后端服务的并发请求
+OPERATION_REPORT_COLLECT_CONCURRENCY = settings.get("OPERATION_REPORT_COLLECT_CONCURRENCY", 4)
 
 # 发送验证码，没有配置通知渠道的版本可以关闭该功能
 ENABLE_VERIFICATION_CODE = settings.get("ENABLE_VERIFICATION_CODE", False)
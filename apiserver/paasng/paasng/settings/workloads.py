@@ -150,6 +150,13 @@ MUL_MODULE_VOLUME_HOST_PATH_APP_LOGGING_DIR = settings.get(
 K8S_DEFAULT_CONNECT_TIMEOUT = 5
 K8S_DEFAULT_READ_TIMEOUT = 60
 
+# 访问集群 apiserver 时，每个进程内对同一个 apiserver 地址保持的最大连接数。
+# API 客户端在进程内共享，使用 gevent worker 时并发请求较多，默认值（CPU 核数 * 5）容易不够用
+K8S_CONNECTION_POOL_MAXSIZE = settings.get("K8S_CONNECTION_POOL_MAXSIZE", 32)
+
+# 是否使用进程内共享的 informer 缓存来提供进程 list-watch 接口，开启后同一命名空间的多个查看者共用一条 watch 连接
+PROCESS_INFORMER_ENABLED = settings.get("PROCESS_INFORMER_ENABLED", True)
+
 # 指定 kubectl 使用的 config.yaml 文件路径，容器化交付时由 secret 挂载而来
 KUBE_CONFIG_FILE = settings.get("KUBE_CONFIG_FILE", "/data/kubelet/conf/kubeconfig.yaml")
 
@@ -265,6 +272,11 @@ ENGINE_PROC_REPLICAS_BY_TYPE = {
 # 插件监控图表相关配置（原生 Prometheus 使用，仅用于不支持蓝鲸监控的集群 k8s 1.12-）
 MONITOR_CONFIG = settings.get("MONITOR_CONFIG", {})
 
+# 查询进程资源指标时，是否将多个实例合并为一条查询（按 pod 聚合后再拆分结果），可减少请求次数
+METRICS_BATCH_QUERY_ENABLED = settings.get("METRICS_BATCH_QUERY_ENABLED", True)
+# 并发查询资源指标的最大线程数
+METRICS_QUERY_MAX_WORKERS = settings.get("METRICS_QUERY_MAX_WORKERS", 8)
+
 # ---------------------------------------------
 # （internal）内部配置，仅开发项目与特殊环境下使用
 # ---------------------------------------------
@@ -15,10 +15,16 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import atexit
 import json
 import logging
+import os
+import queue
+import threading
 import time
-from typing import Dict
+import weakref
+from functools import lru_cache
+from typing import Dict, List, Optional
 
 import redis
 from django.conf import settings
@@ -26,12 +32,21 @@ from django.http.response import HttpResponse
 from django.urls import resolve
 from django.utils.encoding import force_str
 
-from paasng.misc.metrics import API_VISITED_COUNTER, API_VISITED_TIME_CONSUME_HISTOGRAM
+from paasng.misc.metrics import API_LOG_DROPPED_COUNTER, API_VISITED_COUNTER, API_VISITED_TIME_CONSUME_HISTOGRAM
 from paasng.utils.basic import get_client_ip
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4096)
+def resolve_url_name(path: str) -> Optional[str]:
+    """Resolve the url name of given path, return None if failed, the result is cached per path"""
+    try:
+        return resolve(path).url_name
+    except Exception:
+        return None
+
+
 class ApiLogMiddleware:
     project_code = "bk-paas-ng"
     index_name = "log-paas_ng-{date}"
@@ -48,13 +63,11 @@ class ApiLogMiddleware:
         response = self.get_response(request)
         msecs_cost = int((time.time() - request.start_time) * 1000)
 
-        try:
-            data = dict(
-                method=request.method, endpoint=resolve(request.path_info).url_name, status=response.status_code
-            )
-        except Exception:
-            data = dict(method=request.method, endpoint="", status=response.status_code)
+        url_name = resolve_url_name(request.path_info)
+        if url_name is None:
+            url_name = ""
             logger.warning(f"api<{request.path}> resolve failed")
+        data = dict(method=request.method, endpoint=url_name, status=response.status_code)
 
         API_VISITED_COUNTER.labels(**data).inc()
         API_VISITED_TIME_CONSUME_HISTOGRAM.labels(**data).observe(msecs_cost)
@@ -111,29 +124,180 @@ class ApiLogMiddleware:
         save_redis(data)
 
 
-_redis_client = None
+class ApiLogShipper:
+    """Ships the api logs to the redis queue in background.
+
+    The logs are put into a bounded in-memory queue, a daemon thread(greenlet when the gevent worker
+    is used) takes them out and sends them by batch, when the batch is full or `flush_interval`
+    seconds have passed. Logs are dropped when the queue is full, so the requests are never blocked.
+    The logs left in the queue are sent at exit.
+
+    :param client: The redis client
+    :param queue_name: The name of the redis queue(list)
+    :param max_queue_size: Max number of logs kept in memory
+    :param batch_size: Max number of logs sent at once
+    :param flush_interval: Max seconds a log waits before being sent
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        queue_name: str,
+        max_queue_size: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1,
+    ):
+        self.client = client
+        self.queue_name = queue_name
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stopped = threading.Event()
+
+    def put(self, doc: Dict) -> bool:
+        """Put a log into the queue, return False if it was dropped"""
+        self._ensure_running()
+        try:
+            self._queue.put_nowait(doc)
+        except queue.Full:
+            API_LOG_DROPPED_COUNTER.labels(reason="queue_full").inc()
+            return False
+        return True
+
+    def flush(self):
+        """Send all logs in the queue right now"""
+        while batch := self._take_batch(block=False):
+            self._send(batch)
+
+    def stop(self, timeout: float = 5):
+        """Stop the background thread and send the logs left in the queue, the shipper can't be restarted"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _ensure_running(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            # The thread does not survive the fork, start a new one in current process
+            if self._pid is not None:
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._thread = threading.Thread(target=self._run, name="api-log-shipper", daemon=True)
+            self._thread.start()
+            self._pid = pid
+            _flush_at_exit(self)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                if batch := self._take_batch(block=True):
+                    self._send(batch)
+            except Exception:
+                logger.exception("api log shipper failed")
+
+    def _take_batch(self, block: bool) -> List[Dict]:
+        """Take a batch of logs from the queue
+
+        :param block: Whether to wait for the logs, the batch is returned after `flush_interval` seconds
+            or it's full, if not blocking, only the logs already in queue are taken. An empty batch is
+            returned if no logs arrived in `flush_interval` seconds.
+        """
+        try:
+            batch = [self._queue.get(block=block, timeout=self.flush_interval if block else None)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch: List[Dict]):
+        values = []
+        for doc in batch:
+            try:
+                values.append(json.dumps(doc))
+            except Exception as e:
+                logger.warning(f"unable to dump api log data: {e}")
+        if not values:
+            return
+
+        try:
+            self.client.rpush(self.queue_name, *values)
+        except Exception as e:
+            API_LOG_DROPPED_COUNTER.labels(reason="send_failed").inc(len(values))
+            logger.warning("unable to send %d api logs: %s", len(values), e)
+
+
+_shipper: Optional[ApiLogShipper] = None
+_shipper_lock = threading.Lock()
+
+# The shippers to be flushed at exit, the exit hook is registered only once, no matter how many times
+# the shippers were restarted after forking
+_shippers_to_flush: "weakref.WeakSet[ApiLogShipper]" = weakref.WeakSet()
+_atexit_registered = False
+_atexit_lock = threading.Lock()
+
+
+def _flush_at_exit(shipper: ApiLogShipper):
+    global _atexit_registered
+    with _atexit_lock:
+        _shippers_to_flush.add(shipper)
+        if not _atexit_registered:
+            atexit.register(_flush_shippers)
+            _atexit_registered = True
+
+
+def _flush_shippers():
+    for shipper in list(_shippers_to_flush):
+        shipper.flush()
+
+
+def get_shipper() -> ApiLogShipper:
+    """Get the shipper of current process, create one if not exists"""
+    global _shipper
+    if _shipper is not None:
+        return _shipper
+
+    with _shipper_lock:
+        if _shipper is None:
+            handler_config = settings.PAAS_API_LOG_REDIS_HANDLER
+            connection_options = getattr(settings, "REDIS_CONNECTION_OPTIONS", {})
+            # TODO ee 版本如果开启, 再支持 sentinel 模式. 届时 PAAS_API_LOG_REDIS_HANDLER 参数也要适配调整
+            client = redis.from_url(handler_config["url"], **connection_options)
+            _shipper = ApiLogShipper(
+                client,
+                handler_config["queue_name"],
+                max_queue_size=handler_config.get("max_queue_size", 10000),
+                batch_size=handler_config.get("batch_size", 200),
+                flush_interval=handler_config.get("flush_interval", 1),
+            )
+    return _shipper
 
 
 def save_redis(doc: Dict):
     """
-    保存日志数据到 Redis 队列
+    保存日志数据到 Redis 队列, 日志由后台线程批量发送, 不会阻塞当前请求
     """
     handler_config = settings.PAAS_API_LOG_REDIS_HANDLER
     if not handler_config.get("enabled", False):
         return
 
-    # Connect to redis and save the connection pool afterwards
-    global _redis_client
-    if _redis_client is None:
-        connection_options = getattr(settings, "REDIS_CONNECTION_OPTIONS", {})
-        # TODO ee 版本如果开启, 再支持 sentinel 模式. 届时 PAAS_API_LOG_REDIS_HANDLER 参数也要适配调整
-        _redis_client = redis.from_url(handler_config["url"], **connection_options)
-
     doc["tags"] = handler_config.get("tags", [])
-    try:
-        data = json.dumps(doc)
-    except Exception as e:
-        logger.warning(f"unable to dump api log data: {e}")
-        return
-
-    _redis_client.rpush(handler_config["queue_name"], data)
+    get_shipper().put(doc)
@@ -15,6 +15,8 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import copy
+import datetime
 from typing import Dict, Literal, Optional
 
 from django.conf import settings
@@ -88,6 +90,28 @@ class SmartSearch:
         )
         return self
 
+    def with_time_range(self, start_ms: int, end_ms: int) -> "SmartSearch":
+        """Return a copy of the search whose time range is replaced by [start_ms, end_ms)
+
+        :param start_ms: the start time(inclusive) in epoch millis
+        :param end_ms: the end time(exclusive) in epoch millis
+        """
+        data = self.search.to_dict()
+        old_filter = {"range": self.time_range.get_time_range_filter(self.time_field)}
+        new_filter = {"range": {self.time_field: {"gte": start_ms, "lt": end_ms, "format": "epoch_millis"}}}
+        bool_query = data.setdefault("query", {}).setdefault("bool", {})
+        filters = [f for f in bool_query.get("filter", []) if f != old_filter]
+        bool_query["filter"] = [new_filter, *filters]
+
+        ret = copy.copy(self)
+        ret.time_range = SmartTimeRange(
+            time_range="customized",
+            start_time=datetime.datetime.fromtimestamp(start_ms / 1000, tz=datetime.timezone.utc),
+            end_time=datetime.datetime.fromtimestamp(end_ms / 1000, tz=datetime.timezone.utc),
+        )
+        ret.search = Search.from_dict(data)
+        return ret
+
     def to_dict(self, count: bool = False):
         """Serialize the search into the dictionary that will be sent over as the request's body."""
         return self.search.to_dict(count=count)
@@ -17,20 +17,34 @@
 
 import hashlib
 import io
+import logging
 import shutil
+import time
+import zlib
 from contextlib import contextmanager
 from pathlib import Path
 from typing import IO, Optional, Tuple, Union
 from urllib.parse import urlparse
 
+import requests
+
 from paasng.utils.moby_distribution.registry import exceptions
 from paasng.utils.moby_distribution.registry.client import DockerRegistryV2Client, URLBuilder, default_client
 from paasng.utils.moby_distribution.registry.resources import RepositoryResource
 from paasng.utils.moby_distribution.registry.utils import TypeTimeout
 from paasng.utils.moby_distribution.spec.base import Descriptor
 
+logger = logging.getLogger(__name__)
+
 
 class Blob(RepositoryResource):
+    # Size of every chunk when uploading by streaming
+    upload_chunk_size = 1024 * 1024 * 64
+    # Size of every read when downloading, the content is written to `local_path` or `fileobj` directly
+    download_chunk_size = 1024 * 1024 * 4
+    # Max retries of uploading a chunk, the upload is resumed from the last offset acknowledged by the registry
+    max_chunk_retries = 3
+
     def __init__(
         self,
         repo: str,
@@ -82,17 +96,21 @@ class Blob(RepositoryResource):
 
         url = URLBuilder.build_blobs_url(self.client.api_base_url, repo=self.repo, digest=digest)
         resp = self.client.get(url=url, stream=True, timeout=self.timeout)
-        with self.accessor.open(mode="wb") as fh:
-            for chunk in resp.iter_content(chunk_size=1024):
+        with resp, self.accessor.open(mode="wb") as fh:
+            for chunk in resp.iter_content(chunk_size=self.download_chunk_size):
                 fh.write(chunk)
 
-    def upload(self) -> Descriptor:
-        """upload the blob from `local_path` or `fileobj` to the registry by streaming"""
+    def upload(self, chunk_size: Optional[int] = None) -> Descriptor:
+        """upload the blob from `local_path` or `fileobj` to the registry by streaming
+
+        :param chunk_size: size of every chunk, default to `upload_chunk_size`
+        """
         uuid, location = self._initiate_blob_upload()
-        blob = BlobWriter(uuid, location, client=self.client)
+        blob = BlobWriter(uuid, location, client=self.client, timeout=self.timeout, max_retries=self.max_chunk_retries)
         with self.accessor.open(mode="rb") as fh:
+            # The digest is computed while uploading, a chunk is signed only once even if it was retried
             signer = HashSignWrapper(fh=blob)
-            shutil.copyfileobj(fsrc=fh, fdst=signer, length=1024 * 1024 * 64)
+            shutil.copyfileobj(fsrc=fh, fdst=signer, length=chunk_size or self.upload_chunk_size)
 
         digest = signer.digest()
         blob.commit(digest)
@@ -187,20 +205,68 @@ class Blob(RepositoryResource):
 
 
 class BlobWriter:
-    def __init__(self, uuid: str, location: str, client: DockerRegistryV2Client, *, timeout: TypeTimeout = None):
+    """Upload a blob chunk by chunk, if a chunk failed to upload, query the upload status from the registry and
+    resume from the last acknowledged offset.
+
+    :param max_retries: max retries of uploading a chunk
+    :param retry_interval: seconds to wait before the first retry, it grows linearly with the retries
+    """
+
+    def __init__(
+        self,
+        uuid: str,
+        location: str,
+        client: DockerRegistryV2Client,
+        *,
+        timeout: TypeTimeout = None,
+        max_retries: int = 3,
+        retry_interval: float = 1,
+    ):
         self.uuid = uuid
         self.location = location
         self.client = client
         self._committed = False
         self._offset = 0
         self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
 
     def write(self, buffer: Union[bytes, bytearray]) -> int:
+        start = self._offset
+        end = start + len(buffer)
+        retries = 0
+        while self._offset < end:
+            # Only the part not acknowledged yet is uploaded when resuming
+            data = buffer if self._offset == start else buffer[self._offset - start :]
+            try:
+                self._upload_chunk(data)
+            except (requests.ConnectionError, requests.Timeout, exceptions.RequestErrorWithResponse) as e:
+                if retries >= self.max_retries or not _is_retryable(e):
+                    raise
+                retries += 1
+                logger.warning(
+                    "failed to upload a chunk of blob(%s) at offset %s, retrying(%s/%s): %s",
+                    self.uuid,
+                    self._offset,
+                    retries,
+                    self.max_retries,
+                    e,
+                )
+                time.sleep(self.retry_interval * retries)
+                self._resume()
+                if self._offset < start:
+                    raise exceptions.RequestError(
+                        f"the upload offset({self._offset}) goes back before the current chunk({start})",
+                        status_code=None,
+                    )
+        return self._offset - start
+
+    def _upload_chunk(self, data: Union[bytes, bytearray]):
         headers = {
-            "content-range": f"{self._offset}-{self._offset + len(buffer) - 1}",
+            "content-range": f"{self._offset}-{self._offset + len(data) - 1}",
             "content-type": "application/octet-stream",
         }
-        resp = self.client.patch(url=self.location, data=buffer, headers=headers, timeout=self.timeout)
+        resp = self.client.patch(url=self.location, data=data, headers=headers, timeout=self.timeout)
 
         if resp.status_code != 202:
             raise exceptions.RequestErrorWithResponse(
@@ -209,9 +275,31 @@ class BlobWriter:
                 response=resp,
             )
 
-        start_s, end_s = resp.headers["range"].split("-", 1)
-        start, end = int(start_s), int(end_s)
-        size = end - start + 1 - self._offset
+        offset = self._update_session(resp) + 1
+        if offset <= self._offset:
+            raise exceptions.RequestErrorWithResponse(
+                f"the registry didn't accept the chunk at offset {self._offset}",
+                status_code=resp.status_code,
+                response=resp,
+            )
+        self._offset = offset
+
+    def _resume(self):
+        """Query the status of the upload process, then continue from the acknowledged offset"""
+        resp = self.client.get(url=self.location, timeout=self.timeout)
+        if resp.status_code != 204:
+            raise exceptions.RequestErrorWithResponse(
+                "can't retrieve the status of an upload process",
+                status_code=resp.status_code,
+                response=resp,
+            )
+        # The registry returns the range "0-0" when nothing was uploaded
+        end = self._update_session(resp)
+        self._offset = end + 1 if end > 0 else 0
+
+    def _update_session(self, resp: requests.Response) -> int:
+        """Update the upload session by the response, return the end(inclusive) of the uploaded range"""
+        _, end_s = resp.headers.get("range", "0-0").split("-", 1)
 
         uuid = resp.headers.get("docker-upload-uuid")
         location = resp.headers["location"]
@@ -228,8 +316,7 @@ class BlobWriter:
 
         self.uuid = uuid
         self.location = location
-        self._offset += size
-        return size
+        return int(end_s)
 
     def commit(self, digest: str) -> bool:
         params = {"digest": digest}
@@ -247,6 +334,15 @@ class BlobWriter:
         return self._offset
 
 
+def _is_retryable(e: Exception) -> bool:
+    """Network errors, server errors and range mismatch(416) can be recovered by resuming"""
+    if isinstance(e, exceptions.RequestErrorWithResponse):
+        if e.response is None:
+            return False
+        return e.response.status_code == 416 or e.response.status_code >= 500
+    return True
+
+
 class Accessor:
     def __init__(self, local_path: Optional[Path] = None, fileobj: Optional[IO] = None):
         if not local_path and not fileobj:
@@ -307,3 +403,88 @@ class HashSignWrapper:
     def digest(self) -> str:
         """return hexdigest with hash method name"""
         return f"{self.signer.name}:{self.signer.hexdigest()}"
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class LayerSignWrapper:
+    """A Wrapper can sign the gzipped layer(as digest) and its uncompressed tarball(as diff_id) when copying it,
+    the layer is decompressed incrementally, so it only needs to be read once.
+
+    If the layer is not gzipped, the diff_id is the same as the digest.
+
+    Usage:
+    >>> import shutil
+    >>> src = open("layer.tar.gz", mode="rb")
+    >>> signer = LayerSignWrapper()
+    >>> shutil.copyfileobj(src, signer)
+    >>> signer.digest(), signer.diff_id()
+    """
+
+    # Max bytes of decompressed data produced at a time, to limit the memory usage
+    decompress_chunk_size = 1024 * 1024
+
+    def __init__(self, fh: Optional[Union[IO, CounterIO, BlobWriter]] = None, constructor=hashlib.sha256):
+        self.raw_signer = HashSignWrapper(fh=fh, constructor=constructor)
+        self.uncompressed_signer = HashSignWrapper(constructor=constructor)
+        self._is_gzipped: Optional[bool] = None
+        self._head = b""
+        self._decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+    def write(self, chunk: bytes):
+        written = self.raw_signer.write(chunk)
+        if self._is_gzipped is None:
+            self._head += chunk
+            if len(self._head) < len(GZIP_MAGIC):
+                return written
+            self._is_gzipped = self._head.startswith(GZIP_MAGIC)
+            chunk, self._head = self._head, b""
+
+        if self._is_gzipped:
+            try:
+                self._decompress(chunk)
+            except zlib.error:
+                # Keep the same behavior as `gzip.open`, a layer can't be decompressed is treated as not gzipped
+                self._is_gzipped = False
+        return written
+
+    def _decompress(self, data: bytes):
+        while True:
+            if self._decompressor.eof:
+                # The gzip file may contain multiple members, and may be padded with zeroes after a member,
+                # skip the padding like `gzip` module, then continue with the next member
+                data = data.lstrip(b"\0")
+                if not data:
+                    return
+                self._decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+
+            out = self._decompressor.decompress(data, self.decompress_chunk_size)
+            self.uncompressed_signer.write(out)
+            if self._decompressor.eof:
+                data = self._decompressor.unused_data
+                continue
+
+            data = self._decompressor.unconsumed_tail
+            if not data and len(out) < self.decompress_chunk_size:
+                return
+
+    def tell(self) -> int:
+        return self.raw_signer.tell()
+
+    def digest(self) -> str:
+        """return the digest of the layer"""
+        return self.raw_signer.digest()
+
+    def diff_id(self) -> str:
+        """return the digest of the uncompressed tarball, should be called after all content was written
+
+        :raise EOFError: raise if the gzipped layer was truncated.
+        """
+        if not self._is_gzipped:
+            return self.raw_signer.digest()
+
+        self.uncompressed_signer.write(self._decompressor.flush())
+        if not self._decompressor.eof:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+        return self.uncompressed_signer.digest()
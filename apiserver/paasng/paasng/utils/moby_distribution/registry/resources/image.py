@@ -22,9 +22,11 @@ import json
 import logging
 import shutil
 import tarfile
+import threading
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Protocol
 
 from pydantic import BaseModel, Field
 
@@ -38,7 +40,7 @@ except ImportError:
 
 from paasng.utils.moby_distribution.registry.client import DockerRegistryV2Client, default_client
 from paasng.utils.moby_distribution.registry.resources import RepositoryResource
-from paasng.utils.moby_distribution.registry.resources.blobs import Blob, HashSignWrapper
+from paasng.utils.moby_distribution.registry.resources.blobs import Blob, HashSignWrapper, LayerSignWrapper
 from paasng.utils.moby_distribution.registry.resources.manifests import ManifestRef
 from paasng.utils.moby_distribution.registry.utils import (
     TypeTimeout,
@@ -70,6 +72,43 @@ class LayerRef(BaseModel):
     local_path: Optional[Path] = None
 
 
+class DiffIDCache(Protocol):
+    """The cache of the diff_id of layers, keyed by the digest of the gzipped layer.
+
+    The digest is content addressed, so the mapping never changes once recorded.
+    """
+
+    def get(self, digest: str) -> Optional[str]: ...
+
+    def set(self, digest: str, diff_id: str): ...
+
+
+class InMemoryDiffIDCache:
+    """A thread-safe LRU implementation of `DiffIDCache`, shared by all images in the process by default."""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            diff_id = self._data.get(digest)
+            if diff_id is not None:
+                self._data.move_to_end(digest)
+            return diff_id
+
+    def set(self, digest: str, diff_id: str):
+        with self._lock:
+            self._data[digest] = diff_id
+            self._data.move_to_end(digest)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+default_diff_id_cache: DiffIDCache = InMemoryDiffIDCache()
+
+
 class ImageRef(RepositoryResource):
     """ImageRef is used to Manipulate Docker images"""
 
@@ -82,11 +121,13 @@ class ImageRef(RepositoryResource):
         client: DockerRegistryV2Client = default_client,
         *,
         timeout: TypeTimeout = client_default_timeout,
+        diff_id_cache: Optional[DiffIDCache] = None,
     ):
         super().__init__(repo, client, timeout=timeout)
         self.reference = reference
         self.layers = layers
         self._initial_config = initial_config
+        self.diff_id_cache = diff_id_cache or default_diff_id_cache
         self._dirty = False
         # diff id is the digest of uncompressed tarball
         self._append_diff_ids: List[str] = []
@@ -100,6 +141,7 @@ class ImageRef(RepositoryResource):
         to_repo: Optional[str] = None,
         to_reference: Optional[str] = None,
         client: DockerRegistryV2Client = default_client,
+        diff_id_cache: Optional[DiffIDCache] = None,
     ):
         """Initial a `ImageRef` from `{from_repo}:{from_reference}` but will named it as `{to_repo, to_reference}`
 
@@ -126,6 +168,7 @@ class ImageRef(RepositoryResource):
             layers=layers,
             initial_config=fh.read().decode(),
             client=client,
+            diff_id_cache=diff_id_cache,
         )
 
     @classmethod
@@ -136,6 +179,7 @@ class ImageRef(RepositoryResource):
         to_repo: Optional[str] = None,
         to_reference: Optional[str] = None,
         client: DockerRegistryV2Client = default_client,
+        diff_id_cache: Optional[DiffIDCache] = None,
     ):
         """Initial a `ImageRef` from a tarball locate in local disk, but will named it as `{to_repo, to_reference}`
 
@@ -164,12 +208,14 @@ class ImageRef(RepositoryResource):
             if to_reference is None:
                 to_reference = named.tag or "latest"
 
+            diff_id_cache = diff_id_cache or default_diff_id_cache
             layers = []
             for layer in manifest.Layers:
-                # gzip it for smaller size
+                # gzip it for smaller size, the uncompressed tarball is signed at the same time as diff_id
                 gzipped_filepath = workplace / (layer + ".gz")
                 with (workplace / layer).open(mode="rb") as fh, gzip.open(gzipped_filepath, mode="wb") as compressed:
-                    shutil.copyfileobj(fh, compressed)
+                    uncompressed_signer = HashSignWrapper(fh=compressed)
+                    shutil.copyfileobj(fh, uncompressed_signer)
 
                 # The gzipped file can only be obtained after the compressed object is closed
                 # (because the gzip context information has not yet been written).
@@ -177,6 +223,7 @@ class ImageRef(RepositoryResource):
                 with gzipped_filepath.open(mode="rb") as fh:
                     shutil.copyfileobj(fh, gzipped_signer)
 
+                diff_id_cache.set(gzipped_signer.digest(), uncompressed_signer.digest())
                 layers.append(
                     LayerRef(
                         repo=to_repo,
@@ -192,6 +239,7 @@ class ImageRef(RepositoryResource):
                 layers=layers,
                 initial_config=(workplace / manifest.config).read_text(),
                 client=client,
+                diff_id_cache=diff_id_cache,
             )
 
     def save(self, dest: str):
@@ -256,58 +304,46 @@ class ImageRef(RepositoryResource):
     def add_layer(self, layer: LayerRef, history: Optional[History] = None) -> DockerManifestLayerDescriptor:
         """Add a layer to this image.
 
-        Step:
-          1. calculate the sha256 sum for the gzipped_tarball, as digest
-          2. calculate the sha256 sum for the uncompressed_tarball, as diff_id
+        The layer is read only once, the sha256 sum for the gzipped_tarball(as digest) and the sha256 sum for
+        the uncompressed_tarball(as diff_id) are calculated at the same time. The diff_id of a remote layer is
+        looked up in `diff_id_cache` first, the layer will not be downloaded if it's known.
         """
         if not layer.exists and not layer.local_path:
             raise ValueError("Unknown layer")
 
-        uncompressed_tarball_signer = HashSignWrapper()
         # Add local layer
         if layer.local_path:
-            # Step 1: calculate the sha256 sum for the tarball file
-            raw_tarball_signer = HashSignWrapper()
+            signer = LayerSignWrapper()
             with layer.local_path.open(mode="rb") as gzipped:
-                shutil.copyfileobj(gzipped, raw_tarball_signer)
-                size = raw_tarball_signer.tell()
-
-            # Step 2: calculate the sha256 sum for the uncompressed_tarball
-            # for gzipped tarball, we need decompress first
-            try:
-                with gzip.open(filename=layer.local_path) as uncompressed:
-                    shutil.copyfileobj(uncompressed, uncompressed_tarball_signer)
-            except OSError:
-                uncompressed_tarball_signer = raw_tarball_signer
-
-            if layer.digest and layer.digest != raw_tarball_signer.digest():
+                shutil.copyfileobj(gzipped, signer, length=1024 * 1024)
+            size = signer.tell()
+
+            if layer.digest and layer.digest != signer.digest():
                 raise ValueError(
                     "Wrong digest, layer.digest<'%s'> != signer.digest<'%s'>",
                     layer.digest,
-                    raw_tarball_signer.digest(),
+                    signer.digest(),
                 )
 
-            layer.digest = raw_tarball_signer.digest()
+            diff_id = signer.diff_id()
+            layer.digest = signer.digest()
             layer.repo = self.repo
             layer.size = size
 
         # Add remote layer if the layer is exists in registry
+        elif (cached_diff_id := self.diff_id_cache.get(layer.digest)) is not None:
+            diff_id = cached_diff_id
+            size = layer.size
         else:
-            with generate_temp_dir() as temp_dir:
-                # Step 1: calculate the sha256 sum for the gzipped_tarball
-                with (temp_dir / "blob").open(mode="wb") as fh:
-                    raw_tarball_signer = HashSignWrapper(fh=fh)
-                    Blob(
-                        repo=layer.repo,
-                        digest=layer.digest,
-                        fileobj=raw_tarball_signer,
-                        client=self.client,
-                    ).download()
-                    size = raw_tarball_signer.tell()
-
-                # Step 2: calculate the sha256 sum for the uncompressed_tarball
-                with gzip.open(filename=(temp_dir / "blob")) as uncompressed:
-                    shutil.copyfileobj(uncompressed, uncompressed_tarball_signer)
+            # Download the blob into the signer directly, no temporary file is needed
+            signer = LayerSignWrapper()
+            Blob(
+                repo=layer.repo,
+                digest=layer.digest,
+                fileobj=signer,
+                client=self.client,
+            ).download()
+            size = signer.tell()
 
             if layer.size != size:
                 raise ValueError(
@@ -315,15 +351,17 @@ class ImageRef(RepositoryResource):
                     layer.size,
                     size,
                 )
-            if layer.digest != raw_tarball_signer.digest():
+            if layer.digest != signer.digest():
                 raise ValueError(
                     "Wrong digest, layer.digest<'%s'> != signer.digest<'%s'>",
                     layer.digest,
-                    raw_tarball_signer.digest(),
+                    signer.digest(),
                 )
+            diff_id = signer.diff_id()
 
+        self.diff_id_cache.set(layer.digest, diff_id)
         self._dirty = True
-        self._append_diff_ids.append(uncompressed_tarball_signer.digest())
+        self._append_diff_ids.append(diff_id)
         self._append_historys.append(
             history
             or History(
@@ -336,7 +374,7 @@ class ImageRef(RepositoryResource):
         self.layers.append(layer)
 
         return DockerManifestLayerDescriptor(
-            digest=raw_tarball_signer.digest(),
+            digest=layer.digest,
             size=size,
         )
 
@@ -404,7 +442,10 @@ class ImageRef(RepositoryResource):
         """
 
         if layer.exists and layer.repo != self.repo:
-            descriptor = Blob(repo=self.repo, digest=layer.digest, client=self.client).mount_from(from_repo=layer.repo)
+            # The local file is used when the registry can't mount the blob, so it need not be downloaded
+            descriptor = Blob(
+                repo=self.repo, digest=layer.digest, local_path=layer.local_path, client=self.client
+            ).mount_from(from_repo=layer.repo)
         elif not layer.exists:
             blob = Blob(repo=self.repo, local_path=layer.local_path, client=self.client)
             descriptor = blob.upload()
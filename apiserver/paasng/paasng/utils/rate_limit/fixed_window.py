@@ -19,11 +19,8 @@ import abc
 import time
 
 import redis
-import wrapt
-from rest_framework.response import Response
-from rest_framework.status import HTTP_429_TOO_MANY_REQUESTS
 
-from paasng.core.core.storages.redisdb import get_default_redis
+from paasng.utils.rate_limit import gcra
 from paasng.utils.rate_limit.constants import UserAction
 
 
@@ -100,17 +97,5 @@ class UserActionRateLimiter(RedisFixedWindowRateLimiter):
         return f"bk_paas3:rate_limits:{self.username}:{self.action}:{cur_window}"
 
 
-def rate_limits_by_user(action: UserAction, window_size: int, threshold: int):
-    """适用于 Django View 方法的装饰器，提供频率限制的能力"""
-
-    @wrapt.decorator
-    def wrapper(wrapped, instance, args, kwargs):
-        rate_limiter = UserActionRateLimiter(
-            get_default_redis(), instance.request.user.username, action, window_size, threshold
-        )
-        if not rate_limiter.is_allowed():
-            return Response(status=HTTP_429_TOO_MANY_REQUESTS)
-
-        return wrapped(*args, **kwargs)
-
-    return wrapper
+# 兼容旧的导入路径, 装饰器已改为使用原子化的 GCRA 速率控制器
+rate_limits_by_user = gcra.rate_limits_by_user
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import abc
+import math
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import redis
+import wrapt
+from django.http.response import HttpResponseBase
+from redis.client import Script
+from rest_framework.response import Response
+from rest_framework.status import HTTP_429_TOO_MANY_REQUESTS
+
+from paasng.core.core.storages.redisdb import get_default_redis
+from paasng.utils.rate_limit.constants import UserAction
+
+# GCRA(Generic Cell Rate Algorithm), the only state is the "theoretical arrival time"(TAT) of the next request
+#
+# KEYS[1]: the key of TAT
+# ARGV[1]: current time(ms), ARGV[2]: window size(ms), ARGV[3]: threshold
+# return: {allowed(0/1), remaining, retry_after(ms)}
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local threshold = tonumber(ARGV[3])
+local interval = window / threshold
+
+local tat = tonumber(redis.call("GET", KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if now < allow_at then
+    return {0, 0, math.ceil(allow_at - now)}
+end
+
+redis.call("SET", KEYS[1], new_tat, "PX", math.ceil(new_tat - now))
+return {1, math.floor((now - allow_at) / interval), 0}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """速率控制结果
+
+    :param allowed: 是否允许当前行为
+    :param remaining: 剩余可用次数
+    :param retry_after: 被限制时, 需要等待多久才能重试（单位：秒）
+    """
+
+    allowed: bool
+    remaining: int
+    retry_after: float = 0
+
+
+class RedisGCRARateLimiter(abc.ABC):
+    """基于 Redis 的 GCRA 速率控制器, 通过 Lua 脚本在一次请求中原子地完成判断与更新, 每个 key 仅保存一个时间戳
+
+    与令牌桶类似, 允许在时间窗口内突发 threshold 次请求, 之后每隔 window_size / threshold 秒恢复一次配额
+    """
+
+    # Script 对象缓存了脚本的 SHA, 执行时使用 EVALSHA, 仅在 Redis 中不存在该脚本时才会重新加载
+    _script: Optional[Script] = None
+
+    def __init__(self, redis_db: redis.Redis, window_size: int, threshold: int):
+        """
+        :param redis_db: redis client
+        :param window_size: 时间窗口长度（单位：秒）
+        :param threshold: 时间窗口内的次数阈值
+        """
+        self.redis_db = redis_db
+        self.window_size = window_size
+        self.threshold = threshold
+
+    def is_allowed(self) -> bool:
+        """是否允许当前行为（未受速率限制影响）"""
+        return self.acquire().allowed
+
+    def acquire(self) -> RateLimitResult:
+        """尝试消耗一次配额, 返回速率控制结果"""
+        allowed, remaining, retry_after_ms = self._get_script()(
+            keys=[self._gen_key()],
+            args=[int(time.time() * 1000), self.window_size * 1000, self.threshold],
+            client=self.redis_db,
+        )
+        return RateLimitResult(allowed=bool(allowed), remaining=int(remaining), retry_after=retry_after_ms / 1000)
+
+    def _get_script(self) -> Script:
+        cls = type(self)
+        if cls._script is None:
+            cls._script = self.redis_db.register_script(GCRA_SCRIPT)
+        return cls._script
+
+    @abc.abstractmethod
+    def _gen_key(self) -> str:
+        """生成 redis 中的 key"""
+        raise NotImplementedError
+
+
+class UserActionRateLimiter(RedisGCRARateLimiter):
+    """针对用户行为的速率控制器"""
+
+    def __init__(
+        self,
+        redis_db: redis.Redis,
+        username: str,
+        action: UserAction,
+        window_size: int,
+        threshold: int,
+    ):
+        """
+        :param redis_db: redis client
+        :param username: 用户 ID
+        :param action: 用户操作名
+        :param window_size: 时间窗口长度（单位：秒）
+        :param threshold: 时间窗口内的次数阈值
+        """
+        super().__init__(redis_db, window_size, threshold)
+        self.username = username
+        self.action = action
+
+    def _gen_key(self) -> str:
+        return f"bk_paas3:rate_limits:gcra:{self.username}:{self.action}"
+
+
+def rate_limits_by_user(action: UserAction, window_size: int, threshold: int):
+    """适用于 Django View 方法的装饰器，提供频率限制的能力
+
+    被限制时返回 429 及 Retry-After 头, 否则在响应中添加 X-RateLimit-Remaining 头
+    """
+
+    @wrapt.decorator
+    def wrapper(wrapped, instance, args, kwargs):
+        rate_limiter = UserActionRateLimiter(
+            get_default_redis(), instance.request.user.username, action, window_size, threshold
+        )
+        result = rate_limiter.acquire()
+        if not result.allowed:
+            return Response(
+                status=HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": str(math.ceil(result.retry_after))}
+            )
+
+        response = wrapped(*args, **kwargs)
+        if isinstance(response, HttpResponseBase):
+            response["X-RateLimit-Remaining"] = str(result.remaining)
+        return response
+
+    return wrapper
@@ -15,6 +15,7 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import gzip
 import json
 from unittest import mock
 
@@ -24,8 +25,10 @@ from django_dynamic_fixture import G
 from elasticsearch_dsl.response import Hit
 
 from paasng.accessories.log.models import CustomCollectorConfig
+from paasng.accessories.log.shim import setup_env_log_model
 from paasng.accessories.log.shim.setup_bklog import build_custom_collector_config_name
 from paasng.infras.bkmonitorv3.models import BKMonitorSpace
+from paasng.utils.datetime import convert_timestamp_to_str
 
 pytestmark = pytest.mark.django_db(databases=["default", "workloads"])
 
@@ -154,6 +157,58 @@ class TestModuleStructuredLogAPIView:
         ]
 
 
+class TestExportLogs:
+    @pytest.fixture()
+    def make_hit(self, bk_app, bk_module):
+        def _make_hit(message: str):
+            return Hit(
+                {
+                    "fields": {
+                        "@timestamp": 1,
+                        "json": {"message": message},
+                        "app_code": bk_app.code,
+                        "module_name": bk_module.name,
+                        "environment": "stag",
+                        "process_id": "web",
+                        "stream": "foo",
+                        "pod_name": "bar",
+                    }
+                }
+            )
+
+        return _make_hit
+
+    @pytest.fixture()
+    def export_url(self, bk_app, bk_module, bk_stag_env):
+        setup_env_log_model(bk_stag_env)
+        return f"/api/bkapps/applications/{bk_app.code}/modules/{bk_module.name}/envs/stag/log/{{}}/export/"
+
+    def test_ndjson(self, api_client, export_url, make_hit):
+        with mock.patch("paasng.accessories.log.views.logs.instantiate_log_client") as client_factory:
+            client_factory().get_mappings.return_value = {}
+            client_factory().iter_scroll_pages.return_value = iter([[make_hit("foo")], [make_hit("bar")]])
+            response = api_client.post(export_url.format("structured") + "?time_range=1h", data={})
+
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        assert [json.loads(line)["message"] for line in lines] == ["foo", "bar"]
+        # The search is executed page by page
+        search = client_factory().iter_scroll_pages.call_args.kwargs["search"]
+        assert search.to_dict()["size"] == 1000
+
+    def test_gzip_text(self, api_client, export_url, make_hit):
+        with mock.patch("paasng.accessories.log.views.logs.instantiate_log_client") as client_factory:
+            client_factory().get_mappings.return_value = {}
+            client_factory().iter_scroll_pages.return_value = iter([[make_hit("foo"), make_hit("bar")]])
+            response = api_client.post(export_url.format("stdout") + "?time_range=1h&format=text&gzip=true", data={})
+
+        assert response.status_code == 200
+        assert response["Content-Disposition"].endswith('.log.gz"')
+        content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        assert content == f"{convert_timestamp_to_str(1)} foo\n{convert_timestamp_to_str(1)} bar\n"
+
+
 class TestCustomCollectorConfigViewSet:
     @pytest.fixture()
     def cfg_maker(self, bk_module):
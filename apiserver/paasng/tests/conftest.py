@@ -99,6 +99,20 @@ def pytest_addoption(parser):
     parser.addoption(
         "--run-e2e-test", dest="run_e2e_test", action="store_true", default=False, help="是否执行 e2e 测试"
     )
+    parser.addoption(
+        "--run-benchmark",
+        dest="run_benchmark",
+        action="store_true",
+        default=False,
+        help="是否执行基于耗时比较的性能测试(结果受机器负载影响)",
+    )
+
+
+@pytest.fixture(autouse=True)
+def _skip_benchmark(request):
+    """Handle @pytest.mark.benchmark, skip current test unless "--run-benchmark" is given"""
+    if request.keywords.get("benchmark") and not request.config.getvalue("run_benchmark"):
+        pytest.skip("Skip benchmark test because --run-benchmark is not given")
 
 
 @pytest.fixture(autouse=True, scope="session")
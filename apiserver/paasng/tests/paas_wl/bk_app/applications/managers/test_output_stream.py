@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import pytest
+
+from paas_wl.bk_app.applications.managers.output_stream import (
+    LogLine,
+    OutputStreamReader,
+    compact_output_stream,
+    decode_chunk,
+    encode_chunk,
+)
+from paas_wl.bk_app.applications.models import OutputStream
+
+pytestmark = pytest.mark.django_db(databases=["workloads"])
+
+
+@pytest.fixture()
+def output_stream() -> OutputStream:
+    stream = OutputStream.objects.create()
+    stream.bulk_write([(f"line {i}", "STDERR" if i % 10 == 0 else "STDOUT") for i in range(100)])
+    return stream
+
+
+def _lines(start, stop):
+    return [f"line {i}\n" for i in range(start, stop)]
+
+
+def test_encode_decode_chunk():
+    lines = [LogLine("foo\n", "STDOUT"), LogLine("中文 \x1b[1mbar\x1b[0m\n", "STDERR")]
+    assert decode_chunk(encode_chunk(lines)) == lines
+
+
+class TestCompactOutputStream:
+    def test_compact(self, output_stream):
+        assert compact_output_stream(output_stream, chunk_size=100) == 100
+        assert output_stream.lines.count() == 0
+        assert output_stream.chunks.count() > 1
+
+        lines = list(OutputStreamReader(output_stream).iter_lines())
+        assert [ln.line for ln in lines] == _lines(0, 100)
+        assert lines[10].stream == "STDERR"
+
+    def test_compact_repeatedly(self, output_stream):
+        compact_output_stream(output_stream, chunk_size=100)
+        assert compact_output_stream(output_stream) == 0
+
+        output_stream.bulk_write([("line 100", "STDOUT")])
+        assert compact_output_stream(output_stream) == 1
+        assert [ln.line for ln in OutputStreamReader(output_stream).iter_lines()] == _lines(0, 101)
+
+
+class TestOutputStreamReader:
+    @pytest.fixture(params=[False, True])
+    def reader(self, request, output_stream) -> OutputStreamReader:
+        if request.param:
+            # Compact the first 60 lines only, the others are kept as line rows
+            ids = list(output_stream.lines.order_by("created", "id").values_list("id", flat=True)[60:])
+            rest = list(output_stream.lines.filter(id__in=ids).values_list("line", "stream"))
+            output_stream.lines.filter(id__in=ids).delete()
+            compact_output_stream(output_stream, chunk_size=80)
+            output_stream.bulk_write(rest)
+        return OutputStreamReader(output_stream)
+
+    def test_count(self, reader):
+        assert reader.count() == 100
+
+    @pytest.mark.parametrize(
+        ("start", "stop"),
+        [(0, None), (0, 10), (5, 65), (55, 58), (60, 100), (90, 200), (100, None), (10, 5)],
+    )
+    def test_read(self, reader, start, stop):
+        expected = _lines(start, 100 if stop is None else min(stop, 100))
+        assert [ln.line for ln in reader.read(start, stop)] == expected
+
+    def test_tail(self, reader):
+        assert [ln.line for ln in reader.tail(3)] == _lines(97, 100)
+        assert [ln.line for ln in reader.tail(1000)] == _lines(0, 100)
+
+    def test_last_written_at(self, output_stream):
+        reader = OutputStreamReader(output_stream)
+        assert reader.last_written_at() == output_stream.lines.order_by("created", "id").last().created
+
+        compact_output_stream(output_stream)
+        assert reader.last_written_at() == output_stream.chunks.order_by("seq").last().created
+
+    def test_last_written_at_empty(self):
+        assert OutputStreamReader(OutputStream.objects.create()).last_written_at() is None
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import queue
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import List, Optional
+
+import pytest
+
+from paas_wl.bk_app.processes.informer import (
+    ERR_SUBSCRIBER_OVERFLOW,
+    ERR_TOO_OLD_RV,
+    ResourceInformer,
+    Subscription,
+)
+from paas_wl.infras.resources.kube_res.base import ResourceList, WatchEvent
+
+
+@dataclass
+class FakeRes:
+    name: str
+    rv: str
+
+    def get_resource_version(self) -> str:
+        return self.rv
+
+
+class FakeKube:
+    """Fake list and watch functions, watch events are fed by `feed()`"""
+
+    def __init__(self, items: List[FakeRes], rv: str):
+        self.items = items
+        self.rv = rv
+        self.list_count = 0
+        self.watch_rvs: List[Optional[str]] = []
+        self.events: "queue.Queue[Optional[WatchEvent]]" = queue.Queue()
+
+    def list(self) -> ResourceList:
+        self.list_count += 1
+        return ResourceList(items=list(self.items), metadata=SimpleNamespace(resourceVersion=self.rv))
+
+    def watch(self, rv: Optional[str], timeout_seconds: int):
+        self.watch_rvs.append(rv)
+        while True:
+            try:
+                event = self.events.get(timeout=timeout_seconds)
+            except queue.Empty:
+                return
+            if event is None:
+                return
+            yield event
+
+    def feed(self, type_: str, obj: Optional[FakeRes] = None, error_message: str = ""):
+        self.events.put(WatchEvent(type=type_, res_object=obj, error_message=error_message))
+
+
+def wait_until(predicate, timeout: float = 3):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture()
+def kube():
+    return FakeKube([FakeRes("web", "8"), FakeRes("worker", "9")], rv="10")
+
+
+@pytest.fixture()
+def informer(kube):
+    informer = ResourceInformer("test", kube.list, kube.watch)
+    informer.WATCH_TIMEOUT_SECONDS = 1
+    informer.ensure_running()
+    yield informer
+    # Stop the watch loop
+    informer.IDLE_SECONDS = 0
+    kube.events.put(None)
+
+
+def collect(subscription: Subscription, timeout_seconds: int = 1) -> List[WatchEvent]:
+    return list(subscription.iter_events(timeout_seconds))
+
+
+class TestResourceInformer:
+    def test_list_once(self, kube, informer):
+        informer.ensure_running()
+        items, rv = informer.snapshot()
+
+        assert kube.list_count == 1
+        assert {i.name for i in items} == {"web", "worker"}
+        assert rv == "10"
+
+    def test_apply_events(self, kube, informer):
+        kube.feed("MODIFIED", FakeRes("web", "11"))
+        kube.feed("DELETED", FakeRes("worker", "12"))
+        wait_until(lambda: informer.snapshot()[1] == "12")
+
+        items, _ = informer.snapshot()
+        assert items == [FakeRes("web", "11")]
+        assert kube.watch_rvs[0] == "10"
+
+    def test_subscribe_without_rv(self, informer):
+        subscription = Subscription()
+        informer.subscribe(subscription)
+        subscription.close()
+
+        events = collect(subscription)
+        assert [e.type for e in events] == ["ADDED", "ADDED"]
+
+    def test_replay_and_follow(self, kube, informer):
+        kube.feed("MODIFIED", FakeRes("web", "11"))
+        kube.feed("MODIFIED", FakeRes("web", "12"))
+        wait_until(lambda: informer.snapshot()[1] == "12")
+
+        subscription = Subscription()
+        informer.subscribe(subscription, "11")
+        kube.feed("ADDED", FakeRes("beat", "13"))
+
+        events = collect(subscription)
+        subscription.close()
+        assert [(e.type, e.res_object.rv) for e in events] == [("MODIFIED", "12"), ("ADDED", "13")]
+
+    def test_too_old_rv(self, informer):
+        subscription = Subscription()
+        informer.subscribe(subscription, "5")
+        subscription.close()
+
+        events = collect(subscription)
+        assert len(events) == 1
+        assert events[0].type == "ERROR"
+        assert events[0].error_message == ERR_TOO_OLD_RV
+
+    def test_watch_error_relist(self, kube, informer):
+        subscription = Subscription()
+        informer.subscribe(subscription, "10")
+
+        kube.rv = "20"
+        kube.feed("ERROR", error_message="too old resource version: 10 (15)")
+        events = collect(subscription)
+        subscription.close()
+
+        assert [e.type for e in events] == ["ERROR"]
+        wait_until(lambda: kube.list_count == 2)
+        wait_until(lambda: informer.snapshot()[1] == "20")
+        wait_until(lambda: kube.watch_rvs[-1] == "20")
+
+    def test_subscriber_overflow(self, kube, informer):
+        subscription = Subscription(maxsize=1)
+        informer.subscribe(subscription, "10")
+        kube.feed("MODIFIED", FakeRes("web", "11"))
+        kube.feed("MODIFIED", FakeRes("web", "12"))
+        wait_until(lambda: informer.snapshot()[1] == "12")
+
+        events = collect(subscription)
+        subscription.close()
+        assert events[-1].type == "ERROR"
+        assert events[-1].error_message == ERR_SUBSCRIBER_OVERFLOW
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import json
+import threading
+import uuid
+from typing import List
+
+import pytest
+
+from paas_wl.bk_app.processes.log_tail import (
+    LogTailKeys,
+    parse_log_line,
+    parse_timestamp,
+    tail_logs,
+    try_start_follower,
+)
+from paasng.core.core.storages.redisdb import get_default_redis
+
+
+class FakeLogResponse:
+    """Yields the given lines, then waits until being closed if `hold` is True"""
+
+    def __init__(self, lines: List[bytes], hold: bool = False):
+        self.lines = lines
+        self.hold = hold
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        yield from self.lines
+        if self.hold:
+            self.closed.wait(10)
+
+    def close(self):
+        self.closed.set()
+
+
+@pytest.fixture()
+def keys():
+    return LogTailKeys("default", f"web-{uuid.uuid4().hex[:8]}", "web")
+
+
+@pytest.mark.parametrize(
+    ("line", "expected"),
+    [
+        ("2023-01-01T01:01:01.123456789Z hello world\n", ("2023-01-01T01:01:01.123456789Z", "hello world")),
+        ("2023-01-01T01:01:01.123456789Z \n", ("2023-01-01T01:01:01.123456789Z", "")),
+        ("invalid\n", None),
+    ],
+)
+def test_parse_log_line(line, expected):
+    assert parse_log_line(line) == expected
+
+
+def test_parse_timestamp():
+    # The trailing zeros are trimmed in RFC3339Nano
+    assert parse_timestamp("2023-01-01T00:00:01.5Z") > parse_timestamp("2023-01-01T00:00:01.42Z")
+    assert parse_timestamp("2023-01-01T00:00:01.5Z") == parse_timestamp("2023-01-01T00:00:01.500000000Z")
+    assert parse_timestamp("2023-01-01T08:00:01+08:00") == parse_timestamp("2023-01-01T00:00:01Z")
+    assert parse_timestamp("invalid") is None
+
+
+class TestTailLogs:
+    def test_lines_after_since_time(self, keys):
+        lines = [
+            b"2023-01-01T00:00:01.000000000Z first\n",
+            b"2023-01-01T00:00:02.000000000Z second\n",
+            b"2023-01-01T00:00:03.000000000Z third\n",
+        ]
+        open_calls = []
+
+        def open_stream(since_time):
+            open_calls.append(since_time)
+            return FakeLogResponse(lines)
+
+        results = [json.loads(d) for d in tail_logs(keys, open_stream, since_time="2023-01-01T00:00:01.000000000Z")]
+
+        assert results == [
+            {"timestamp": "2023-01-01T00:00:02.000000000Z", "message": "second"},
+            {"timestamp": "2023-01-01T00:00:03.000000000Z", "message": "third"},
+        ]
+        assert len(open_calls) == 1
+
+    def test_equal_and_mixed_precision_timestamps(self, keys):
+        lines = [
+            b"2023-01-01T00:00:01Z before\n",
+            b"2023-01-01T00:00:01.5Z first\n",
+            b"2023-01-01T00:00:01.5Z second\n",
+            b"2023-01-01T00:00:01.52Z third\n",
+            b"2023-01-01T00:00:02Z fourth\n",
+        ]
+        results = [
+            json.loads(d)["message"]
+            for d in tail_logs(keys, lambda _: FakeLogResponse(lines), since_time="2023-01-01T00:00:01.1Z")
+        ]
+        assert results == ["first", "second", "third", "fourth"]
+
+    def test_follower_shared(self, keys):
+        response = FakeLogResponse([b"2023-01-01T00:00:01.000000000Z first\n"], hold=True)
+        open_calls = []
+
+        def open_stream(since_time):
+            open_calls.append(since_time)
+            return response
+
+        redis_db = get_default_redis()
+        assert try_start_follower(redis_db, keys, open_stream, "2023-01-01T00:00:00.000000000Z") is True
+        # The lock is held by the running follower
+        assert try_start_follower(redis_db, keys, open_stream, "2023-01-01T00:00:00.000000000Z") is False
+
+        subscriber = tail_logs(keys, open_stream, since_time="2023-01-01T00:00:00.000000000Z")
+        assert json.loads(next(subscriber))["message"] == "first"
+
+        # The subscriber gets "EOF" after the log stream was ended
+        response.close()
+        assert list(subscriber) == []
+        assert len(open_calls) == 1
+
+
+def test_take_over_without_duplicates(keys):
+    redis_db = get_default_redis()
+    # Lines published by a dead follower, the "eof" was not written
+    for ts, message in [("00:00:01", "first"), ("00:00:02", "second"), ("00:00:02", "third")]:
+        rfc_timestamp = f"2023-01-01T{ts}Z"
+        data = json.dumps({"timestamp": rfc_timestamp, "message": message})
+        redis_db.xadd(keys.stream, {"ts": rfc_timestamp, "data": data})
+
+    lines = [
+        b"2023-01-01T00:00:01Z first\n",
+        b"2023-01-01T00:00:02Z second\n",
+        b"2023-01-01T00:00:02Z third\n",
+        b"2023-01-01T00:00:03Z fourth\n",
+    ]
+    open_calls = []
+
+    def open_stream(since_time):
+        open_calls.append(since_time)
+        return FakeLogResponse(lines)
+
+    results = [json.loads(d)["message"] for d in tail_logs(keys, open_stream, since_time="2023-01-01T00:00:00Z")]
+    assert results == ["first", "second", "third", "fourth"]
+    # The new follower continues after the last published line
+    assert open_calls == ["2023-01-01T00:00:02Z"]
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import threading
+from unittest import mock
+
+import pytest
+
+from paas_wl.infras.resources.base.base import (
+    EnhancedApiClient,
+    _LastModifiedChecker,
+    get_client_by_cluster_name,
+    get_global_configuration_pool,
+    invalidate_global_configuration_pool,
+)
+from tests.utils.cluster import CLUSTER_NAME_FOR_TESTING
+
+pytestmark = pytest.mark.django_db(databases=["default", "workloads"])
+
+
+class TestGetClientByClusterName:
+    def test_client_reused(self):
+        client = get_client_by_cluster_name(CLUSTER_NAME_FOR_TESTING)
+        assert get_client_by_cluster_name(CLUSTER_NAME_FOR_TESTING) is client
+
+    def test_client_rebuilt_after_invalidated(self):
+        client = get_client_by_cluster_name(CLUSTER_NAME_FOR_TESTING)
+        invalidate_global_configuration_pool()
+        assert get_client_by_cluster_name(CLUSTER_NAME_FOR_TESTING) is not client
+
+    def test_cluster_not_found(self):
+        with pytest.raises(ValueError, match=r".*not found.*"):
+            get_client_by_cluster_name("invalid-cluster-name")
+
+    def test_configuration_thread_local(self):
+        # Use a fresh client, the shared one in the registry must not be modified
+        client = EnhancedApiClient(get_global_configuration_pool()[CLUSTER_NAME_FOR_TESTING])
+        cfg = mock.MagicMock()
+        client.configuration = cfg
+
+        result = []
+        t = threading.Thread(target=lambda: result.append(client.configuration))
+        t.start()
+        t.join()
+        assert client.configuration is cfg
+        assert result[0] is not cfg
+
+
+class TestLastModifiedChecker:
+    def test_cached(self):
+        checker = _LastModifiedChecker(interval=60)
+        with mock.patch("paas_wl.infras.resources.base.base._GlobalConfigLastModified") as mocked:
+            mocked().get.return_value = "foo"
+            assert checker.get() == "foo"
+            mocked().get.return_value = "bar"
+            assert checker.get() == "foo"
+
+            checker.reset()
+            assert checker.get() == "bar"
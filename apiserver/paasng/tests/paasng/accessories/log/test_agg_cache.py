@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+import datetime
+import uuid
+from typing import List
+from unittest import mock
+
+import pytest
+
+from paasng.accessories.log.agg_cache import (
+    Segment,
+    aggregate_date_histogram_cached,
+    aggregate_fields_filters_cached,
+    split_time_range,
+)
+from paasng.utils.es_log.models import FieldFilter
+from paasng.utils.es_log.search import SmartSearch
+from paasng.utils.es_log.time_range import SmartTimeRange
+
+MINUTE = 60 * 1000
+
+
+@pytest.mark.parametrize(
+    ("start", "end", "closed_before", "expected"),
+    [
+        # Aligned start, all closed except the tail
+        (0, 25, 100, [Segment(0, 10, "closed"), Segment(10, 20, "closed"), Segment(20, 25, "tail")]),
+        # Partial head
+        (5, 30, 100, [Segment(5, 10, "head"), Segment(10, 20, "closed"), Segment(20, 30, "closed")]),
+        # Segments after `closed_before` are merged into the tail
+        (0, 40, 15, [Segment(0, 10, "closed"), Segment(10, 40, "tail")]),
+        # The range is shorter than one segment
+        (3, 8, 100, [Segment(3, 8, "head")]),
+    ],
+)
+def test_split_time_range(start, end, closed_before, expected):
+    assert split_time_range(start, end, segment_ms=10, offset_ms=0, closed_before=closed_before) == expected
+
+
+def test_split_time_range_with_offset():
+    # The boundaries are aligned in the time zone, e.g. the midnight of UTC+8 is 16:00 of UTC
+    segments = split_time_range(
+        0, 48 * 60 * MINUTE, segment_ms=24 * 60 * MINUTE, offset_ms=8 * 60 * MINUTE, closed_before=48 * 60 * MINUTE
+    )
+    assert [(s.start, s.kind) for s in segments] == [
+        (0, "head"),
+        (16 * 60 * MINUTE, "closed"),
+        (40 * 60 * MINUTE, "tail"),
+    ]
+
+
+class FakeLogClient:
+    """Returns one bucket with doc_count 1 for every 5 minutes"""
+
+    def __init__(self):
+        self.histogram_ranges: List = []
+        self.fields_filters_calls = 0
+
+    def aggregate_date_histogram(self, index: str, search: SmartSearch, timeout: int, interval=None):
+        assert interval == "5m"
+        start = int(search.time_range.start_time.timestamp() * 1000)
+        end = int(search.time_range.end_time.timestamp() * 1000)
+        self.histogram_ranges.append((start, end))
+        first = start - start % (5 * MINUTE)
+        return [{"key": key, "doc_count": 1} for key in range(first, end, 5 * MINUTE)]
+
+    def aggregate_fields_filters(self, index: str, search: SmartSearch, mappings: dict, timeout: int):
+        self.fields_filters_calls += 1
+        return [FieldFilter(name="foo", key="foo", options=[("bar", "100%")], total=1)]
+
+
+@pytest.fixture()
+def index():
+    # Use an unique index to avoid sharing the cache between tests
+    return f"bk_paas3_test-{uuid.uuid4().hex[:8]}-*"
+
+
+def make_search(start: datetime.datetime, end: datetime.datetime) -> SmartSearch:
+    time_range = SmartTimeRange(time_range="customized", start_time=start, end_time=end)
+    return SmartSearch(time_field="@timestamp", time_range=time_range).filter("term", app_code="foo")
+
+
+class TestAggregateDateHistogramCached:
+    def test_closed_segments_cached(self, index):
+        client = FakeLogClient()
+        start = datetime.datetime(2024, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime(2024, 1, 1, 5, 59, 59, tzinfo=datetime.timezone.utc)
+
+        first = aggregate_date_histogram_cached(client, index, make_search(start, end), timeout=30)
+        assert len(client.histogram_ranges) == 1
+        assert len(first) == 6 * 12
+        assert [b["key"] for b in first] == sorted(b["key"] for b in first)
+
+        second = aggregate_date_histogram_cached(client, index, make_search(start, end), timeout=30)
+        assert second == first
+        assert len(client.histogram_ranges) == 1
+
+    def test_shared_by_overlapped_ranges(self, index):
+        client = FakeLogClient()
+        start = datetime.datetime(2024, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
+        aggregate_date_histogram_cached(
+            client, index, make_search(start, start + datetime.timedelta(hours=6, seconds=-1)), timeout=30
+        )
+
+        # Only the new part(the head and the hours after 6:00) is queried
+        new_start = start + datetime.timedelta(minutes=30)
+        buckets = aggregate_date_histogram_cached(
+            client, index, make_search(new_start, new_start + datetime.timedelta(hours=6, seconds=-1)), timeout=30
+        )
+        assert len(buckets) == 6 * 12
+        start_ms = int(new_start.timestamp() * 1000)
+        assert client.histogram_ranges[1] == (start_ms, start_ms + 30 * MINUTE)
+        assert client.histogram_ranges[2][0] == start_ms + 330 * MINUTE
+
+    def test_tails_with_different_ends(self, index):
+        client = FakeLogClient()
+        start = datetime.datetime(2024, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
+        now = start + datetime.timedelta(hours=6)
+        with mock.patch("paasng.accessories.log.agg_cache.time.time", return_value=now.timestamp()):
+            # Both ranges have the open tail which starts from 5:00
+            aggregate_date_histogram_cached(
+                client, index, make_search(start, start + datetime.timedelta(hours=6, seconds=-1)), timeout=30
+            )
+            end = start + datetime.timedelta(hours=5, minutes=30, seconds=-1)
+            buckets = aggregate_date_histogram_cached(client, index, make_search(start, end), timeout=30)
+
+        assert len(buckets) == 5 * 12 + 6
+        assert buckets[-1]["key"] < end.timestamp() * 1000
+        # The closed segments are shared, the tail is queried again
+        assert client.histogram_ranges[1][0] == int(start.timestamp() * 1000) + 300 * MINUTE
+
+
+def test_aggregate_fields_filters_cached(index):
+    client = FakeLogClient()
+    start = datetime.datetime(2024, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
+    search = make_search(start, start + datetime.timedelta(hours=1))
+
+    for _ in range(2):
+        fields_filters = aggregate_fields_filters_cached(client, index, search, mappings={}, timeout=30)
+        assert fields_filters[0].name == "foo"
+    assert client.fields_filters_calls == 1
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+import datetime
+import uuid
+from unittest import mock
+
+import pytest
+import pytz
+
+from paasng.accessories.log.client import ESLogClient, _cache_timeout
+from paasng.accessories.log.models import ElasticSearchHost
+from paasng.utils.es_log.time_range import SmartTimeRange
+
+
+@pytest.fixture()
+def index_pattern():
+    # Use an unique pattern to avoid sharing the cache between tests
+    return f"bk_paas3_test-{uuid.uuid4().hex[:8]}-*"
+
+
+@pytest.fixture()
+def es_client(index_pattern):
+    client = ESLogClient(ElasticSearchHost(host="127.0.0.1", port=9200))
+    client._client = mock.MagicMock()
+    prefix = index_pattern[:-1]
+    client._client.indices.stats.return_value = {
+        "indices": {f"{prefix}2024.01.01": {}, f"{prefix}2024.01.02": {}, f"{prefix}2024.01.03": {}}
+    }
+    client._client.indices.get_mapping.return_value = {
+        f"{prefix}2024.01.02": {"mappings": {"properties": {"foo": {"type": "text"}}}},
+        f"{prefix}2024.01.03": {"mappings": {"properties": {"bar": {"type": "keyword"}}}},
+    }
+    return client
+
+
+def make_time_range(start_day: int, end_day: int) -> SmartTimeRange:
+    return SmartTimeRange(
+        time_range="customized",
+        start_time=datetime.datetime(2024, 1, start_day, 1, tzinfo=pytz.utc),
+        end_time=datetime.datetime(2024, 1, end_day, 1, tzinfo=pytz.utc),
+    )
+
+
+class TestESLogClientCache:
+    def test_indexes_cached(self, es_client, index_pattern):
+        prefix = index_pattern[:-1]
+        assert es_client._get_indexes(index_pattern, make_time_range(1, 2), timeout=30) == [
+            f"{prefix}2024.01.01",
+            f"{prefix}2024.01.02",
+        ]
+        # Filtered by a different time range, but the index list is read from cache
+        assert es_client._get_indexes(index_pattern, make_time_range(3, 3), timeout=30) == [f"{prefix}2024.01.03"]
+        assert es_client._client.indices.stats.call_count == 1
+
+    def test_empty_indexes_not_cached(self, es_client, index_pattern):
+        es_client._client.indices.stats.return_value = {"indices": {}}
+        assert es_client._list_indexes(index_pattern, timeout=30) == []
+        assert es_client._list_indexes(index_pattern, timeout=30) == []
+        assert es_client._client.indices.stats.call_count == 2
+
+    def test_mappings_cached(self, es_client, index_pattern):
+        for _ in range(3):
+            assert es_client.get_mappings(index_pattern, make_time_range(1, 3), timeout=30) == {
+                "bar": {"type": "keyword"}
+            }
+        assert es_client._client.indices.stats.call_count == 1
+        assert es_client._client.indices.get_mapping.call_count == 1
+
+        # Different indexes are picked, query the mappings again
+        es_client.get_mappings(index_pattern, make_time_range(1, 2), timeout=30)
+        assert es_client._client.indices.get_mapping.call_count == 2
+
+    def test_cache_expires_at_day_rollover(self, es_client, index_pattern):
+        es_client._list_indexes(index_pattern, timeout=30)
+        tomorrow = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)
+        with mock.patch("paasng.accessories.log.client._utc_now", return_value=tomorrow):
+            es_client._list_indexes(index_pattern, timeout=30)
+        assert es_client._client.indices.stats.call_count == 2
+
+
+@pytest.mark.parametrize(
+    ("now", "expected"),
+    [
+        (datetime.datetime(2024, 1, 1, 12, 0, 0, tzinfo=datetime.timezone.utc), 60),
+        (datetime.datetime(2024, 1, 1, 23, 59, 30, tzinfo=datetime.timezone.utc), 30),
+        (datetime.datetime(2024, 1, 1, 23, 59, 59, 999999, tzinfo=datetime.timezone.utc), 1),
+    ],
+)
+def test_cache_timeout(now, expected):
+    with mock.patch("paasng.accessories.log.client._utc_now", return_value=now):
+        assert _cache_timeout(60) == expected
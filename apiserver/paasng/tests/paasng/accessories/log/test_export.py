@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+import gzip
+import json
+from unittest import mock
+
+import pytest
+
+from paasng.accessories.log.constants import LogExportFormat
+from paasng.accessories.log.export import LogPages, guard_stream, gzip_stream, render_truncated_notice
+
+
+@pytest.fixture()
+def log_client():
+    client = mock.MagicMock()
+    client.iter_scroll_pages.return_value = iter([[1, 2, 3], [4, 5, 6], [7]])
+    return client
+
+
+@pytest.mark.parametrize(
+    ("max_lines", "expected", "truncated"),
+    [
+        (100, [[1, 2, 3], [4, 5, 6], [7]], False),
+        (7, [[1, 2, 3], [4, 5, 6], [7]], False),
+        (5, [[1, 2, 3], [4, 5]], True),
+        (3, [[1, 2, 3]], True),
+    ],
+)
+def test_log_pages(log_client, max_lines, expected, truncated):
+    pages = LogPages(log_client, index="foo-*", search=mock.MagicMock(), timeout=30, max_lines=max_lines)
+    assert list(pages) == expected
+    assert pages.truncated is truncated
+
+
+class TestRenderTruncatedNotice:
+    def test_not_truncated(self, log_client):
+        pages = LogPages(log_client, index="foo-*", search=mock.MagicMock(), timeout=30, max_lines=100)
+        list(pages)
+        assert list(render_truncated_notice(pages, LogExportFormat.TEXT)) == []
+
+    def test_text(self, log_client):
+        pages = LogPages(log_client, index="foo-*", search=mock.MagicMock(), timeout=30, max_lines=5)
+        list(pages)
+        (line,) = render_truncated_notice(pages, LogExportFormat.TEXT)
+        assert line.startswith(b"[TRUNCATED] ")
+        assert line.endswith(b"\n")
+
+    def test_ndjson(self, log_client):
+        pages = LogPages(log_client, index="foo-*", search=mock.MagicMock(), timeout=30, max_lines=5)
+        list(pages)
+        (line,) = render_truncated_notice(pages, LogExportFormat.NDJSON)
+        assert json.loads(line)["truncated"] is True
+
+
+@pytest.mark.parametrize(
+    ("export_format", "expected_trailer"),
+    [
+        (LogExportFormat.TEXT, b"[ERROR] "),
+        (LogExportFormat.NDJSON, b'{"error": true, '),
+    ],
+)
+def test_guard_stream(export_format, expected_trailer):
+    def iter_scroll_pages(**kwargs):
+        yield [1, 2, 3]
+        # The scroll context expired when the client read slowly
+        raise RuntimeError("No search context found")
+
+    log_client = mock.MagicMock()
+    log_client.iter_scroll_pages.side_effect = iter_scroll_pages
+    pages = LogPages(log_client, index="foo-*", search=mock.MagicMock(), timeout=30, max_lines=100)
+    content = (b"".join(f"{hit}\n".encode() for hit in hits) for hits in pages)
+
+    lines = b"".join(guard_stream(content, export_format)).splitlines(keepends=True)
+    assert lines[:3] == [b"1\n", b"2\n", b"3\n"]
+    assert len(lines) == 4
+    assert lines[3].startswith(expected_trailer)
+
+
+def test_gzip_stream():
+    chunks = [f"line {i}\n".encode() for i in range(1000)]
+    assert gzip.decompress(b"".join(gzip_stream(chunks))) == b"".join(chunks)
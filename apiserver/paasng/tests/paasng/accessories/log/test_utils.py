@@ -15,14 +15,25 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import timeit
 from typing import Dict, List
 
 import pytest
+from elasticsearch_dsl.response.hit import Hit
 
 from paasng.accessories.log.dsl import SearchRequestSchema
-from paasng.accessories.log.utils import NOT_SET, get_es_term, parse_request_to_es_dsl, rename_log_fields
+from paasng.accessories.log.models import ElasticSearchParams
+from paasng.accessories.log.utils import (
+    NOT_SET,
+    build_filed_matcher,
+    clean_logs,
+    get_es_term,
+    parse_request_to_es_dsl,
+    rename_log_fields,
+)
 from paasng.utils.datetime import convert_timestamp_to_str
-from paasng.utils.es_log.misc import format_timestamp
+from paasng.utils.es_log.misc import flatten_structure, format_timestamp
+from paasng.utils.es_log.models import FlattenLog, field_extractor_factory
 
 
 @pytest.fixture()
@@ -226,3 +237,82 @@ def test_parse_request_to_es_dsl(query_conditions, mappings, expected):
 def test_legacy_ts_field(es_timestamp: str, expected_ts):
     timestamp = format_timestamp(es_timestamp, input_format="datetime")
     assert convert_timestamp_to_str(timestamp) == expected_ts
+
+
+def legacy_clean_logs(logs: List[Hit], search_params: ElasticSearchParams) -> List[FlattenLog]:
+    """The previous implementation of `clean_logs`, which flattens every hit from scratch"""
+    cleaned: List[FlattenLog] = []
+    matcher = build_filed_matcher(search_params.filedMatcher) if search_params.filedMatcher is not None else None
+    for log in logs:
+        raw = flatten_structure(log.to_dict(), None)
+        raw = rename_log_fields(raw)
+        if hasattr(log.meta, "highlight") and log.meta.highlight:
+            for k, v in log.meta.highlight.to_dict().items():
+                raw[k] = "".join(v)
+        cleaned.append(
+            FlattenLog(
+                timestamp=format_timestamp(
+                    field_extractor_factory(search_params.timeField)(raw), search_params.timeFormat
+                ),
+                message=field_extractor_factory(search_params.messageField)(raw),
+                raw={k: v for k, v in raw.items() if matcher(k)} if matcher is not None else raw,
+            )
+        )
+    return cleaned
+
+
+def make_structured_hits(count: int) -> List[Hit]:
+    hits = []
+    for i in range(count):
+        hits.append(
+            Hit(
+                {
+                    "_index": "fake_index",
+                    "_id": str(i),
+                    "_source": {
+                        "@timestamp": 1607412300 + i,
+                        "json": {
+                            "message": f"message {i}",
+                            "levelname": "INFO",
+                            "request": {"id": f"req-{i}", "path": "/foo/", "headers": {"x-foo": "bar", "x-bar": {}}},
+                            "extra": {f"key_{j}": j for j in range(20)},
+                        },
+                        "kubernetes": {
+                            "labels": {"process_id": "web", "bkapp_paas_bk_tencent_com_code": "foo"},
+                            "pod": {"name": f"foo-web-{i % 3}"},
+                        },
+                        "__ext": {"labels": {"bkapp_paas_bk_tencent_com_module_name": "default"}},
+                        "environment": "stag",
+                        "tags": ["stdout"],
+                    },
+                    "highlight": {"json.message": ["[bk-mark]", "message", "[/bk-mark]"]} if i % 2 else {},
+                }
+            )
+        )
+    return hits
+
+
+@pytest.mark.parametrize("filed_matcher", [None, r"json\.(message|levelname|request\..*)"])
+def test_clean_logs_identical(filed_matcher):
+    search_params = ElasticSearchParams(
+        indexPattern="foo-*", termTemplate={}, timeFormat="timestamp[s]", filedMatcher=filed_matcher
+    )
+    hits = make_structured_hits(20)
+    cleaned = clean_logs(hits, search_params)
+    assert cleaned == legacy_clean_logs(hits, search_params)
+    # The order of fields is preserved too
+    assert [list(log["raw"]) for log in cleaned] == [
+        list(log["raw"]) for log in legacy_clean_logs(hits, search_params)
+    ]
+
+
+@pytest.mark.benchmark()
+def test_clean_logs_benchmark():
+    """A micro benchmark on 500-hit pages, which makes sure `clean_logs` is faster than the previous implementation"""
+    search_params = ElasticSearchParams(
+        indexPattern="foo-*", termTemplate={}, timeFormat="timestamp[s]", filedMatcher=r"json\..*"
+    )
+    hits = make_structured_hits(500)
+    fast = min(timeit.repeat(lambda: clean_logs(hits, search_params), number=3, repeat=3))
+    slow = min(timeit.repeat(lambda: legacy_clean_logs(hits, search_params), number=3, repeat=3))
+    assert fast * 1.3 < slow
@@ -14,11 +14,15 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+from unittest import mock
+
 import pytest
 
 from paasng.infras.accounts.constants import SiteRole
 from paasng.infras.accounts.models import UserProfile
+from paasng.infras.accounts.permissions.application import AppPermChecker
 from paasng.infras.accounts.permissions.user import user_can_operate_in_region
+from paasng.infras.iam.permissions.resources.application import AppAction
 from tests.utils.helpers import configure_regions
 
 pytestmark = pytest.mark.django_db(databases=["default"])
@@ -42,3 +46,16 @@ def test_user_can_operate_in_region(bk_user, is_admin, r1_expected, r2_expected)
 
         assert user_can_operate_in_region(bk_user, "r1") is r1_expected
         assert user_can_operate_in_region(bk_user, "r2") is r2_expected
+
+
+@pytest.mark.django_db(databases=["default", "workloads"])
+class TestAppPermChecker:
+    def test_single_check(self, bk_app, bk_user):
+        with mock.patch(
+            "paasng.infras.accounts.permissions.application.user_has_app_action_perm", return_value=False
+        ) as mocked:
+            checker = AppPermChecker(bk_user)
+            assert checker.has_perm(bk_app, AppAction.BASIC_DEVELOP) is False
+            # The result is cached
+            assert checker.has_perm(bk_app, AppAction.BASIC_DEVELOP) is False
+            assert mocked.call_count == 1
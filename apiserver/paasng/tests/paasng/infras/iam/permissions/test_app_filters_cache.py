@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+from unittest import mock
+
+import pytest
+from django.db.models import Q
+
+from paasng.infras.iam.permissions.resources.application import ApplicationPermission, UserAppFiltersCache
+from tests.utils.basic import generate_random_string
+
+TENANT_ID = "default"
+
+
+@pytest.fixture()
+def username():
+    return generate_random_string(12)
+
+
+@pytest.fixture()
+def make_filter():
+    with mock.patch.object(ApplicationPermission, "_make_iam") as make_iam:
+        make_iam.return_value.make_filter.return_value = Q(code__in=["foo", "bar"])
+        yield make_iam.return_value.make_filter
+
+
+class TestUserAppFiltersCache:
+    def test_cached(self, username, make_filter):
+        for _ in range(3):
+            filters = ApplicationPermission().gen_user_app_filters(username, TENANT_ID)
+            assert Q(code__in=["foo", "bar"]) & Q(tenant_id=TENANT_ID) in filters.children
+        assert make_filter.call_count == 1
+
+        # Filters of other actions are cached separately
+        ApplicationPermission().gen_develop_app_filters(username, TENANT_ID)
+        assert make_filter.call_count == 2
+
+    def test_empty_filters_cached(self, username, make_filter):
+        make_filter.return_value = None
+        for _ in range(2):
+            ApplicationPermission().gen_user_app_filters(username, TENANT_ID)
+        assert make_filter.call_count == 1
+
+    def test_invalidate(self, username, make_filter):
+        ApplicationPermission().gen_user_app_filters(username, TENANT_ID)
+        UserAppFiltersCache.invalidate([username])
+
+        # The cache is skipped for a while after invalidation, because the policies are synced with a delay
+        for _ in range(2):
+            ApplicationPermission().gen_user_app_filters(username, TENANT_ID)
+        assert make_filter.call_count == 3
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+from typing import List
+
+from paasng.infras.iam.permissions.batch import BatchPermChecker
+
+
+class TestBatchPermChecker:
+    def test_memoized(self):
+        calls = []
+
+        def fetch(objs: List[str], action_ids: List[str]):
+            calls.append((sorted(objs), sorted(action_ids)))
+            return {obj: {action_id: obj == "foo" for action_id in action_ids} for obj in objs}
+
+        checker = BatchPermChecker(fetch, lambda obj: obj)
+        checker.prefetch(["foo", "bar"], ["view", "edit"])
+        assert calls == [(["bar", "foo"], ["edit", "view"])]
+
+        assert checker.is_allowed("foo", "view")
+        assert not checker.is_allowed("bar", "edit")
+        assert len(calls) == 1
+
+        # Only the missing pairs are fetched
+        assert checker.is_allowed("baz", "view") is False
+        assert calls[-1] == (["baz"], ["view"])
+
+    def test_missing_in_response(self):
+        checker = BatchPermChecker(lambda objs, action_ids: {}, lambda obj: obj)
+        assert checker.is_allowed("foo", "view") is False
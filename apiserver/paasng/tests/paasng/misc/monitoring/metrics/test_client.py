@@ -244,3 +244,28 @@ class TestBkPrometheusResult:
             [1673257280, "1073741824"],
             [1673257290, "1073741824"],
         ]
+
+    def test_get_raws_by_pod(self):
+        fake_series = [
+            {
+                "dimensions": {"pod_name": "web-1", "container_name": "web"},
+                "datapoints": [[1, 1673257280000]],
+            },
+            {
+                "dimensions": {"pod_name": "web-1", "container_name": "sidecar"},
+                "datapoints": [[2, 1673257280000]],
+            },
+            {
+                "dimensions": {"pod": "web-2", "container": "web"},
+                "datapoints": [[3, 1673257280000]],
+            },
+        ]
+        pr = BkPromResult.from_series(fake_series)
+
+        raws = pr.get_raws_by_pod("web")
+        assert {pod: raw["values"] for pod, raw in raws.items()} == {
+            "web-1": [[1673257280, "1"]],
+            "web-2": [[1673257280, "3"]],
+        }
+        # 不指定容器名称时，每个实例返回第一个
+        assert pr.get_raws_by_pod()["web-1"]["values"] == [[1673257280, "1"]]
@@ -123,6 +123,47 @@ class TestResourceMetricManager:
 
         assert len(list(queries)) == 2
 
+    def test_batch_query(self, metric_client):
+        manager = ResourceMetricManager(
+            process=self.web_process, metric_client=metric_client, bcs_cluster_id="", batch_query=True
+        )
+        first, second = (inst.name for inst in self.web_process.instances)
+        fake_values = {first: [[1234, "1"]], second: [[1234, "2"]]}
+        query_mock = Mock(return_value=fake_values)
+        with patch("paasng.misc.monitoring.metrics.clients.BkMonitorMetricClient._query_range_by_pod", query_mock):
+            result = manager.get_all_instances_metrics(
+                time_range=MetricSmartTimeRange(start="2013-05-11 21:23:58", end="2013-05-11 21:25:58"),
+                resource_types=[MetricsResourceType.MEM, MetricsResourceType.CPU],
+            )
+
+        # One query for each resource and series, instead of each instance
+        assert query_mock.call_count == 4
+        promql = query_mock.call_args_list[0][0][0]
+        assert f'pod_name=~"{first}|{second}"' in promql
+
+        assert [r.instance_name for r in result] == [first, second]
+        assert [r.type_name for r in result[0].results] == ["mem", "cpu"]
+        assert [r.type_name for r in result[0].results[0].results] == ["current", "limit"]
+        assert result[0].results[0].results[0].results == [[1234, "1"]]
+        assert result[1].results[1].results[1].results == [[1234, "2"]]
+
+    def test_batch_query_missing_instance(self, metric_client):
+        manager = ResourceMetricManager(
+            process=self.web_process, metric_client=metric_client, bcs_cluster_id="", batch_query=True
+        )
+        first = self.web_process.instances[0].name
+        query_mock = Mock(return_value={first: [[1234, "1"]]})
+        with patch("paasng.misc.monitoring.metrics.clients.BkMonitorMetricClient._query_range_by_pod", query_mock):
+            result = manager.get_all_instances_metrics(
+                time_range=MetricSmartTimeRange(start="2013-05-11 21:23:58", end="2013-05-11 21:25:58"),
+                resource_types=[MetricsResourceType.MEM],
+                series_type=MetricsSeriesType.CURRENT,
+            )
+
+        assert result[0].results[0].results[0].results == [[1234, "1"]]
+        assert result[1].results[0].results[0].type_name == "current"
+        assert result[1].results[0].results[0].results == []
+
 
 class TestTimeRange:
     def test_simple_date_string(self):
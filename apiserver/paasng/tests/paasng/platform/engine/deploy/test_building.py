@@ -28,6 +28,7 @@ from paasng.platform.engine.handlers import attach_all_phases
 from paasng.platform.engine.models import Deployment, DeployPhaseTypes
 from paasng.platform.engine.phases_steps.phases import DeployPhaseManager
 from paasng.platform.sourcectl.exceptions import GetAppYamlError, GetProcfileError
+from paasng.platform.sourcectl.utils import compress_directory_ext
 from tests.utils.mocks.poll_task import FakeTaskPoller
 
 pytestmark = pytest.mark.django_db
@@ -190,6 +191,54 @@ class TestCloudNative:
             }
 
 
+@pytest.mark.django_db(databases=["default", "workloads"])
+class TestCompressAndUpload:
+    @pytest.fixture()
+    def builder(self, bk_deployment_full):
+        with mock.patch("paasng.platform.engine.utils.output.RedisChannelStream"):
+            yield ApplicationBuilder.from_deployment_id(bk_deployment_full.id)
+
+    @pytest.fixture()
+    def mocked_funcs(self, tmp_path):
+        (tmp_path / "app.py").write_text("print('hello')")
+        with (
+            mock.patch("paasng.platform.engine.deploy.building.get_source_package_digest", return_value="digest"),
+            mock.patch(
+                "paasng.platform.engine.deploy.building.download_source_to_dir", return_value=("", tmp_path)
+            ) as download_source_to_dir,
+            mock.patch("paasng.platform.engine.deploy.building.tag_module_from_source_files"),
+            mock.patch("paasng.platform.engine.deploy.building.check_source_package"),
+            mock.patch("paasng.platform.engine.deploy.building.make_blob_store") as make_blob_store,
+            mock.patch("paasng.platform.engine.deploy.building.set_cached_source_package") as set_cached,
+        ):
+            yield download_source_to_dir, make_blob_store(), set_cached
+
+    def test_reuse_cached(self, builder, mocked_funcs):
+        download_source_to_dir, blob_store, _ = mocked_funcs
+        cached_path = "default/source-packages/digest/tar"
+        with mock.patch("paasng.platform.engine.deploy.building.get_cached_source_package", return_value=cached_path):
+            assert builder.compress_and_upload("default/home/foo:master:1/tar") == cached_path
+
+        assert not download_source_to_dir.called
+        assert not blob_store.upload_file.called
+
+    def test_upload_to_path_by_digest(self, builder, mocked_funcs):
+        download_source_to_dir, blob_store, set_cached = mocked_funcs
+        with (
+            mock.patch("paasng.platform.engine.deploy.building.get_cached_source_package", return_value=None),
+            mock.patch(
+                "paasng.platform.engine.deploy.building.compress_directory_ext", wraps=compress_directory_ext
+            ) as compress,
+        ):
+            path = builder.compress_and_upload("default/home/foo:master:1/tar")
+
+        assert path == f"{builder.engine_app.region}/source-packages/digest/tar"
+        assert download_source_to_dir.called
+        assert compress.call_args[1]["reproducible"] is True
+        assert blob_store.upload_file.call_args[0][1] == path
+        set_cached.assert_called_once_with("digest", path)
+
+
 class TestBuildProcessResultHandler:
     """Tests for BuildProcessResultHandler"""
 
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import json
+import uuid
+
+import pytest
+from blue_krill.redis_tools.messaging import StreamChannel
+
+from paasng.core.core.storages.redisdb import get_default_redis
+from paasng.platform.engine.streaming.hub import (
+    ChannelHub,
+    get_channel_state,
+    make_event_frame,
+    strip_event_line_ansi,
+    subscribe_channel,
+)
+
+
+@pytest.fixture()
+def channel():
+    c = StreamChannel(uuid.uuid4().hex, redis_db=get_default_redis())
+    c.initialize()
+    yield c
+    c.destroy()
+
+
+def _publish_lines(channel, count):
+    for i in range(count):
+        channel.publish_msg(json.dumps({"line": f"\x1b[1mline {i}\x1b[0m", "stream": "STDOUT"}))
+
+
+def _get_line(frame, include_ansi_codes=False):
+    data = frame.render(include_ansi_codes).split("data: ", 1)[1]
+    return json.loads(data)["line"]
+
+
+def test_strip_event_line_ansi():
+    assert strip_event_line_ansi("id: 1\n") == "id: 1\n"
+    assert strip_event_line_ansi("data: not json\n\n") == "data: not json\n\n"
+    assert strip_event_line_ansi('data: {"line": "\\u001b[1mfoo"}\n\n') == 'data: {"line": "foo"}\n\n'
+
+
+def test_make_event_frame():
+    assert make_event_frame({"id": 1, "event": "internal", "data": ""}) is None
+
+    frame = make_event_frame({"id": 2, "event": "msg", "data": json.dumps({"line": "\x1b[1mfoo"})})
+    assert frame is not None
+    assert frame.raw.startswith("id: 2\nevent: message\n")
+    assert _get_line(frame) == "foo"
+    assert _get_line(frame, include_ansi_codes=True) == "\x1b[1mfoo"
+
+
+def test_get_channel_state(channel):
+    redis_db = get_default_redis()
+    assert get_channel_state(channel.channel_id, redis_db) == "open"
+    assert get_channel_state(uuid.uuid4().hex, redis_db) == "none"
+
+
+class TestChannelHub:
+    def test_subscribe(self, channel):
+        _publish_lines(channel, 3)
+        channel.close()
+
+        frames = list(subscribe_channel(channel.channel_id, get_default_redis()))
+        assert [_get_line(f) for f in frames] == ["line 0", "line 1", "line 2"]
+
+    def test_resume_from_last_event_id(self, channel):
+        _publish_lines(channel, 3)
+        channel.close()
+
+        frames = list(subscribe_channel(channel.channel_id, get_default_redis()))
+        resumed = list(subscribe_channel(channel.channel_id, get_default_redis(), last_event_id=frames[0].id))
+        assert [_get_line(f) for f in resumed] == ["line 1", "line 2"]
+
+    def test_evicted_frames_read_from_history(self, channel):
+        _publish_lines(channel, 10)
+        channel.close()
+
+        hub = ChannelHub(channel.channel_id, get_default_redis(), buffer_size=3)
+        frames = list(hub.subscribe())
+        assert [_get_line(f) for f in frames] == [f"line {i}" for i in range(10)]
+
+    def test_shared_between_subscribers(self, channel):
+        _publish_lines(channel, 2)
+        redis_db = get_default_redis()
+
+        sub_a = subscribe_channel(channel.channel_id, redis_db)
+        sub_b = subscribe_channel(channel.channel_id, redis_db)
+        assert _get_line(next(sub_a)) == "line 0"
+        assert _get_line(next(sub_b)) == "line 0"
+
+        _publish_lines(channel, 1)
+        channel.close()
+        assert [_get_line(f) for f in sub_a] == ["line 1", "line 0"]
+        assert [_get_line(f) for f in sub_b] == ["line 1", "line 0"]
@@ -15,9 +15,33 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import random
+import timeit
+
 import pytest
 
-from paasng.platform.engine.utils.ansi import bell, esc, strip_ansi
+from paasng.platform.engine.utils.ansi import bell, esc, strip_ansi, strip_ansi_by_state_machine
+
+# Log lines copied from the output of buildpacks and commands
+BUILDPACK_LOGS = [
+    f"{esc}[1;32m-----> {esc}[0mPython app detected",
+    f"{esc}[1;33m-----> {esc}[0mInstalling python-3.11.7",
+    "       Collecting django==4.2.23 (from -r requirements.txt (line 1))",
+    f"       {esc}[33mWARNING: Running pip as the 'root' user can result in broken permissions{esc}[0m",
+    f"{esc}[2K{esc}[1G{esc}[1mnpm{esc}[22m {esc}[33mWARN{esc}[39m {esc}[94mdeprecated{esc}[39m inflight@1.0.6",
+    f"{esc}[?25l{esc}[1A{esc}[2K{esc}[G⠙ reify:lodash: {esc}[32;40mtiming{esc}[0m reifyNode:node_modules/lodash",
+    f"{esc}]0;npm install{bell}added 1024 packages, and audited 1025 packages in 12s",
+    f"{esc}(B{esc}[m{esc}[1m{esc}[31mERROR:{esc}(B{esc}[m build failed{bell}",
+    f"Step 3/12 : RUN pip install -r requirements.txt {esc}[36m---> Running in 3b2c1a{esc}[0m",
+    "Successfully built image: mirrors.example.com/bkapps/foo:1.0.0",
+]
+
+
+def _random_texts(count: int):
+    alphabet = [esc, bell, "[", "]", "(", "%", "#", ";", "?", "0", "1", "4", "9", "A", "m", "x", "<", " ", "\n", "中"]
+    rand = random.Random(42)
+    for _ in range(count):
+        yield "".join(rand.choice(alphabet) for _ in range(rand.randint(0, 24)))
 
 
 @pytest.mark.parametrize(
@@ -54,3 +78,22 @@ from paasng.platform.engine.utils.ansi import bell, esc, strip_ansi
 def test_strip_ansi(input_text, expected_output):
     """测试 strip_ansi 函数在各种情况下的表现。"""
     assert strip_ansi(input_text) == expected_output
+
+
+@pytest.mark.parametrize("text", BUILDPACK_LOGS)
+def test_strip_ansi_identical_on_logs(text):
+    assert strip_ansi(text) == strip_ansi_by_state_machine(text)
+
+
+def test_strip_ansi_identical_on_random_texts():
+    for text in _random_texts(20000):
+        assert strip_ansi(text) == strip_ansi_by_state_machine(text), repr(text)
+
+
+@pytest.mark.benchmark()
+def test_strip_ansi_benchmark():
+    """A micro benchmark which makes sure `strip_ansi` is much faster than the state machine"""
+    logs = BUILDPACK_LOGS * 20
+    fast = min(timeit.repeat(lambda: [strip_ansi(line) for line in logs], number=10, repeat=3))
+    slow = min(timeit.repeat(lambda: [strip_ansi_by_state_machine(line) for line in logs], number=10, repeat=3))
+    assert fast * 3 < slow
@@ -19,7 +19,12 @@ from unittest import mock
 
 import pytest
 
-from paasng.platform.engine.utils.output import ConsoleStream, RedisWithModelStream, sanitize_message
+from paasng.platform.engine.utils.output import (
+    BufferedModelStream,
+    ConsoleStream,
+    RedisWithModelStream,
+    sanitize_message,
+)
 
 pytestmark = pytest.mark.django_db(databases=["default", "workloads"])
 
@@ -54,6 +59,9 @@ class TestMixStream:
         bps = RedisWithModelStream(build_proc.output_stream, mock.MagicMock())
         bps.write_message("message")
         bps.write_message("write \n message test")
+        assert build_proc.output_stream.lines.count() == 0, "messages should be buffered"
+
+        bps.close()
         assert build_proc.output_stream.lines.count() == 2
         assert list(build_proc.output_stream.lines.values_list("line", flat=True)) == [
             "message\n",
@@ -63,3 +71,30 @@ class TestMixStream:
     def test_write_title(self, build_proc):
         RedisWithModelStream(build_proc, mock.MagicMock()).write_title("title")
         assert build_proc.output_stream.lines.count() == 0, "title should not be saved"
+
+
+class TestBufferedModelStream:
+    def test_flush_by_max_lines(self, build_proc):
+        stream = BufferedModelStream(build_proc.output_stream, max_lines=3)
+        for i in range(4):
+            stream.write_message(f"line {i}")
+        assert build_proc.output_stream.lines.count() == 3
+
+        stream.flush()
+        assert list(build_proc.output_stream.lines.values_list("line", flat=True)) == [
+            "line 0\n",
+            "line 1\n",
+            "line 2\n",
+            "line 3\n",
+        ]
+
+    def test_flush_by_interval(self, build_proc):
+        stream = BufferedModelStream(build_proc.output_stream, flush_interval=0)
+        stream.write_message("foo", "STDERR")
+        assert list(build_proc.output_stream.lines.values_list("line", "stream")) == [("foo\n", "STDERR")]
+
+    def test_flush_empty(self, build_proc):
+        stream = BufferedModelStream(build_proc.output_stream)
+        with mock.patch.object(build_proc.output_stream, "bulk_write") as bulk_write:
+            stream.flush()
+        assert not bulk_write.called
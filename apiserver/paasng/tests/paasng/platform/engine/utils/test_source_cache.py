@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+import uuid
+from unittest import mock
+
+import pytest
+
+from paasng.platform.engine.utils.source_cache import (
+    get_cached_source_package,
+    get_source_package_digest,
+    get_source_package_path_by_digest,
+    set_cached_source_package,
+)
+from paasng.platform.modules.constants import SourceOrigin
+from paasng.platform.sourcectl.utils import DockerIgnore
+from tests.paasng.platform.engine.setup_utils import create_fake_deployment
+
+pytestmark = pytest.mark.django_db(databases=["default", "workloads"])
+
+
+@pytest.fixture()
+def digests():
+    # Use unique digests to avoid sharing the cache between tests
+    return uuid.uuid4().hex, uuid.uuid4().hex
+
+
+@pytest.fixture()
+def blob_store():
+    with mock.patch("paasng.platform.engine.utils.source_cache.make_blob_store") as mocked:
+        yield mocked()
+
+
+class TestGetSourcePackageDigest:
+    def test_same_revision_in_envs(self, bk_module_full):
+        stag = create_fake_deployment(bk_module_full, app_environment="stag")
+        prod = create_fake_deployment(bk_module_full, app_environment="prod")
+        assert get_source_package_digest(stag) == get_source_package_digest(prod) is not None
+
+    def test_different_content(self, bk_module_full):
+        deployment = create_fake_deployment(bk_module_full)
+        digests = {get_source_package_digest(deployment), get_source_package_digest(deployment, DockerIgnore("*.log"))}
+        deployment.source_revision = "1001"
+        digests.add(get_source_package_digest(deployment))
+        assert len(digests) == 3
+
+    def test_not_vcs(self, bk_module_full):
+        bk_module_full.source_origin = SourceOrigin.S_MART.value
+        bk_module_full.save(update_fields=["source_origin"])
+        assert get_source_package_digest(create_fake_deployment(bk_module_full)) is None
+
+
+class TestCachedSourcePackage:
+    def test_hit(self, digests, blob_store):
+        path = get_source_package_path_by_digest("default", digests[0])
+        set_cached_source_package(digests[0], path)
+        assert get_cached_source_package(digests[0]) == path
+        assert get_cached_source_package(digests[1]) is None
+
+    def test_path_by_digest(self, digests):
+        paths = {get_source_package_path_by_digest("default", d) for d in digests}
+        assert len(paths) == 2
+        assert get_source_package_path_by_digest("default", digests[0]) == f"default/source-packages/{digests[0]}/tar"
+
+    def test_blob_missing(self, digests, blob_store):
+        blob_store.get_file_metadata.side_effect = Exception("not found")
+        set_cached_source_package(digests[0], get_source_package_path_by_digest("default", digests[0]))
+        assert get_cached_source_package(digests[0]) is None
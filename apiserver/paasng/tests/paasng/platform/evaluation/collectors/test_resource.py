@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+import random
+import statistics
+import timeit
+from typing import List
+
+import pytest
+
+from paasng.platform.evaluation.collectors.resource import ResSummary, calc_res_summary, percentile
+
+# 7 天，每 15 分钟一个采样点
+POINTS_PER_REPLICA = 7 * 24 * 4
+
+
+def make_series(replicas: int, seed: int = 42) -> List[List]:
+    rand = random.Random(seed)
+    start = 1700000000
+    return [
+        [(start + i * 900, str(rand.uniform(0.001, 0.5))) for i in range(POINTS_PER_REPLICA)] for _ in range(replicas)
+    ]
+
+
+def legacy_calc_res_summary(metrics: List, trans_unit_func) -> ResSummary:
+    """The previous implementation, which converts every sample and uses approximate percentiles"""
+    summary = ResSummary()
+    summary.start = metrics[0][0]
+    summary.end = metrics[-1][0]
+    metrics = sorted(
+        [round(trans_unit_func(float(metric)), 2) for _, metric in metrics if (metric and metric != "None")]
+    )
+    if not metrics:
+        return summary
+
+    summary.cnt = len(metrics)
+    half = len(metrics) // 2
+    summary.med = round((metrics[half] + metrics[~half]) / 2, 2)
+    summary.avg = round(sum(metrics) / len(metrics), 2)
+    summary.p75 = metrics[int(len(metrics) / 4 * 3)]
+    summary.p90 = metrics[int(len(metrics) / 10 * 9)]
+    summary.max = metrics[-1]
+    return summary
+
+
+@pytest.mark.parametrize(
+    ("values", "q", "expected"),
+    [
+        ([1.0], 90, 1.0),
+        ([1.0, 2.0], 50, 1.5),
+        ([1.0, 2.0, 3.0, 4.0], 75, 3.25),
+        ([1.0, 2.0, 3.0, 4.0, 5.0], 90, 4.6),
+        ([1.0, 2.0, 3.0, 4.0, 5.0], 100, 5.0),
+        ([1.0, 2.0, 3.0, 4.0, 5.0], 0, 1.0),
+    ],
+)
+def test_percentile(values, q, expected):
+    assert percentile(values, q) == pytest.approx(expected)
+
+
+class TestCalcResSummary:
+    def test_empty(self):
+        assert calc_res_summary([]) == ResSummary()
+        assert calc_res_summary([[]]) == ResSummary()
+
+    def test_invalid_values(self):
+        summary = calc_res_summary([[(1, None), (2, "None"), (3, "NaN"), (4, "+Inf")]])
+        assert summary == ResSummary(start=1, end=4)
+
+    def test_multi_replicas(self):
+        series = [
+            [(10, "0.1"), (20, "0.2"), (30, None)],
+            [(5, "0.3"), (15, "0.4"), (25, "NaN")],
+        ]
+        summary = calc_res_summary(series, scale=1000)
+        assert summary == ResSummary(start=5, end=30, cnt=4, med=250, avg=250, p75=325, p90=370, max=400, min=100)
+
+    def test_same_as_statistics(self):
+        series = make_series(3)
+        summary = calc_res_summary(series)
+
+        values = [float(v) for s in series for _, v in s]
+        quantiles = statistics.quantiles(values, n=100, method="inclusive")
+        assert summary.cnt == len(values)
+        assert summary.med == round(statistics.median(values), 2)
+        assert summary.avg == round(statistics.fmean(values), 2)
+        assert summary.p75 == round(quantiles[74], 2)
+        assert summary.p90 == round(quantiles[89], 2)
+        assert summary.min == round(min(values), 2)
+        assert summary.max == round(max(values), 2)
+
+
+@pytest.mark.benchmark()
+def test_calc_res_summary_benchmark():
+    """A micro benchmark which makes sure `calc_res_summary` is faster than the previous implementation"""
+    series = make_series(4)
+    flatten = [point for s in series for point in s]
+    fast = min(timeit.repeat(lambda: calc_res_summary(series, scale=1000), number=20, repeat=3))
+    slow = min(timeit.repeat(lambda: legacy_calc_res_summary(flatten, lambda x: x * 1000), number=20, repeat=3))
+    assert fast < slow
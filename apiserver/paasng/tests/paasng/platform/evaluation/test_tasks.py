@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+from unittest import mock
+
+import pytest
+
+from paasng.platform.evaluation.constants import BatchTaskStatus
+from paasng.platform.evaluation.models import AppOperationReportCollectionTask
+from paasng.platform.evaluation.tasks import collect_app_operation_report_chunk, collect_app_operation_reports_sync
+from tests.utils.helpers import create_app
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture()
+def apps(settings):
+    settings.OPERATION_REPORT_COLLECT_CHUNK_SIZE = 2
+    return [create_app() for _ in range(5)]
+
+
+class TestCollectAppOperationReports:
+    def test_collect_specified_apps(self, apps):
+        codes = [app.code for app in apps[:3]]
+
+        def fake_collect(app):
+            if app.code == codes[0]:
+                raise RuntimeError("collect failed")
+
+        with mock.patch(
+            "paasng.platform.evaluation.tasks._update_or_create_operation_report", side_effect=fake_collect
+        ) as mocked:
+            collect_app_operation_reports_sync(codes)
+
+        assert mocked.call_count == 3
+        task = AppOperationReportCollectionTask.objects.latest("start_at")
+        assert task.status == BatchTaskStatus.FINISHED
+        assert task.total_count == 3
+        assert task.succeed_count == 3
+        assert task.failed_app_codes == [codes[0]]
+        assert sorted(task.finished_chunks) == [0, 1]
+
+    def test_resume(self, apps):
+        # Simulate a crashed collection, the first chunk has been finished
+        codes = [app.code for app in apps]
+        task = AppOperationReportCollectionTask.objects.create(
+            total_count=len(codes), collect_all=True, app_codes=codes, chunk_size=2
+        )
+        with mock.patch("paasng.platform.evaluation.tasks._update_or_create_operation_report") as mocked:
+            collect_app_operation_report_chunk(task.id, 0)
+            mocked.reset_mock()
+
+            collect_app_operation_reports_sync([])
+
+        # Only apps in unfinished chunks are collected
+        assert sorted(call.args[0].code for call in mocked.call_args_list) == sorted(codes[2:])
+        task.refresh_from_db()
+        assert task.status == BatchTaskStatus.FINISHED
+        assert task.succeed_count == len(codes)
+        assert sorted(task.finished_chunks) == [0, 1, 2]
+
+    def test_chunk_idempotent(self, apps):
+        codes = [app.code for app in apps]
+        task = AppOperationReportCollectionTask.objects.create(
+            total_count=len(codes), collect_all=True, app_codes=codes, chunk_size=2
+        )
+        with mock.patch("paasng.platform.evaluation.tasks._update_or_create_operation_report"):
+            collect_app_operation_report_chunk(task.id, 1)
+            collect_app_operation_report_chunk(task.id, 1)
+
+        task.refresh_from_db()
+        assert task.succeed_count == 2
+        assert task.get_pending_chunks() == [0, 2]
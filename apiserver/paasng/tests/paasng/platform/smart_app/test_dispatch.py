@@ -28,6 +28,7 @@ from requests_mock import Adapter
 from paasng.platform.applications.models import SMartAppExtraInfo
 from paasng.platform.smart_app.services.detector import SourcePackageStatReader
 from paasng.platform.smart_app.services.dispatch import (
+    SharedLayerUploader,
     bksmart_settings,
     dispatch_cnb_image_to_registry,
     dispatch_package_to_modules,
@@ -36,6 +37,7 @@ from paasng.platform.smart_app.services.dispatch import (
 )
 from paasng.platform.smart_app.services.image_mgr import SMartImageManager
 from paasng.platform.sourcectl.utils import compress_directory, generate_temp_dir, uncompress_directory
+from paasng.utils.moby_distribution import Blob, ImageRef, LayerRef
 
 pytestmark = pytest.mark.django_db
 
@@ -396,3 +398,32 @@ def test_parse_and_save_cnb_metadata(bk_app, assets_rootpath):
     assert expected_app_extra.use_cnb is True
     assert expected_app_extra.get_image_tar("main") == "main.tar"
     assert expected_app_extra.get_proc_entrypoints("main") == {"web": ["main-web"]}
+
+
+def test_shared_layer_uploader(tmp_path, image_config_content):
+    def make_image(repo, *layer_names):
+        layers = []
+        for name in layer_names:
+            path = tmp_path / name
+            path.write_bytes(name.encode())
+            digest = f"sha256:{hashlib.sha256(name.encode()).hexdigest()}"
+            layers.append(LayerRef(repo=repo, digest=digest, size=len(name), local_path=path))
+        return ImageRef(repo=repo, reference="1.0", layers=layers, initial_config=image_config_content.decode())
+
+    base_layer = LayerRef(repo="base", digest="sha256:base", size=1, exists=True)
+    images = [make_image("foo", "shared", "foo"), make_image("bar", "shared", "bar")]
+    images[1].layers.insert(0, base_layer)
+
+    with mock.patch.object(Blob, "upload", autospec=True) as upload:
+        SharedLayerUploader(max_workers=1).upload(images)
+
+    # Every unique layer is uploaded only once
+    uploaded = sorted((c.args[0].repo, c.args[0].local_path.name) for c in upload.call_args_list)
+    assert uploaded == [("bar", "bar"), ("foo", "foo"), ("foo", "shared")]
+    # The shared layer will be mounted from the repository which it was uploaded to
+    assert all(layer.exists for image in images for layer in image.layers)
+    assert [(layer.repo, layer.local_path.name) for layer in images[1].layers[1:]] == [
+        ("foo", "shared"),
+        ("bar", "bar"),
+    ]
+    assert images[1].layers[0] == base_layer
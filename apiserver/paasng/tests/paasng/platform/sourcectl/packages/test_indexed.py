@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+import io
+import tarfile
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from paasng.platform.sourcectl.exceptions import (
+    PackageInvalidFileFormatError,
+    ReadFileNotFoundError,
+    ReadLinkFileOutsideDirectoryError,
+)
+from paasng.platform.sourcectl.package import indexed
+from paasng.platform.sourcectl.package.cache import SourcePackageCache
+from paasng.platform.sourcectl.package.indexed import IndexedTarReader, compute_sha256, get_index_path
+
+
+def make_tarball(path: Path, compression: str = "gz", links=None, **files):
+    """Make a tarball, the keys of files are the member names and "__" is converted to "/" """
+    with tarfile.open(path, mode=f"w:{compression}") as tar:
+        for name, content in files.items():
+            info = tarfile.TarInfo("./" + name.replace("__", "/"))
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+        for name, target in (links or {}).items():
+            info = tarfile.TarInfo("./" + name)
+            info.type = tarfile.SYMTYPE
+            info.linkname = target
+            tar.addfile(info)
+    return path
+
+
+@pytest.mark.parametrize("compression", ["", "gz"])
+class TestIndexedTarReader:
+    def test_read(self, tmp_path, compression):
+        path = make_tarball(
+            tmp_path / "foo.tar", compression, app_desc=b"spec_version: 3", src__big=b"x" * 2048, Procfile=b"web"
+        )
+        with mock.patch.object(indexed, "INLINE_MEMBER_MAX_SIZE", 1024):
+            reader = IndexedTarReader(path)
+
+        assert reader.read("app_desc") == b"spec_version: 3"
+        assert reader.read("./src/big") == b"x" * 2048
+        assert reader.read("Procfile") == b"web"
+        with pytest.raises(ReadFileNotFoundError):
+            reader.read("procfile")
+        reader.close()
+
+    def test_symbolic_links(self, tmp_path, compression):
+        path = make_tarball(
+            tmp_path / "foo.tar",
+            compression,
+            links={"a": "src/b", "src/b": "../c", "passwd": "/etc/passwd", "outside": "../../etc/passwd"},
+            c=b"c",
+        )
+        reader = IndexedTarReader(path)
+
+        assert reader.read("a") == b"c"
+        for name in ["passwd", "outside"]:
+            with pytest.raises(ReadLinkFileOutsideDirectoryError, match=".*is invalid"):
+                reader.read(name)
+        reader.close()
+
+    def test_index_not_persisted_by_default(self, tmp_path, compression):
+        path = make_tarball(tmp_path / "foo.tar", compression, foo=b"foo")
+        with mock.patch.object(indexed, "compute_sha256") as compute:
+            IndexedTarReader(path).close()
+        assert not compute.called
+        assert [p.name for p in tmp_path.iterdir()] == [path.name]
+
+    def test_index_persisted(self, tmp_path, compression):
+        path = make_tarball(tmp_path / "foo.tar", compression, foo=b"foo")
+        IndexedTarReader(path, persist_index=True).close()
+        with path.open("rb") as fh:
+            assert get_index_path(path, compute_sha256(fh)).exists()
+
+        # The saved index is used, the tarball is not read again
+        with mock.patch.object(indexed, "build_tar_index") as build_tar_index:
+            reader = IndexedTarReader(path, persist_index=True)
+        assert not build_tar_index.called
+        assert reader.read("foo") == b"foo"
+        reader.close()
+
+
+def test_invalid_tarball(tmp_path):
+    path = tmp_path / "foo.tgz"
+    path.write_text("Definitely not a tarball")
+    with pytest.raises(PackageInvalidFileFormatError):
+        IndexedTarReader(path)
+
+
+class TestSourcePackageCache:
+    @pytest.fixture()
+    def package(self, tmp_path):
+        path = make_tarball(tmp_path / "foo.tgz", foo=b"foo")
+        with path.open("rb") as fh:
+            return path, compute_sha256(fh)
+
+    @pytest.fixture()
+    def download(self, package):
+        def _download(url, local_path):
+            local_path.write_bytes(package[0].read_bytes())
+
+        with mock.patch("paasng.platform.sourcectl.package.cache.download_file_via_url", side_effect=_download) as m:
+            yield m
+
+    def test_fetch_once(self, tmp_path, package, download):
+        cache = SourcePackageCache(tmp_path / "cache", max_size=1024 * 1024)
+        for _ in range(2):
+            path, cached = cache.fetch("http://foo/bar", package[1])
+            assert cached is True
+            assert path.read_bytes() == package[0].read_bytes()
+        assert download.call_count == 1
+
+    def test_digest_mismatch(self, tmp_path, download):
+        cache = SourcePackageCache(tmp_path / "cache", max_size=1024 * 1024)
+        path, cached = cache.fetch("http://foo/bar", "0" * 64)
+        assert cached is False
+        assert not cache.get_path("0" * 64).exists()
+
+    def test_evict(self, tmp_path, package, download):
+        cache = SourcePackageCache(tmp_path / "cache", max_size=0)
+        cache.min_age_seconds = 0
+        path, _ = cache.fetch("http://foo/bar", package[1])
+        assert not path.exists()
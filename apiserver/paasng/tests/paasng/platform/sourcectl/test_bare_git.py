@@ -114,8 +114,10 @@ class TestBareGitRepoController:
         link_file.symlink_to(outside_file)
 
     @pytest.fixture
-    def fake_controller(self, bk_module):
+    def fake_controller(self, bk_module, settings):
         """Common helper to setup controller with mocked clone operation"""
+        # Read files by cloning, the mirror cache is tested in "git/test_mirror.py"
+        settings.BARE_GIT_MIRROR_CACHE_ENABLED = False
         fake_repo = self.get_fake_repo(bk_module, "http://localhost/test.git")
         self.get_fake_auth_holder(bk_module, fake_repo, "admin", "password")
         return BareGitRepoController.init_by_module(bk_module, "admin")
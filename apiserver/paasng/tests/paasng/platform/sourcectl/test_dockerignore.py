@@ -14,12 +14,19 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import os
 import tarfile
 from textwrap import dedent
 
 import pytest
 
-from paasng.platform.sourcectl.utils import DockerIgnore, compress_directory_ext, generate_temp_dir, generate_temp_file
+from paasng.platform.sourcectl.utils import (
+    DockerIgnore,
+    compress_directory_ext,
+    generate_temp_dir,
+    generate_temp_file,
+    list_files_to_compress,
+)
 
 
 class TestDockerIgnore:
@@ -202,3 +209,42 @@ def test_compress_with_docker_ignore():
                 "src/__main__.py",
                 "Dockerfile",
             }
+
+
+def test_list_files_to_compress():
+    checked = []
+
+    def should_ignore(path: str) -> bool:
+        checked.append(path)
+        return path == "node_modules"
+
+    with generate_temp_dir() as workdir:
+        (workdir / "node_modules" / "foo").mkdir(parents=True)
+        (workdir / "node_modules" / "foo" / "index.js").write_text("")
+        (workdir / "src" / "empty").mkdir(parents=True)
+        (workdir / "src" / "b.py").write_text("")
+        (workdir / "src" / "a.py").write_text("")
+        (workdir / "z.md").write_text("")
+        (workdir / "link").symlink_to(workdir / "src")
+
+        assert list_files_to_compress(workdir, should_ignore) == ["link", "z.md", "src/a.py", "src/b.py"]
+        # The ignored directory is not walked into
+        assert not [p for p in checked if p.startswith("node_modules/")]
+
+
+def test_compress_reproducible():
+    di = DockerIgnore("*.log")
+    with generate_temp_dir() as workdir, generate_temp_file(suffix=".tar.gz") as dest:
+        (workdir / "src").mkdir()
+        (workdir / "src" / "app.py").write_text("flag")
+        (workdir / "debug.log").write_text("log")
+
+        compress_directory_ext(workdir, dest, di.should_ignore, reproducible=True)
+        content = dest.read_bytes()
+        with tarfile.open(dest, mode="r:gz") as tf:
+            assert [(m.name, m.mtime, m.uid) for m in tf.getmembers()] == [("src/app.py", 0, 0)]
+
+        # Touch the file, the tarball is still the same
+        os.utime(workdir / "src" / "app.py", (1, 1))
+        compress_directory_ext(workdir, dest, di.should_ignore, reproducible=True)
+        assert dest.read_bytes() == content
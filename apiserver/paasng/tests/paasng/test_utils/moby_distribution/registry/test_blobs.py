@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+import hashlib
+import io
+import os
+from types import SimpleNamespace
+from typing import List, Optional
+
+import pytest
+import requests
+
+from paasng.utils.moby_distribution.registry import exceptions
+from paasng.utils.moby_distribution.registry.resources.blobs import Blob, BlobWriter
+
+LOCATION = "mock://registry/v2/foo/blobs/uploads/abc"
+
+
+class FakeUploadClient:
+    """Keeps the uploaded content in memory, the PATCH requests in `fail_at` fail after receiving `accepted` bytes"""
+
+    api_base_url = "mock://registry"
+
+    def __init__(self, fail_at: Optional[List[int]] = None, accepted: int = 0, status_code: Optional[int] = None):
+        self.content = b""
+        self.patch_count = 0
+        self.fail_at = fail_at or []
+        self.accepted = accepted
+        self.status_code = status_code
+
+    def _response(self, status_code: int):
+        headers = {"location": LOCATION, "range": f"0-{max(len(self.content) - 1, 0)}"}
+        return SimpleNamespace(status_code=status_code, headers=headers)
+
+    def post(self, url, **kwargs):
+        return self._response(202)
+
+    def patch(self, url, data, headers, **kwargs):
+        self.patch_count += 1
+        assert headers["content-range"].split("-")[0] == str(len(self.content))
+        if self.patch_count in self.fail_at:
+            self.content += bytes(data[: self.accepted])
+            if self.status_code:
+                resp = self._response(self.status_code)
+                raise exceptions.RequestErrorWithResponse("error", status_code=self.status_code, response=resp)
+            raise requests.ConnectionError("connection reset")
+        self.content += bytes(data)
+        return self._response(202)
+
+    def get(self, url, **kwargs):
+        return self._response(204)
+
+    def put(self, url, params, **kwargs):
+        assert params["digest"] == f"sha256:{hashlib.sha256(self.content).hexdigest()}"
+        return self._response(201)
+
+
+@pytest.fixture(autouse=True)
+def _no_wait(monkeypatch):
+    monkeypatch.setattr("time.sleep", lambda _: None)
+
+
+class TestBlobWriter:
+    @pytest.mark.parametrize("accepted", [0, 100, 1024])
+    def test_resume(self, accepted):
+        client = FakeUploadClient(fail_at=[2], accepted=accepted)
+        writer = BlobWriter("abc", LOCATION, client=client)  # type: ignore[arg-type]
+        chunks = [os.urandom(1024) for _ in range(3)]
+        for chunk in chunks:
+            assert writer.write(chunk) == len(chunk)
+
+        assert client.content == b"".join(chunks)
+        assert writer.tell() == 3 * 1024
+
+    def test_resume_from_beginning(self):
+        client = FakeUploadClient(fail_at=[1])
+        writer = BlobWriter("abc", LOCATION, client=client)  # type: ignore[arg-type]
+        writer.write(b"foo")
+        assert client.content == b"foo"
+
+    def test_server_error(self):
+        client = FakeUploadClient(fail_at=[1], status_code=503)
+        writer = BlobWriter("abc", LOCATION, client=client)  # type: ignore[arg-type]
+        writer.write(b"foo")
+        assert client.content == b"foo"
+
+    def test_not_retryable(self):
+        client = FakeUploadClient(fail_at=[1], status_code=400)
+        writer = BlobWriter("abc", LOCATION, client=client)  # type: ignore[arg-type]
+        with pytest.raises(exceptions.RequestErrorWithResponse):
+            writer.write(b"foo")
+        assert client.patch_count == 1
+
+    def test_too_many_retries(self):
+        client = FakeUploadClient(fail_at=[1, 2, 3])
+        writer = BlobWriter("abc", LOCATION, client=client, max_retries=2)  # type: ignore[arg-type]
+        with pytest.raises(requests.ConnectionError):
+            writer.write(b"foo")
+        assert client.patch_count == 3
+
+
+def test_upload_by_chunks(monkeypatch):
+    content = os.urandom(10 * 1024 + 1)
+    client = FakeUploadClient(fail_at=[3], accepted=512)
+    blob = Blob(repo="foo", fileobj=io.BytesIO(content), client=client)  # type: ignore[arg-type]
+    monkeypatch.setattr(blob, "stat", lambda: blob.digest)
+
+    assert blob.upload(chunk_size=1024) == f"sha256:{hashlib.sha256(content).hexdigest()}"
+    assert client.content == content
+    # 11 chunks and 1 retry
+    assert client.patch_count == 12
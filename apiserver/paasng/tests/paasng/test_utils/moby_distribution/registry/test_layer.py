@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+from unittest import mock
+
+import pytest
+
+from paasng.utils.moby_distribution.registry.resources.blobs import Blob, LayerSignWrapper
+from paasng.utils.moby_distribution.registry.resources.image import ImageRef, InMemoryDiffIDCache, LayerRef
+
+INITIAL_CONFIG = json.dumps(
+    {
+        "created": "2024-01-01T00:00:00Z",
+        "architecture": "amd64",
+        "os": "linux",
+        "config": {},
+        "rootfs": {"type": "layers", "diff_ids": []},
+        "history": [],
+    }
+)
+
+
+def sha256(content: bytes) -> str:
+    return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+
+class TestLayerSignWrapper:
+    @pytest.mark.parametrize(
+        "members",
+        [
+            [b""],
+            [b"foo" * 1024],
+            # Compressible content which is much larger than the decompress chunk size
+            [b"\0" * 5 * 1024 * 1024],
+            # Multiple gzip members
+            [b"foo", os.urandom(100 * 1024)],
+        ],
+    )
+    def test_gzipped(self, members):
+        gzipped = b"".join(gzip.compress(m) for m in members)
+        signer = LayerSignWrapper()
+        shutil.copyfileobj(io.BytesIO(gzipped), signer, length=1000)
+
+        assert signer.tell() == len(gzipped)
+        assert signer.digest() == sha256(gzipped)
+        assert signer.diff_id() == sha256(b"".join(members))
+
+    @pytest.mark.parametrize("padding", [b"\0" * 10, b"\0" * 3000])
+    def test_zero_padded(self, padding):
+        members = [b"foo", b"bar" * 1024]
+        gzipped = gzip.compress(members[0]) + padding + gzip.compress(members[1]) + padding
+        signer = LayerSignWrapper()
+        shutil.copyfileobj(io.BytesIO(gzipped), signer, length=1000)
+
+        assert signer.digest() == sha256(gzipped)
+        assert signer.diff_id() == sha256(gzip.decompress(gzipped)) == sha256(b"".join(members))
+
+    def test_trailing_garbage(self):
+        content = gzip.compress(b"foo") + b"garbage"
+        signer = LayerSignWrapper()
+        shutil.copyfileobj(io.BytesIO(content), signer)
+        assert signer.diff_id() == signer.digest() == sha256(content)
+
+    def test_not_gzipped(self):
+        content = b"not a gzipped tarball"
+        signer = LayerSignWrapper()
+        shutil.copyfileobj(io.BytesIO(content), signer)
+        assert signer.diff_id() == signer.digest() == sha256(content)
+
+    def test_truncated(self):
+        signer = LayerSignWrapper()
+        signer.write(gzip.compress(os.urandom(1024))[:-100])
+        with pytest.raises(EOFError):
+            signer.diff_id()
+
+
+class TestAddLayer:
+    @pytest.fixture()
+    def image(self):
+        return ImageRef(
+            repo="foo",
+            reference="latest",
+            layers=[],
+            initial_config=INITIAL_CONFIG,
+            diff_id_cache=InMemoryDiffIDCache(),
+        )
+
+    def test_local(self, tmp_path, image):
+        path = tmp_path / "layer.tar.gz"
+        path.write_bytes(gzip.compress(b"layer"))
+
+        descriptor = image.add_layer(LayerRef(local_path=path))
+
+        assert descriptor.digest == sha256(path.read_bytes())
+        assert image.image_json.rootfs.diff_ids == [sha256(b"layer")]
+        assert image.diff_id_cache.get(descriptor.digest) == sha256(b"layer")
+
+    def test_remote(self, image):
+        gzipped = gzip.compress(b"layer")
+        layer = LayerRef(repo="bar", digest=sha256(gzipped), size=len(gzipped), exists=True)
+
+        def download(self):
+            self.fileobj.write(gzipped)
+
+        with mock.patch.object(Blob, "download", autospec=True, side_effect=download) as mocked:
+            image.add_layer(layer)
+            # The diff_id is cached, the layer is not downloaded again
+            image.add_layer(layer.copy())
+
+        assert mocked.call_count == 1
+        assert image.image_json.rootfs.diff_ids == [sha256(b"layer")] * 2
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# TencentBlueKing is pleased to support the open source community by making
+# 蓝鲸智云 - PaaS 平台 (BlueKing - PaaS System) available.
+# Copyright (C) 2017 THL A29 Limited, a Tencent company. All rights reserved.
+# Licensed under the MIT License (the "License"); you may not use this file except
+# in compliance with the License. You may obtain a copy of the License at
+#
+#     http://opensource.org/licenses/MIT
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# We undertake not to change the open source license (MIT license) applicable
+# to the current version of the project delivered to anyone in the future.
+
+import json
+import threading
+import time
+from typing import List
+from unittest import mock
+
+import pytest
+
+from paasng.utils import api_middleware
+from paasng.utils.api_middleware import ApiLogShipper, resolve_url_name
+
+
+class FakeRedis:
+    def __init__(self, block: bool = False):
+        self.pushed: List[List[str]] = []
+        # Blocks the rpush calls until set
+        self.unblocked = threading.Event()
+        if not block:
+            self.unblocked.set()
+
+    def rpush(self, name, *values):
+        self.unblocked.wait(5)
+        self.pushed.append(list(values))
+        return len(values)
+
+
+def wait_until(predicate, timeout: float = 3):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture()
+def make_shipper():
+    """Make shippers, their background threads are stopped after the test"""
+    shippers: List[ApiLogShipper] = []
+
+    def _make(*args, **kwargs) -> ApiLogShipper:
+        shipper = ApiLogShipper(*args, **kwargs)
+        shippers.append(shipper)
+        return shipper
+
+    yield _make
+    for shipper in shippers:
+        shipper.stop()
+
+
+class TestApiLogShipper:
+    def test_send_by_batch(self, make_shipper):
+        client = FakeRedis()
+        shipper = make_shipper(client, "meters", batch_size=3, flush_interval=0.2)
+        for i in range(5):
+            assert shipper.put({"i": i}) is True
+
+        wait_until(lambda: sum(len(values) for values in client.pushed) == 5)
+        assert [len(values) for values in client.pushed] == [3, 2]
+        assert [json.loads(v)["i"] for values in client.pushed for v in values] == list(range(5))
+
+    def test_drop_when_queue_full(self, make_shipper):
+        client = FakeRedis(block=True)
+        shipper = make_shipper(client, "meters", max_queue_size=2, batch_size=1, flush_interval=0.1)
+        assert shipper.put({"i": 0}) is True
+        # The first log is being sent, which is blocked
+        wait_until(lambda: shipper._queue.empty())
+
+        assert shipper.put({"i": 1}) is True
+        assert shipper.put({"i": 2}) is True
+        assert shipper.put({"i": 3}) is False
+
+        client.unblocked.set()
+        wait_until(lambda: len(client.pushed) == 3)
+
+    def test_flush(self, make_shipper):
+        client = FakeRedis()
+        shipper = make_shipper(client, "meters", batch_size=2)
+        # Put the logs into queue directly, so the background thread is not started
+        for i in range(3):
+            shipper._queue.put({"i": i})
+
+        shipper.flush()
+        assert [len(values) for values in client.pushed] == [2, 1]
+
+    def test_stop(self, make_shipper):
+        client = FakeRedis()
+        shipper = make_shipper(client, "meters", flush_interval=0.1)
+        shipper.put({"i": 0})
+        shipper.stop()
+
+        assert not shipper._thread.is_alive()
+        assert [json.loads(v)["i"] for values in client.pushed for v in values] == [0]
+
+    def test_atexit_registered_once(self, make_shipper, monkeypatch):
+        monkeypatch.setattr(api_middleware, "_atexit_registered", False)
+        shipper = make_shipper(FakeRedis(), "meters", flush_interval=0.1)
+        with mock.patch.object(api_middleware.atexit, "register") as register:
+            shipper.put({"i": 0})
+            # Restarted in the forked process
+            shipper._pid = -1
+            shipper.put({"i": 1})
+            make_shipper(FakeRedis(), "meters", flush_interval=0.1).put({"i": 2})
+
+        assert register.call_count == 1
+
+
+def test_resolve_url_name():
+    assert resolve_url_name("/not-exists/path/") is None
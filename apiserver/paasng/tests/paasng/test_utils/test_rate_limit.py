@@ -15,6 +15,7 @@
 # We undertake not to change the open source license (MIT license) applicable
 # to the current version of the project delivered to anyone in the future.
 
+import threading
 import time
 
 import pytest
@@ -25,12 +26,16 @@ from rest_framework.status import HTTP_200_OK, HTTP_429_TOO_MANY_REQUESTS
 from paasng.core.core.storages.redisdb import get_default_redis
 from paasng.utils.rate_limit.constants import UserAction
 from paasng.utils.rate_limit.fixed_window import UserActionRateLimiter as UserActionFixedWindowRateLimiter
-from paasng.utils.rate_limit.fixed_window import rate_limits_by_user
+from paasng.utils.rate_limit.gcra import UserActionRateLimiter as UserActionGCRARateLimiter
+from paasng.utils.rate_limit.gcra import rate_limits_by_user
 from paasng.utils.rate_limit.token_bucket import UserActionRateLimiter as UserActionTokenBucketRateLimiter
 from tests.utils.auth import create_user
 
 
-@pytest.mark.parametrize("limiter_cls", [UserActionTokenBucketRateLimiter, UserActionFixedWindowRateLimiter])
+@pytest.mark.parametrize(
+    "limiter_cls",
+    [UserActionTokenBucketRateLimiter, UserActionFixedWindowRateLimiter, UserActionGCRARateLimiter],
+)
 def test_UserActionRateLimiter(limiter_cls):  # noqa: N802
     window_size, threshold = 3, 2
     user = create_user()
@@ -47,6 +52,43 @@ def test_UserActionRateLimiter(limiter_cls):  # noqa: N802
     assert rate_limiter.is_allowed()
 
 
+class TestGCRARateLimiter:
+    def test_remaining_and_retry_after(self):
+        window_size, threshold = 10, 5
+        user = create_user()
+        rate_limiter = UserActionGCRARateLimiter(
+            get_default_redis(), user.username, UserAction.WATCH_PROCESS, window_size, threshold
+        )
+        assert [rate_limiter.acquire().remaining for _ in range(threshold)] == [4, 3, 2, 1, 0]
+
+        result = rate_limiter.acquire()
+        assert not result.allowed
+        # 每隔 window_size / threshold 秒恢复一次配额
+        assert 0 < result.retry_after <= window_size / threshold
+
+    def test_concurrency(self):
+        window_size, threshold = 60, 10
+        user = create_user()
+        results = []
+
+        def _acquire():
+            rate_limiter = UserActionGCRARateLimiter(
+                get_default_redis(), user.username, UserAction.WATCH_PROCESS, window_size, threshold
+            )
+            for _ in range(5):
+                results.append(rate_limiter.is_allowed())
+
+        threads = [threading.Thread(target=_acquire) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # 判断与更新是原子的, 并发请求不会超过阈值
+        assert len(results) == 40
+        assert results.count(True) == threshold
+
+
 def test_rate_limits_on_view_func():
     window_size, threshold = 3, 2
     fake_request = HttpRequest()
@@ -61,9 +103,13 @@ def test_rate_limits_on_view_func():
 
     viewset = FakeViewSet()
 
-    for _ in range(threshold):
-        assert viewset.fake_view_func().status_code == HTTP_200_OK
+    for i in range(threshold):
+        response = viewset.fake_view_func()
+        assert response.status_code == HTTP_200_OK
+        assert response["X-RateLimit-Remaining"] == str(threshold - i - 1)
 
-    assert viewset.fake_view_func().status_code == HTTP_429_TOO_MANY_REQUESTS
+    response = viewset.fake_view_func()
+    assert response.status_code == HTTP_429_TOO_MANY_REQUESTS
+    assert 0 < int(response["Retry-After"]) <= window_size
     time.sleep(window_size)
     assert viewset.fake_view_func().status_code == HTTP_200_OK